@@ -0,0 +1,7 @@
+"""
+Benchmarks for the greedy permutation algorithms and the ball tree queries.
+
+Run `python -m benchmarks.run --help` from the root of the repository to see
+the options.  Everything runs offline on synthetic data from
+`benchmarks.datasets`.
+"""
@@ -0,0 +1,65 @@
+from random import Random
+
+
+"""
+This module contains generators of synthetic point sets for benchmarks.
+
+Each generator takes the number of points `n`, the dimension `d`, and a
+`seed`, and returns a list of `n` tuples of `d` floats.  The same arguments
+always give the same points.
+"""
+
+
+def uniform(n, d, seed=0):
+    """
+    Return `n` points drawn uniformly from the unit cube.
+    """
+    rng = Random(seed)
+    return [tuple(rng.random() for j in range(d)) for i in range(n)]
+
+
+def clustered(n, d, seed=0, clusters=10, spread=0.01):
+    """
+    Return `n` points in Gaussian clusters of standard deviation `spread`
+    around `clusters` centers drawn uniformly from the unit cube.
+    """
+    rng = Random(seed)
+    centers = uniform(clusters, d, seed + 1)
+    return [tuple(rng.gauss(c, spread) for c in rng.choice(centers))
+            for i in range(n)]
+
+
+def embedded(n, d, seed=0, intrinsic=2):
+    """
+    Return `n` points from a random `intrinsic` dimensional linear subspace
+    of the `d` dimensional space.
+    """
+    rng = Random(seed)
+    k = min(intrinsic, d)
+    basis = [[rng.gauss(0, 1) for j in range(d)] for i in range(k)]
+    points = []
+    for i in range(n):
+        w = [rng.random() for j in range(k)]
+        points.append(tuple(sum(w[i] * basis[i][j] for i in range(k))
+                            for j in range(d)))
+    return points
+
+
+def duplicates(n, d, seed=0, distinct=None):
+    """
+    Return `n` points that are copies of only `distinct` points (by default
+    about the square root of `n`).
+    """
+    rng = Random(seed)
+    if distinct is None:
+        distinct = max(1, int(n ** 0.5))
+    base = uniform(distinct, d, seed + 1)
+    return [rng.choice(base) for i in range(n)]
+
+
+DATASETS = {
+    'uniform': uniform,
+    'clustered': clustered,
+    'embedded': embedded,
+    'duplicates': duplicates,
+}
@@ -0,0 +1,132 @@
+import click
+import json
+import time
+from metricspaces import MetricSpace
+from greedypermutation import Point
+from greedypermutation.maxheap import MaxHeap
+from greedypermutation.fvm.bucketqueue import BucketQueue
+from greedypermutation.fvm.fvmgreedy import _sites
+from greedypermutation.fvm.fvmneighborgraph import GreedyFVMNeighborGraph
+from greedypermutation.fvm.merge import build_tree
+from benchmarks.datasets import DATASETS
+
+
+"""
+This module compares the heaps used for the cells of a neighbor graph.
+
+The operations on the heap of a `GreedyFVMNeighborGraph` are recorded while
+two greedy trees are merged.  The same sequence of operations is then
+replayed on each heap, so the comparison only measures the heaps.
+"""
+
+
+class RecordingHeap:
+    """
+    A proxy for a heap that appends each operation to `trace`.
+
+    The operations are `('insert', i, priority)`, `('change', i, priority)`
+    and `('findmax',)`, where `i` numbers the items in order of insertion.
+    """
+    def __init__(self, heap, key=lambda c: c.radius):
+        self.heap = heap
+        self.key = key
+        self.trace = []
+        self._ids = {}
+
+    def _id(self, item):
+        return self._ids.setdefault(item, len(self._ids))
+
+    def insert(self, item, priority=None):
+        p = self.key(item) if priority is None else priority
+        self.trace.append(('insert', self._id(item), p))
+        self.heap.insert(item, priority)
+
+    def changepriority(self, item, priority=None):
+        p = self.key(item) if priority is None else priority
+        self.trace.append(('change', self._id(item), p))
+        self.heap.changepriority(item, priority)
+
+    def findmax(self):
+        self.trace.append(('findmax',))
+        return self.heap.findmax()
+
+
+def record(points):
+    """
+    Return the trace of heap operations of the merge of the greedy trees on
+    the two halves of `points`.
+    """
+    space = MetricSpace([Point(p) for p in points])
+    P = list(space)
+    trees = [build_tree(P[:len(P) // 2], space=space),
+             build_tree(P[len(P) // 2:], space=space)]
+    G = GreedyFVMNeighborGraph(trees, space=space)
+    root = G.heap.findmax()
+    G.heap = RecordingHeap(MaxHeap(key=lambda c: c.radius))
+    G.heap.insert(root)
+    for _ in _sites(trees, G):
+        pass
+    return G.heap.trace
+
+
+def replay(trace, heap):
+    """
+    Apply the operations in `trace` to `heap` and return the elapsed time.
+    """
+    insert, change, findmax = heap.insert, heap.changepriority, heap.findmax
+    start = time.perf_counter()
+    for op in trace:
+        if op[0] == 'change':
+            change(op[1], op[2])
+        elif op[0] == 'insert':
+            insert(op[1], op[2])
+        else:
+            findmax()
+    return time.perf_counter() - start
+
+
+HEAPS = {
+    'maxheap': lambda bucket_size: MaxHeap(),
+    'bucketqueue': lambda bucket_size: BucketQueue(bucket_size=bucket_size),
+}
+
+
+def run(sizes, dataset='uniform', d=2, bucket_size=2, repeat=3, seed=0):
+    """
+    Iterate over the results of replaying the trace for each size on each
+    heap.  The time is the best of `repeat` runs.
+    """
+    for n in sizes:
+        trace = record(DATASETS[dataset](n, d, seed))
+        for name, heap in HEAPS.items():
+            seconds = min(replay(trace, heap(bucket_size))
+                          for i in range(repeat))
+            yield {'heap': name, 'dataset': dataset, 'n': n, 'd': d,
+                   'bucket_size': bucket_size, 'operations': len(trace),
+                   'seconds': seconds}
+
+
+@click.command()
+@click.option('--sizes', default='1000,4000,16000',
+              help='Comma separated numbers of points.')
+@click.option('--dataset', default='uniform',
+              type=click.Choice(list(DATASETS)))
+@click.option('--dim', default=2, help='The dimension of the points.')
+@click.option('--bucket-size', default=2.0,
+              help='The bucket size of the bucket queue.')
+@click.option('--repeat', default=3, help='The number of replays per heap.')
+@click.option('--outfile', type=click.File('w'), default='-',
+              help='Where to store the JSON results.')
+def main(sizes, dataset, dim, bucket_size, repeat, outfile):
+    """
+    Replay the heap operations of a merge in the finite Voronoi method on
+    each heap and write the times as JSON.
+    """
+    sizes = [int(n) for n in sizes.split(',')]
+    results = list(run(sizes, dataset, dim, bucket_size, repeat))
+    json.dump({'results': results}, outfile, indent=1)
+    outfile.write('\n')
+
+
+if __name__ == '__main__':
+    main()
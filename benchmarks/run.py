@@ -0,0 +1,297 @@
+import click
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from metricspaces import MetricSpace
+from greedypermutation import Point
+from benchmarks.datasets import DATASETS
+
+
+"""
+This module runs the benchmarks and reports the results as JSON.
+
+Each benchmark builds its input outside of the measurement and then runs a
+single operation.  For each run it reports the wall time, the number of
+distances evaluated, and (optionally) the peak memory allocated while the
+operation runs, as measured by `tracemalloc` in a second run.
+
+The algorithms assume that the points are distinct.  If the points or the
+queries of a dataset have duplicates, then the benchmarks are skipped,
+except for `dedup`, which collapses the duplicates with `dedup.greedy`
+before it computes the greedy permutation.  The number of `distinct`
+points is reported with each result.
+"""
+
+
+class CountingDistance:
+    """
+    A distance function that counts the number of times it is called.
+
+    It is used as the `dist` of a `MetricSpace`, so it counts the distances
+    actually evaluated and not those found in the cache.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, a, b):
+        self.count += 1
+        return a.dist(b)
+
+
+def space(points, counter):
+    """
+    Return a `MetricSpace` on `Point` objects for the tuples in `points`
+    whose distances are counted by `counter`.
+    """
+    return MetricSpace([Point(p) for p in points], dist=counter)
+
+
+def _clarkson(points, counter):
+    from greedypermutation.clarksongreedy import greedy
+    M = space(points, counter)
+    return lambda: list(greedy(M))
+
+
+def _vectorized(points, counter):
+    from greedypermutation.arraygreedy import greedy
+    import numpy as np
+    P = np.array(points, dtype=float)
+    return lambda: list(greedy(P))
+
+
+def _quadratic(points, counter):
+    from greedypermutation.quadraticgreedy import greedy
+    M = space(points, counter)
+    return lambda: list(greedy(M))
+
+
+def _numpy(points, counter):
+    from greedypermutation.numpygreedy import greedy
+    import numpy as np
+    P = np.array(points, dtype=float)
+    return lambda: list(greedy(P, lowmemory=True))
+
+
+def _dedup(points, counter):
+    from greedypermutation.dedup import greedy
+    P = [Point(p) for p in points]
+    return lambda: greedy(P, lambda D: MetricSpace(D, dist=counter))
+
+
+def _fvm(points, counter):
+    from greedypermutation.fvm.merge import build_tree
+    M = space(points, counter)
+    P = list(M)
+    return lambda: build_tree(P, space=M)
+
+
+def _onehop(points, counter):
+    from greedypermutation.onehopgreedy import onehopgreedy
+    M = space(points, counter)
+    return lambda: list(onehopgreedy(M))
+
+
+ALGORITHMS = {
+    'clarkson': _clarkson,
+    'vectorized': _vectorized,
+    'quadratic': _quadratic,
+    'numpy': _numpy,
+    'fvm': _fvm,
+    'onehop': _onehop,
+    'dedup': _dedup,
+}
+
+# The benchmarks that do not count their distances.
+UNCOUNTED = {'vectorized', 'numpy'}
+
+# The benchmarks that accept duplicate points.
+DUPLICATES = {'dedup'}
+
+
+def _tree(points, queries, counter):
+    from greedypermutation.balltree import greedy_tree
+    M = space(points, counter)
+    tree = greedy_tree(M)
+    return tree, [Point(q) for q in queries]
+
+
+def _nn(points, queries, counter):
+    tree, Q = _tree(points, queries, counter)
+    return lambda: [tree.nn(q) for q in Q]
+
+
+def _nn_batch(points, queries, counter):
+    tree, Q = _tree(points, queries, counter)
+    return lambda: tree.nn_batch(Q)
+
+
+def _knn(points, queries, counter, k=10):
+    tree, Q = _tree(points, queries, counter)
+    return lambda: [list(tree.knn(k, q)) for q in Q]
+
+
+def _range(points, queries, counter):
+    tree, Q = _tree(points, queries, counter)
+    r = tree.radius / 10
+    return lambda: [tree.range_count(q, r) for q in Q]
+
+
+def _allknn(points, queries, counter, k=10):
+    from greedypermutation.dualtrees.allknn import AllKNN
+    tree, Q = _tree(points, queries, counter)
+    other, _ = _tree(queries, (), counter)
+    return lambda: AllKNN(other, tree, k)()
+
+
+def _allrange(points, queries, counter):
+    from greedypermutation.dualtrees.allrange import AllRange
+    tree, Q = _tree(points, queries, counter)
+    other, _ = _tree(queries, (), counter)
+    return lambda: AllRange(other, tree, tree.radius / 10)()
+
+
+QUERIES = {
+    'nn': _nn,
+    'nn_batch': _nn_batch,
+    'knn': _knn,
+    'range': _range,
+    'allknn': _allknn,
+    'allrange': _allrange,
+}
+
+
+def measure(setup, memory=True, counted=True):
+    """
+    Run a benchmark and return a dictionary of measurements.
+
+    The `setup` function is called with a `CountingDistance` and returns the
+    operation to measure.  The counter is reset before the operation runs.
+    If `counted` is not set, the operation does not use the counter and the
+    `distances` are `None`.
+    If `memory` is set, the operation is set up and run a second time under
+    `tracemalloc` to find its peak memory.
+    """
+    counter = CountingDistance()
+    operation = setup(counter)
+    counter.count = 0
+    start = time.perf_counter()
+    operation()
+    result = {'seconds': time.perf_counter() - start,
+              'distances': counter.count if counted else None}
+    if memory:
+        operation = setup(CountingDistance())
+        tracemalloc.start()
+        try:
+            operation()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run(names, datasets, sizes, dims, queries=100, memory=True, seed=0):
+    """
+    Iterate over the results of every benchmark in `names` for each
+    combination of dataset, size and dimension.
+
+    A benchmark that fails raises its exception.  Only the benchmarks whose
+    dependencies are missing and those that do not accept the duplicates of
+    the dataset are skipped.
+    """
+    for dataset in datasets:
+        generate = DATASETS[dataset]
+        for d in dims:
+            for n in sizes:
+                points = generate(n, d, seed)
+                Q = generate(queries, d, seed + 1)
+                distinct = len(set(points))
+                for name in names:
+                    if name in ALGORITHMS:
+                        def setup(counter):
+                            return ALGORITHMS[name](points, counter)
+                        unique = distinct == len(points)
+                    else:
+                        def setup(counter):
+                            return QUERIES[name](points, Q, counter)
+                        unique = (distinct == len(points)
+                                  and len(set(Q)) == len(Q))
+                    result = {'benchmark': name, 'dataset': dataset,
+                              'n': n, 'd': d, 'distinct': distinct}
+                    if not unique and name not in DUPLICATES:
+                        result['skipped'] = ("The points are not distinct.  "
+                                             "Use the `dedup` benchmark.")
+                        yield result
+                        continue
+                    try:
+                        result.update(measure(setup, memory,
+                                              name not in UNCOUNTED))
+                    except ImportError as e:
+                        result['skipped'] = str(e)
+                    yield result
+
+
+def _ints(s):
+    return [int(x) for x in s.split(',')]
+
+
+def _names(choices):
+    def parse(s):
+        names = list(choices) if s == 'all' else s.split(',')
+        for name in names:
+            if name not in choices:
+                raise click.BadParameter("unknown name: " + name)
+        return names
+    return parse
+
+
+@click.command()
+@click.option('--benchmarks', 'names', default='clarkson,nn',
+              help='Comma separated benchmarks, or `all`.  Algorithms: '
+                   + ', '.join(ALGORITHMS) + '.  Queries: '
+                   + ', '.join(QUERIES) + '.')
+@click.option('--datasets', default='uniform',
+              help='Comma separated datasets, or `all`: '
+                   + ', '.join(DATASETS) + '.')
+@click.option('--sizes', default='500,1000,2000',
+              help='Comma separated numbers of points.')
+@click.option('--dims', default='2',
+              help='Comma separated dimensions.')
+@click.option('--queries', default=100,
+              help='The number of query points.')
+@click.option('--memory/--nomemory', default=True,
+              help='Measure the peak memory in a second run or not.')
+@click.option('--seed', default=0, help='The seed for the datasets.')
+@click.option('--outfile', type=click.File('w'), default='-',
+              help='Where to store the JSON results.')
+def main(names, datasets, sizes, dims, queries, memory, seed, outfile):
+    """
+    Run the benchmarks and write the results as JSON.
+
+    The output is an object with the `environment` of the run and a list of
+    `results`, one per benchmark, dataset, size and dimension.
+    Each result has the wall time in `seconds`, the number of `distances`
+    evaluated through the metric space and the `peak_bytes` of memory.
+    Benchmarks that need NumPy do not count distances, so their `distances`
+    are null.  Benchmarks that need distinct points are skipped on datasets
+    with duplicates.
+    The run stops at the first benchmark that fails.
+    """
+    names = _names({**ALGORITHMS, **QUERIES})(names)
+    datasets = _names(DATASETS)(datasets)
+    results = []
+    for result in run(names, datasets, _ints(sizes), _ints(dims), queries,
+                      memory, seed):
+        click.echo(json.dumps(result), err=True)
+        results.append(result)
+    environment = {'python': sys.version.split()[0],
+                   'platform': platform.platform(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    json.dump({'environment': environment, 'results': results}, outfile,
+              indent=1)
+    outfile.write('\n')
+
+
+if __name__ == '__main__':
+    main()
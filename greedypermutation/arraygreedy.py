@@ -0,0 +1,342 @@
+import numpy as np
+from collections import defaultdict
+from ds2.graph import Graph
+from greedypermutation.maxheap import MaxHeap
+
+
+"""
+This module contains an array-backed implementation of Clarkson's algorithm
+for Euclidean point sets.
+
+It follows the same steps as `clarksongreedy` and `NeighborGraph`, but the
+points are rows of an `(n, d)` NumPy array.  Each cell stores its points as an
+array of row indices along with the distance from each point to the center.
+Rebalancing a cell is then a single vectorized distance computation over its
+block of points rather than one call to `comparedist` per point.
+"""
+
+
+class ArrayCell:
+    def __init__(self, center, points, dists):
+        """
+        Create a new cell with the given `center` index.
+
+        `points` is an array of row indices and `dists` is the array of
+        distances from each of those points to the center.
+        """
+        self.center = center
+        self.points = points
+        self.dists = dists
+        self.updateradius()
+
+    def updateradius(self):
+        """
+        Set the radius of the cell to be the farthest distance from a point
+        to the center.
+
+        Also, store the farthest point.
+        The distances to the center are stored, so no new distances are
+        computed.
+        """
+        self.radius = 0
+        self.farthest = None
+        if len(self.dists):
+            i = self.dists.argmax()
+            if self.dists[i] > 0:
+                self.radius = float(self.dists[i])
+                self.farthest = int(self.points[i])
+
+    def __len__(self):
+        """
+        Return the total number of points in the cell, including the center.
+        """
+        return len(self.points)
+
+    def __iter__(self):
+        """
+        Return an iterator over the (indices of the) points in the cell.
+        """
+        return iter(self.points)
+
+    def __repr__(self):
+        return str(self.center)
+
+
+class ArrayNeighborGraph(Graph):
+    def __init__(self,
+                 P,
+                 root=0,
+                 nbrconstant=1,
+                 moveconstant=1,
+                 gettransportplan=False,
+                 mass=None):
+        """
+        Initialize a new ArrayNeighborGraph on the rows of the `(n, d)` array
+        `P`.
+
+        The row with index `root` will be the center of the default cell and
+        all other rows will be placed inside.
+
+        The constants `nbrconstant` and `moveconstant` and the flag
+        `gettransportplan` have the same meaning as in `NeighborGraph`.
+        """
+        super().__init__()
+        self.P = P
+        n = len(P)
+        if mass is None:
+            mass = np.ones(n)
+        elif len(mass) != n:
+            raise ValueError("`mass` must of same length as `P`")
+        self.mass = np.asarray(mass, dtype=float)
+
+        if nbrconstant < moveconstant:
+            raise RuntimeError("The move constant must not be larger than the"
+                               "neighbor constant.")
+        self.nbrconstant = nbrconstant
+        self.moveconstant = moveconstant
+        self.gettransportplan = gettransportplan
+
+        points = np.arange(n)
+        root_cell = ArrayCell(root, points, self.dist(root, points))
+        self.addvertex(root_cell)
+        self.addedge(root_cell, root_cell)
+
+    def dist(self, i, indices):
+        """
+        Return the array of distances from row `i` to each of the rows in
+        `indices`.
+        """
+        diff = self.P[indices] - self.P[i]
+        return np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+    def iscloseenoughto(self, p, q):
+        """
+        Return True iff the cells `p` and `q` are close enough to be neighbors.
+        """
+        return bool(self.closeenough(p, [q]))
+
+    def closeenough(self, p, cells):
+        """
+        Return the list of cells among `cells` that are close enough to `p` to
+        be neighbors.
+
+        The distances from `p.center` to the centers are computed in a single
+        batch.
+        """
+        cells = list(cells)
+        centers = np.fromiter((c.center for c in cells), dtype=np.intp,
+                              count=len(cells))
+        radii = np.fromiter((c.radius for c in cells), dtype=float,
+                            count=len(cells))
+        bound = p.radius + radii + \
+            self.nbrconstant * np.maximum(p.radius, radii)
+        close = self.dist(p.center, centers) <= bound
+        return [c for c, isclose in zip(cells, close) if isclose]
+
+    def addcell(self, newcenter, parent):
+        """
+        Add a new cell centered at the row `newcenter` and return it along
+        with the transportation plan for this change.
+
+        The points that move into the new cell are gathered from each
+        neighbor of `parent` and concatenated once at the end.
+        """
+        newcell = ArrayCell(newcenter,
+                            np.empty(0, dtype=np.intp),
+                            np.empty(0))
+        transportplan = defaultdict(float)
+
+        self.addvertex(newcell)
+        self.addedge(newcell, newcell)
+
+        points, dists = [], []
+        for nbr in self.nbrs(parent):
+            moved, moveddists = self.rebalance(newcell, nbr)
+            if len(moved):
+                points.append(moved)
+                dists.append(moveddists)
+                if self.gettransportplan:
+                    localtransport = self.mass[moved].sum()
+                    transportplan[newcenter] += localtransport
+                    transportplan[nbr.center] -= localtransport
+        if points:
+            newcell.points = np.concatenate(points)
+            newcell.dists = np.concatenate(dists)
+            newcell.updateradius()
+
+        for newnbr in self.closeenough(newcell, self.nbrs_of_nbrs(parent)):
+            self.addedge(newcell, newnbr)
+
+        for nbr in set(self.nbrs(parent)):
+            self.prunenbrs(nbr)
+
+        return newcell, transportplan
+
+    def rebalance(self, a, b):
+        """
+        Remove the points of `b` that are sufficiently closer to `a.center`
+        and return them along with their distances to `a.center`.
+
+        The caller is responsible for adding the returned points to `a`.
+        """
+        da = self.dist(a.center, b.points)
+        move = da < self.moveconstant * b.dists
+        if not move.any():
+            return b.points[:0], da[:0]
+        moved, moveddists = b.points[move], da[move]
+        stay = ~move
+        b.points, b.dists = b.points[stay], b.dists[stay]
+        b.updateradius()
+        return moved, moveddists
+
+    def nbrs_of_nbrs(self, u):
+        return {b for a in self.nbrs(u) for b in self.nbrs(a)}
+
+    def prunenbrs(self, u):
+        """
+        Eliminate neighbors that are too far with respect to the current
+        radius.
+        """
+        nbrs = set(self.nbrs(u))
+        nbrs_to_delete = nbrs.difference(self.closeenough(u, nbrs))
+
+        for v in nbrs_to_delete:
+            self.removeedge(u, v)
+
+    def cellmass(self, cell):
+        """
+        Return the total mass of the points in `cell`.
+        """
+        return float(self.mass[cell.points].sum())
+
+
+class GreedyArrayNeighborGraph(ArrayNeighborGraph):
+    def __init__(self,
+                 P,
+                 root=0,
+                 nbrconstant=1,
+                 moveconstant=1,
+                 gettransportplan=False,
+                 mass=None):
+        super().__init__(P, root, nbrconstant, moveconstant, gettransportplan,
+                         mass)
+
+        root_cell = next(iter(self._nbrs))
+        self.heap = MaxHeap([root_cell], key=lambda c: c.radius)
+
+    def addcell(self, newcenter, parent):
+        newcell, transportplan = super().addcell(newcenter, parent)
+        self.heap.insert(newcell)
+
+        return newcell, transportplan
+
+    def rebalance(self, a, b):
+        moved = super().rebalance(a, b)
+        self.heap.changepriority(b)
+
+        return moved
+
+
+def coordinates(M):
+    """
+    Return a pair `(P, points)` where `P` is a float array with one row per
+    point of `M`.
+
+    If `M` is already an array, then `points` is `None`.
+    Otherwise, `points` is the list of the points of `M`, so that the output
+    can be given in terms of the original point objects.
+    """
+    if isinstance(M, np.ndarray):
+        P, points = M, None
+    else:
+        points = list(M)
+        P = np.array([list(p) if hasattr(p, '__iter__') else [p]
+                      for p in points], dtype=float)
+    P = np.asarray(P, dtype=float)
+    if P.ndim == 1:
+        P = P.reshape(-1, 1)
+    return P, points
+
+
+def greedy(M,
+           seed=None,
+           nbrconstant=1,
+           moveconstant=1,
+           tree=False,
+           pointtree=False,
+           gettransportplan=False,
+           mass=None):
+    """
+    Return an iterator that yields the points of `M` ordered by a greedy
+    permutation.
+
+    The input `M` is either an `(n, d)` array or a collection of Euclidean
+    points (such as `Point` objects).  In the first case, the rows of the
+    array are yielded and in the second case the original points are yielded.
+
+    The parameters and the output are the same as for
+    `clarksongreedy.greedy`.
+    """
+    P, points = coordinates(M)
+
+    def point(i):
+        return P[i] if points is None else points[i]
+
+    root = 0 if seed is None else _index(P, points, seed)
+    G = GreedyArrayNeighborGraph(P,
+                                 root,
+                                 nbrconstant,
+                                 moveconstant,
+                                 gettransportplan,
+                                 mass)
+    for i, c, j, t in _greedy(P, G):
+        output = [point(i)]
+        if pointtree:
+            output.append(point(c.center) if c else None)
+        if tree:
+            output.append(j)
+        if gettransportplan:
+            output.append(_transportplan(t, point))
+        yield output[0] if len(output) == 1 else tuple(output)
+
+
+def _index(P, points, seed):
+    """
+    Return the index of the point `seed`.
+    """
+    if points is not None:
+        return points.index(seed)
+    return int(np.flatnonzero((P == np.asarray(seed, dtype=float))
+                              .all(axis=1))[0])
+
+
+def _transportplan(t, point):
+    """
+    Translate a transportation plan indexed by rows into one indexed by
+    points.
+    """
+    return {_hashable(point(i)): m for i, m in t.items()}
+
+
+def _hashable(p):
+    return tuple(p) if isinstance(p, np.ndarray) else p
+
+
+def _greedy(P, G):
+    """
+    Given an array `P` and a `GreedyArrayNeighborGraph` `G`, iterate over
+    `(index, cell, predecessor index, transportplan)` tuples for a greedy
+    permutation of the rows of `P`.
+    """
+    H = G.heap
+    root = H.findmax()
+
+    yield root.center, None, None, {root.center: G.cellmass(root)}
+
+    index = {root: 0}
+
+    for i in range(1, len(P)):
+        cell = H.findmax()
+        newcell, transportplan = G.addcell(cell.farthest, cell)
+        index[newcell] = i
+        yield newcell.center, cell, index[cell], transportplan
@@ -1,8 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from heapq import heappush, heapreplace
+from itertools import count
 from ds2.priorityqueue import PriorityQueue
 from metricspaces import MetricSpace, metric_class
 from greedypermutation.clarksongreedy import greedy
 from greedypermutation.maxheap import MaxHeap
 from greedypermutation.knnheap import KNNHeap
+from greedypermutation.instrument import counted
+from greedypermutation.metrics import dists
 
 
 """
@@ -13,9 +19,18 @@ In total, it has exactly 2n-1 nodes because every non-leaf node has two
 children.
 """
 
-def greedy_tree(M, seed=None, nbrconstant=1, moveconstant=1):
+def greedy_tree(M, seed=None, nbrconstant=1, moveconstant=1, stats=None):
+    """
+    Return a ball tree built from a greedy permutation of `M`.
+
+    If a `Stats` object is given as `stats`, then the work to build the tree
+    is counted in it.  The tree keeps the counting metric, so the distances
+    computed by later searches of the tree are also counted.
+    """
+    M = counted(M, stats)
     BallTree = Ball(M)
-    gp = greedy(M, seed, pointtree=True, nbrconstant=nbrconstant, moveconstant=moveconstant)
+    gp = greedy(M, seed, pointtree=True, nbrconstant=nbrconstant,
+                moveconstant=moveconstant, stats=stats)
     seed, _ = next(gp)
     root = BallTree(seed)
     leaf = {seed: root}
@@ -98,35 +113,137 @@ class Ball:
 
     def update(self):
         """
-        Recursively compute the `radius` and `len` of every ball in the tree
-        rooted at self.
+        Compute the `radius` and `len` of every ball in the tree rooted at
+        self.
+
+        The balls are visited with an explicit stack, so deep trees do not
+        reach the recursion limit.  Every child is updated before its parent.
         """
-        if self.isleaf():
-            self.radius = 0
-            self._len = 1
-        else:
-            self.left.update()
-            self.right.update()
-            self.radius = max(self.left.radius,
-                              self.right.farthest(self.center))
-            self._len = len(self.left) + len(self.right)
+        for ball in reversed(self._preorder()):
+            if ball.isleaf():
+                ball.radius = 0
+                ball._len = 1
+            else:
+                ball.radius = max(ball.left.radius,
+                                  ball.right.farthest(ball.center))
+                ball._len = len(ball.left) + len(ball.right)
+
+    def _preorder(self):
+        """
+        Return the list of the balls in the tree rooted at self, with each
+        ball before its children.
+        """
+        balls, stack = [], [self]
+        while stack:
+            ball = stack.pop()
+            balls.append(ball)
+            if not ball.isleaf():
+                stack.append(ball.right)
+                stack.append(ball.left)
+        return balls
+
+    def insert(self, point):
+        """
+        Add `point` to the tree and return its new leaf.
+
+        The tree is descended from the root, always to the child with the
+        nearer center.  The leaf that is reached is split into a leaf with the
+        same center and a new leaf for `point`.  The radius and the size of
+        every ball on the path are updated, so the radii remain valid.
+        """
+        BallTree = type(self)
+        ball, d = self, self.dist(point)
+        path = [(ball, d)]
+        while not ball.isleaf():
+            dright = ball.right.dist(point)
+            if dright < d:
+                ball, d = ball.right, dright
+            else:
+                ball = ball.left
+            path.append((ball, d))
+        ball.left, ball.right = BallTree(ball.center), BallTree(point)
+        for b, d in path:
+            b._len += 1
+            if d > b.radius:
+                b.radius = d
+        return ball.right
+
+    def remove(self, point):
+        """
+        Remove `point` from the tree.
+
+        The leaf of `point` is removed and its sibling takes the place of
+        their parent.  If `point` was also the center of some balls above the
+        leaf, then the sibling's center becomes their center and their radii
+        grow by the distance between the two centers, so they remain valid
+        upper bounds.  The size of every ball on the path is decreased by one.
+        The other radii are not changed, because they are still upper
+        bounds.
+
+        A `ValueError` is raised if `point` is not in the tree or if it is
+        the only point in the tree.
+        """
+        path = self._path(point)
+        if path is None:
+            raise ValueError("The point is not in the tree.")
+        if len(path) == 1:
+            raise ValueError("Cannot remove the only point in the tree.")
+        leaf, parent = path[-1], path[-2]
+        sibling = parent.right if leaf is parent.left else parent.left
+        parent.center, parent.radius = sibling.center, sibling.radius
+        parent.left, parent.right = sibling.left, sibling.right
+        parent._len = sibling._len
+        shift = None
+        for ball in path[:-2]:
+            ball._len -= 1
+            if ball.center == point:
+                if shift is None:
+                    shift = self.metric.dist(point, parent.center)
+                ball.center = parent.center
+                ball.radius += shift
+
+    def _path(self, point):
+        """
+        Return the list of balls from `self` to the leaf whose center is
+        `point`, or `None` if there is no such leaf.
+
+        Only the balls that could contain `point` are searched.
+        """
+        stack = [(self, None)]
+        while stack:
+            ball, path = stack.pop()
+            path = (ball, path)
+            if ball.isleaf():
+                if ball.center == point:
+                    balls = []
+                    while path is not None:
+                        ball, path = path
+                        balls.append(ball)
+                    return balls[::-1]
+            else:
+                for child in (ball.right, ball.left):
+                    if child.dist(point) <= child.radius:
+                        stack.append((child, path))
+        return None
 
     def __len__(self):
         return self._len
 
     def __iter__(self):
         """
-        Iterate over the points.
+        Iterate over the points from the leftmost leaf to the rightmost leaf.
 
-        Note that the current immplementation is simple, but not as efficient
-        asymptotically as the non-recursive approach.  This is an issue with
-        recursive iterators.
+        An explicit stack of balls is used instead of nested generators, so
+        the iteration takes time proportional to the number of balls.
         """
-        if self.isleaf():
-            yield self.center
-        else:
-            yield from self.left
-            yield from self.right
+        stack = [self]
+        while stack:
+            ball = stack.pop()
+            if ball.isleaf():
+                yield ball.center
+            else:
+                stack.append(ball.right)
+                stack.append(ball.left)
 
     def heap(self):
         """
@@ -271,6 +388,175 @@ class Ball:
             if ball.intersects(query,R):
                 yield from ball
 
+    def _dists(self, queries):
+        """
+        Return the list of distances from the center to each of the `queries`.
+        The distances are computed in one batch if the metric supports it.
+        """
+        return list(dists(self.metric, self.center, queries))
+
+    def _batch(self, search, queries, workers, blocksize):
+        """
+        Apply `search` to blocks of `queries` and return the list of results
+        in the order of the queries.
+
+        If `workers` is greater than one, the blocks are searched by a pool of
+        threads.  By default, there is one block per worker.
+        """
+        queries = list(queries)
+        if workers is None or workers <= 1 or len(queries) <= 1:
+            return search(queries)
+        if blocksize is None:
+            blocksize = -(-len(queries) // workers)
+        blocks = [queries[i:i + blocksize]
+                  for i in range(0, len(queries), blocksize)]
+        with ThreadPoolExecutor(workers) as pool:
+            return [r for result in pool.map(search, blocks) for r in result]
+
+    def _children(self, active, dists, rdists, keep):
+        """
+        Return the children of this ball as `(ball, active, dists)` triples
+        for a batched search, where `active` lists the indices of the queries
+        for which `keep(i, distance, ball)` holds.
+
+        The `dists` from the queries to the center are also the distances to
+        the center of the left child and `rdists` are the distances to the
+        center of the right child.
+        The child with the smaller total lower bound is last, so that it is
+        popped first from a stack.
+        """
+        children = []
+        for child, cdists in ((self.left, dists), (self.right, rdists)):
+            kept = [(i, d) for i, d in zip(active, cdists)
+                    if keep(i, d, child)]
+            if kept:
+                bound = sum(d for i, d in kept) - len(kept) * child.radius
+                children.append((bound, child, [i for i, d in kept],
+                                 [d for i, d in kept]))
+        children.sort(key=lambda c: -c[0])
+        return [c[1:] for c in children]
+
+    def _traverse(self, queries, dists, keep, visit, recheck=True):
+        """
+        Traverse the tree once for all of the `queries`, given the list
+        `dists` of their distances to the center.
+
+        A query enters a ball if `keep(i, distance, ball)` holds for its index
+        `i`.  If `recheck` is set, this is tested again when the ball is
+        reached, because the bounds of the search may have improved.
+        For each internal ball, the distances from the active queries to the
+        center of the right child are computed in one batch and passed to
+        `visit(ball, active, rdists)` before the children are searched.
+        A left child has the same center as its parent, so its distances are
+        not computed again.
+        """
+        pairs = [(i, d) for i, d in enumerate(dists) if keep(i, d, self)]
+        stack = [(self, [i for i, d in pairs], [d for i, d in pairs])]
+        while stack:
+            ball, active, dists = stack.pop()
+            if ball.isleaf():
+                continue
+            if recheck:
+                pairs = [(i, d) for i, d in zip(active, dists)
+                         if keep(i, d, ball)]
+                active, dists = [i for i, d in pairs], [d for i, d in pairs]
+            if not active:
+                continue
+            rdists = ball.right._dists([queries[i] for i in active])
+            visit(ball, active, rdists)
+            stack.extend(ball._children(active, dists, rdists, keep))
+
+    def nn_batch(self, queries, workers=None, blocksize=None):
+        """
+        Return the list of the points in the tree closest to each of the
+        `queries`.
+
+        The queries share one traversal of the tree, so the distance from a
+        center to a query is computed at most once per query.
+        The optional `workers` and `blocksize` split the queries into blocks
+        that are searched in a pool of threads.
+        """
+        return self._batch(self._nn_batch, queries, workers, blocksize)
+
+    def _nn_batch(self, queries):
+        best = self._dists(queries)
+        nbr = [self.center] * len(queries)
+
+        def visit(ball, active, rdists):
+            for i, d in zip(active, rdists):
+                if d < best[i]:
+                    best[i], nbr[i] = d, ball.right.center
+
+        self._traverse(queries, list(best),
+                       lambda i, d, ball: d - ball.radius < best[i], visit)
+        return nbr
+
+    def knn_batch(self, k, queries, workers=None, blocksize=None):
+        """
+        Return a list with, for each of the `queries`, the list of the `k`
+        points in the tree nearest to it, sorted by distance.
+
+        The queries share one traversal of the tree as in `nn_batch`.
+        """
+        search = partial(self._knn_batch, k)
+        return self._batch(search, queries, workers, blocksize)
+
+    def _knn_batch(self, k, queries):
+        # Every point is the center of the root or of exactly one right child,
+        # so each point is offered to the heap of a query at most once.
+        tiebreak = count()
+        heaps = [[] for q in queries]
+
+        def offer(i, d, p):
+            H = heaps[i]
+            if len(H) < k:
+                heappush(H, (-d, next(tiebreak), p))
+            elif d < -H[0][0]:
+                heapreplace(H, (-d, next(tiebreak), p))
+
+        def keep(i, d, ball):
+            H = heaps[i]
+            return len(H) < k or d - ball.radius < -H[0][0]
+
+        def visit(ball, active, rdists):
+            for i, d in zip(active, rdists):
+                offer(i, d, ball.right.center)
+
+        dists = self._dists(queries)
+        for i, d in enumerate(dists):
+            offer(i, d, self.center)
+        self._traverse(queries, dists, keep, visit)
+        return [[p for _, _, p in sorted(H, key=lambda e: (-e[0], e[1]))]
+                for H in heaps]
+
+    def range_count_batch(self, queries, radius, slack=0, workers=None,
+                          blocksize=None):
+        """
+        Return the list of the numbers of points in `ball(q, radius)` for each
+        query `q` in `queries`.
+        As in `range_count`, points in `ball(q, radius + slack)` may also be
+        counted.
+
+        The queries share one traversal of the tree as in `nn_batch`.
+        """
+        search = partial(self._range_count_batch, radius=radius, slack=slack)
+        return self._batch(search, queries, workers, blocksize)
+
+    def _range_count_batch(self, queries, radius, slack):
+        counts = [0] * len(queries)
+
+        def keep(i, d, ball):
+            if d - ball.radius > radius:
+                return False
+            if d + ball.radius <= radius + slack:
+                counts[i] += len(ball)
+                return False
+            return True
+
+        self._traverse(queries, self._dists(queries), keep,
+                       lambda ball, active, rdists: None, recheck=False)
+        return counts
+
     def _str(self, s='', tabs=0):
       if self is not None:
         s += tabs*'|\t' + str(self.center) + '\n'
@@ -285,6 +571,12 @@ class Ball:
 
 
     def height(self):
-        if self.isleaf():
-            return 1
-        return 1 + max(self.left.height(), self.right.height())
+        """
+        Return the number of levels of the tree rooted at self.
+        """
+        height, level = 0, [self]
+        while level:
+            height += 1
+            level = [child for ball in level if not ball.isleaf()
+                     for child in (ball.left, ball.right)]
+        return height
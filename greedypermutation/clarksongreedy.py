@@ -1,4 +1,6 @@
-from greedypermutation.neighborgraph import Cell, GreedyNeighborGraph
+from greedypermutation.neighborgraph import (Cell, GreedyNeighborGraph,
+                                             JournaledNeighborGraph)
+from math import inf
 
 
 def greedy(M,
@@ -8,7 +10,14 @@ def greedy(M,
            tree=False,
            pointtree=False,
            gettransportplan=False,
-           mass=None):
+           mass=None,
+           vectorized=False,
+           workers=None,
+           stats=None,
+           bucket_size=1,
+           report=None,
+           transportrecords=None,
+           weighted=False):
     """
     Return an iterator that yields the points of `M` ordered by a greedy
     permutation.
@@ -30,28 +39,82 @@ def greedy(M,
     The `gettransportplan` parameter sets the corresponding flag in
     `NeighborGraph` which when set returns a dictionary of mass moved in each
     step of the greedy permutation.
+
+    If `vectorized` is set, then the points are treated as Euclidean
+    coordinates and the array-backed engine in `arraygreedy` is used instead.
+    It yields the same output, but performs each rebalance as a single NumPy
+    distance computation over the points of a cell.
+
+    If `workers` is greater than one, then the neighbors of each new cell are
+    scanned in parallel by a pool of that many threads.  See `NeighborGraph`.
+
+    If a `Stats` object is given as `stats`, then the distances, the heap
+    operations and the points moved are counted in it and each point output
+    is a step.  It is not supported by the `vectorized` engine.
+    See `instrument`.
+
+    If `bucket_size` is greater than one, then the cells are kept in a bucket
+    queue rather than an exact heap.  Each point is then chosen from a cell
+    whose radius is within a factor of `bucket_size` of the largest radius,
+    so the permutation is a `bucket_size / moveconstant` approximation.
+    If an `ApproximationReport` is given as `report`, then the ratio of the
+    largest radius to the chosen radius is recorded at each step and its
+    `bound` is set to `bucket_size`.  Neither is supported by the
+    `vectorized` engine.
+
+    If a `TransportRecords` object is given as `transportrecords`, then the
+    transport plan of each step is appended to its columns, with the points
+    numbered by their positions in the permutation.  This does not depend on
+    `gettransportplan`, so the dictionaries can be skipped.  It is not
+    supported by the `vectorized` engine.  See `transport`.
+
+    If `weighted` is set, then each new point is the one whose distance to
+    the previous points times its mass is the largest.  Duplicate points
+    can then be collapsed into a single point with their total `mass`.  The
+    ratios in a `report` are of weighted radii.  It is not supported by the
+    `vectorized` engine.
     """
+    if vectorized:
+        from greedypermutation.arraygreedy import greedy as arraygreedy
+        yield from arraygreedy(M, seed, nbrconstant, moveconstant, tree,
+                               pointtree, gettransportplan, mass)
+        return
     G = GreedyNeighborGraph(M,
                             seed or next(iter(M)),
                             nbrconstant,
                             moveconstant,
                             gettransportplan,
-                            mass)
-    for p, c, i, t in _greedy(M, G):
-        output = [p]
-        if pointtree:
-            output.append(c.center if c else None)
-        if tree:
-            output.append(i)
-        if gettransportplan:
-            output.append(t)
-        yield output[0] if len(output) == 1 else tuple(output)
-
-
-def _greedy(M, G):
+                            mass,
+                            workers,
+                            stats,
+                            bucket_size,
+                            transportrecords,
+                            weighted)
+    if report is not None:
+        report.bound = bucket_size
+    try:
+        for p, c, i, t in _greedy(M, G, report):
+            output = [p]
+            if pointtree:
+                output.append(c.center if c else None)
+            if tree:
+                output.append(i)
+            if gettransportplan:
+                output.append(t)
+            if stats is not None:
+                stats.step()
+            yield output[0] if len(output) == 1 else tuple(output)
+    finally:
+        G.close()
+
+
+def _greedy(M, G, report=None):
     """
     Given a `MetricSpace` `M` and a `GreedyNeighborGraph` `G`, iterate over
     `(point, cell, index, transportplan)` tuples for greedy permutation of `M`.
+
+    If `report` is given, then the radius of each chosen cell and the largest
+    radius are recorded in it.
     """
     H = G.heap
     root = H.findmax()
@@ -65,6 +128,225 @@ def _greedy(M, G):
     for i in range(1, len(M)):
         cell = H.findmax()
         point = cell.farthest
+        if report is not None:
+            report.record(G.priority(cell), G.maxradius())
         newcell, transportplan = G.addcell(point, cell)
         index[newcell] = i
         yield point, cell, index[cell], transportplan
+
+
+def greedy_prefix(M, k, seed=None, nbrconstant=1, moveconstant=1,
+                  workers=None, stats=None):
+    """
+    Return the list of the first `k` points of a greedy permutation of `M` as
+    `(point, index, radius)` triples, as in `IncrementalGreedy.prefix`.
+
+    The `index` is the position of the predecessor and `radius` is the
+    insertion radius (`inf` for the first point).  Fewer than `k` points are
+    returned if `M` has fewer distinct points.  The neighbor graph is not
+    updated for the `k`-th point, so none of the cells of the rest of the
+    permutation are made.  The other parameters are as in `greedy`.
+    """
+    return _prefix(M, seed, nbrconstant, moveconstant, workers, stats, k=k)
+
+
+def greedy_net(M, eps, seed=None, nbrconstant=1, moveconstant=1,
+               workers=None, stats=None):
+    """
+    Return the prefix of a greedy permutation of `M` whose insertion radii
+    are at least `eps` as a list of `(point, index, radius)` triples.  The
+    points are an `eps`-net of `M`.
+
+    The permutation stops as soon as the largest radius of a cell is less than
+    `eps`.  Cells with smaller radii can never be split again, so no points
+    are moved out of them when a new cell is made.  The other parameters are
+    as in `greedy`.
+    """
+    if eps <= 0:
+        raise ValueError("`eps` must be positive.")
+    return _prefix(M, seed, nbrconstant, moveconstant, workers, stats,
+                   eps=eps)
+
+
+def _prefix(M, seed, nbrconstant, moveconstant, workers, stats, k=inf,
+            eps=0):
+    """
+    Return the prefix of a greedy permutation of `M` with at most `k` points
+    and insertion radii at least `eps`.
+    """
+    output = []
+    if k < 1 or len(M) == 0:
+        return output
+    G = GreedyNeighborGraph(M,
+                            seed or next(iter(M)),
+                            nbrconstant,
+                            moveconstant,
+                            workers=workers,
+                            stats=stats)
+    G.minradius = eps
+    with G:
+        H = G.heap
+        root = H.findmax()
+        output.append((root.center, None, inf))
+        if stats is not None:
+            stats.step()
+        index = {root: 0}
+        while len(output) < k:
+            cell = H.findmax()
+            point = cell.farthest
+            if point is None or cell.radius < eps:
+                break
+            output.append((point, index[cell], cell.radius))
+            if stats is not None:
+                stats.step()
+            if len(output) < k:
+                newcell, transportplan = G.addcell(point, cell)
+                index[newcell] = len(output) - 1
+    return output
+
+
+class IncrementalGreedy:
+    """
+    A greedy permutation of a metric space `M` that grows over time.
+
+    New points are added to `M` with `add`.  The permutation is not
+    recomputed right away.  Instead, the longest prefix that is still a
+    greedy permutation of the larger set is kept.  A new point `p` changes the
+    permutation at the first point `x_j` whose insertion radius is less than
+    the distance from `p` to the points before `x_j`, because `p` would have
+    been chosen first.  The prefix before `x_j` keeps its order, its
+    predecessors, and its insertion radii.
+    The rest of the permutation is computed again only when it is needed.
+
+    The neighbor graph of the permutation is kept.  To compute the rest
+    again, the cells of the points after the prefix are removed with
+    `JournaledNeighborGraph.undo` in the reverse order that they were made,
+    so the graph is as it was at the end of the prefix.  The new points are
+    then added to the graph with `addpoint`, and the permutation resumes from
+    there.  The cost is proportional to the work done for the part of the
+    permutation that changed.
+    """
+    def __init__(self, M, seed=None, nbrconstant=1, moveconstant=1):
+        self.M = M
+        self.seed = seed
+        self.nbrconstant = nbrconstant
+        self.moveconstant = moveconstant
+        self._points, self._preds, self._radii = [], [], []
+        self._valid = 0
+        self._graph = None
+        # The cell of each point of the permutation, by position.
+        self._cells = []
+        # The points added since the permutation was last computed.
+        self._new = []
+        if len(M):
+            self._compute()
+
+    def _compute(self):
+        """
+        Compute the greedy permutation of all of the points.
+        """
+        M = self.M
+        G = self._graph = JournaledNeighborGraph(M,
+                                                 self.seed or next(iter(M)),
+                                                 self.nbrconstant,
+                                                 self.moveconstant)
+        root = G.heap.findmax()
+        self._points, self._preds, self._radii = [root.center], [None], [inf]
+        self._cells = [root]
+        self._new = []
+        self._resume()
+
+    def _resume(self):
+        """
+        Extend the permutation by the points of the graph that are not
+        centers yet.
+        """
+        M, H = self.M, self._graph.heap
+        index = {cell: i for i, cell in enumerate(self._cells)}
+        for i in range(len(self._points), len(M)):
+            cell = H.findmax()
+            point = cell.farthest
+            newcell, transportplan = self._graph.addcell(point, cell)
+            index[newcell] = i
+            self._cells.append(newcell)
+            self._points.append(point)
+            self._preds.append(index[cell])
+            self._radii.append(M.dist(point, cell.center))
+        self._valid = len(self._points)
+
+    def _update(self):
+        """
+        Remove the cells after the valid prefix from the graph, add the new
+        points, and compute the rest of the permutation.
+        """
+        if self._valid == 0:
+            self._compute()
+            return
+        G, j = self._graph, self._valid
+        for i in range(len(self._points) - 1, j - 1, -1):
+            G.undo()
+        for p in self._new:
+            G.addpoint(p)
+        self._new = []
+        del self._points[j:], self._preds[j:], self._radii[j:]
+        del self._cells[j:]
+        self._resume()
+
+    def add(self, p):
+        """
+        Add the point `p` to the metric space.
+
+        This computes the distances from `p` to the points of the prefix that
+        remains valid.
+        """
+        self.M.add(p)
+        if self._valid == 0:
+            return
+        self._new.append(p)
+        dist = inf
+        for j in range(self._valid):
+            if self._radii[j] < dist:
+                self._valid = j
+                return
+            dist = min(dist, self.M.dist(p, self._points[j]))
+
+    def extend(self, points):
+        """
+        Add each of the `points` to the metric space.
+        """
+        for p in points:
+            self.add(p)
+
+    def prefix(self):
+        """
+        Return the list of `(point, index, radius)` triples of the prefix of
+        the permutation that is still valid.  Nothing is recomputed.
+
+        The `index` is the position of the predecessor and `radius` is the
+        insertion radius (`inf` for the first point).
+        """
+        j = self._valid
+        return list(zip(self._points[:j], self._preds[:j], self._radii[:j]))
+
+    def greedy(self, tree=False, radii=False):
+        """
+        Return the list of the points in greedy order, recomputing the
+        permutation first if points were added since the last time.
+
+        If `tree` is set, the index of the predecessor is included with each
+        point.  If `radii` is set, the insertion radius is included.
+        """
+        if self._valid < len(self.M):
+            self._update()
+        output = []
+        for p, i, r in zip(self._points, self._preds, self._radii):
+            entry = [p]
+            if tree:
+                entry.append(i)
+            if radii:
+                entry.append(r)
+            output.append(entry[0] if len(entry) == 1 else tuple(entry))
+        return output
+
+    def __len__(self):
+        return len(self.M)
@@ -1,24 +1,42 @@
 import click
+import io
 import os
+from array import array
+from functools import partial
 from greedypermutation import Point
+from greedypermutation.metrics import ArrayMetricSpace
+from greedypermutation.point import PointArray
+from greedypermutation.pointio import read_npy, read_raw, read_text, \
+    write_lines
 from metricspaces import MetricSpace
 
 
 @click.command()
-@click.argument('pointsfile', type=click.File('r'))
+@click.argument('pointsfile', type=click.File('rb'))
 # @click.option('--outfile', type = click.Path(allow_dash = True),
 @click.option('--outfile', type=click.File('w'),
               default='-',
               help="Where to store the output.")
 @click.option('--algorithm',
-              type=click.Choice(['clarkson', 'quadratic'],
+              type=click.Choice(['clarkson', 'quadratic', 'vectorized'],
                                 case_sensitive=False),
               default='clarkson',
-              help='Which algorithm to use: `quadratic` or `clarkson`.')
+              help='Which algorithm to use: `quadratic`, `clarkson`, or '
+                   '`vectorized`.')
 @click.option('--tree/--notree',
               default=True,
               help='Include the entire tree in the output or not.')
-def cli(pointsfile, outfile, algorithm, tree):
+@click.option('--format', 'fmt',
+              type=click.Choice(['text', 'npy', 'raw'], case_sensitive=False),
+              default='text',
+              help='The format of the `pointsfile`: `text`, `npy`, or `raw`.')
+@click.option('--dim', type=int, default=None,
+              help='The dimension of the points in a `raw` file.')
+@click.option('--dedup/--nodedup',
+              default=True,
+              help='Collapse the duplicate points before the permutation is '
+                   'computed or not.')
+def cli(pointsfile, outfile, algorithm, tree, fmt, dim, dedup):
     """
     Compute a greedy permutation of the points in the `pointsfile`.
 
@@ -27,21 +45,80 @@ def cli(pointsfile, outfile, algorithm, tree):
     By default it will run the Clarkson algorithm.
     If `--algorithm quadratic` is specified, then the quadratic algorithm will
     be used.
+    If `--algorithm vectorized` is specified, then the array-backed version of
+    the Clarkson algorithm will be used.  It requires NumPy and treats the
+    points as Euclidean coordinates.
 
     The `--tree` and `--notree flags determine if the tree is included in the
     output.  This is managed by appending the index of the predecessor after
     a semicolon.
+
+    By default, the copies of each point are collapsed into one point with
+    `dedup.greedy` before the permutation is computed, and they are output
+    at the end, after their first copy.  Use `--nodedup` to skip this step
+    when the points are known to be distinct.
+
+    The `--format` is `text` (one point per line) by default.
+    It can also be `npy` for a NumPy array file with one point per row, or
+    `raw` for a binary file of native doubles, in which case the dimension
+    must be given with `--dim`.
+    The points are parsed in large blocks into a single buffer of floats and
+    the output is written in blocks.  If NumPy is installed, the algorithms
+    run on an `ArrayMetricSpace` that uses this buffer as its array, so no
+    objects are made for the points.
     """
-    M = MetricSpace()
-    M.fromstrings(pointsfile.readlines(), Point.fromstring)
+    if fmt == 'npy':
+        P = read_npy(pointsfile)
+        coords, dim = P.ravel(), P.shape[1]
+    elif fmt == 'raw':
+        if dim is None:
+            raise click.UsageError("`--dim` is required for `raw` files.")
+        coords, dim = read_raw(pointsfile, dim)
+    else:
+        text = io.TextIOWrapper(pointsfile)
+        coords, dim = read_text(text)
+        text.detach()
+
+    try:
+        import numpy as np
+    except ImportError:
+        if algorithm == 'vectorized':
+            raise
+        np = None
+    if np is None:
+        P = PointArray(coords, dim)
+        space, point = MetricSpace, lambda p: p
+    else:
+        P = np.frombuffer(coords) if isinstance(coords, array) else coords
+        P = np.asarray(P, dtype=float).reshape(-1, max(dim, 1))
+        if algorithm == 'vectorized':
+            space, point = np.asarray, lambda p: p
+        else:
+            space = partial(ArrayMetricSpace, lists=False)
+            point = P.__getitem__
 
     if algorithm == 'quadratic':
         import greedypermutation.quadraticgreedy as algo
+    elif algorithm == 'vectorized':
+        import greedypermutation.arraygreedy as algo
     else:
         import greedypermutation.clarksongreedy as algo
+    if dedup:
+        from greedypermutation.dedup import greedy
+        gp = greedy(P, space, algo.greedy, tree=tree)
+        point = P.__getitem__
+    else:
+        gp = algo.greedy(space(P), tree=tree)
     if tree:
-        for p, i in algo.greedy(M, tree=True):
-            outfile.write(str(p) + ';' + str(i) + '\n')
+        lines = (_str(point(p)) + ';' + str(i) for p, i in gp)
     else:
-        for p in algo.greedy(M):
-            outfile.write(str(p) + '\n')
+        lines = (_str(point(p)) for p in gp)
+    write_lines(outfile, lines)
+
+
+def _str(p):
+    """
+    Return the text form of the point `p`, which is either a `Point` or a
+    row of an array.
+    """
+    return str(p) if isinstance(p, Point) else str(Point(p))
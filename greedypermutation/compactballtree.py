@@ -0,0 +1,613 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from heapq import heappush, heappop
+from metricspaces import MetricSpace
+from greedypermutation.clarksongreedy import greedy
+from greedypermutation.balltree import Ball
+from greedypermutation.maxheap import MaxHeap
+from greedypermutation.point import PointArray
+
+
+"""
+This module contains a compact implementation of a ball tree.
+
+It represents the same trees as `balltree.Ball`, but instead of one Python
+object per node, the nodes are the integers `0, ..., 2n-2` and their data is
+stored in typed arrays.
+The root is node `0`.
+The two children of a node are always allocated together, so only the right
+child is stored; the left child is the node just before it.
+The centers are stored as indices into the list of points.
+
+A tree can be saved to a binary file and memory-mapped back with
+`CompactBallTree.load`.  The file starts with a 64 byte header:
+
+- the magic bytes `GPBTREE\\0`,
+- the format version, the flags, and the width in bytes of the stored
+  integers, as unsigned 32 bit integers, followed by 4 reserved bytes,
+- the number of nodes, the number of points, and the dimension of the
+  coordinates (or `0`) as unsigned 64 bit integers.
+
+Then, each padded to a multiple of 8 bytes, come the arrays `center`,
+`right`, `size` (integers) and `radius` (doubles) indexed by node, the arrays
+`order` (the index in the input of each point) and `pred` (the greedy order
+index of the predecessor of each point or `-1`) indexed by greedy order, and
+optionally the coordinates of the points as doubles.
+All values are stored in the byte order of the machine that wrote the file.
+"""
+
+_MAGIC = b'GPBTREE\0'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIIIQQQ')
+_HEADERSIZE = 64
+_COORDINATES = 1
+_BIGENDIAN = 2
+
+
+def compact_greedy_tree(M, seed=None, nbrconstant=1, moveconstant=1):
+    """
+    Return a `CompactBallTree` built from a greedy permutation of `M`.
+    """
+    gp = greedy(M, seed, tree=True, nbrconstant=nbrconstant,
+                moveconstant=moveconstant)
+    T = CompactBallTree.tree(gp, metric=M, size=len(M))
+    index = {p: i for i, p in enumerate(M)}
+    T.order = _indexarray(len(M), (index[p] for p in T.points))
+    return T
+
+
+def _indexarray(n, values=()):
+    """
+    Return an array of integers large enough to index `n` items.
+    """
+    return array('i' if n < 2 ** 31 else 'q', values)
+
+
+def _coordinates(points):
+    """
+    Return an array of the coordinates of `points`, or `None` if they are not
+    numbers or vectors of numbers of one dimension.
+    """
+    coords = array('d')
+    dim = None
+    try:
+        for p in points:
+            p = p if hasattr(p, '__iter__') else (p,)
+            length = len(coords)
+            coords.extend(p)
+            if dim is None:
+                dim = len(coords) - length
+            elif len(coords) - length != dim:
+                return None
+    except TypeError:
+        return None
+    return coords
+
+
+def _layout(buffer, coordinates):
+    """
+    Check the header of a file written by `save` and return the list of
+    `(start, end, typecode)` of its arrays and the dimension of the points.
+    If `coordinates` is set, then the coordinates must be stored and their
+    array is the last one.
+
+    A `ValueError` is raised if the file cannot be loaded.
+    """
+    magic, version, flags, itemsize, _, nodes, n, dim = \
+        _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError("Not a greedy tree file.")
+    if version != _VERSION:
+        raise ValueError("Unsupported greedy tree file version: "
+                         + str(version))
+    if bool(flags & _BIGENDIAN) != (sys.byteorder == 'big'):
+        raise ValueError("The file was written with a different byte "
+                         "order.")
+    if itemsize not in (4, 8):
+        raise ValueError("Unsupported integer size in the greedy tree "
+                         "file: " + str(itemsize))
+    typecode = 'i' if itemsize == 4 else 'q'
+    sections = [(nodes, typecode, itemsize)] * 3 + [(nodes, 'd', 8)] + \
+        [(n, typecode, itemsize)] * 2
+    if coordinates:
+        if not flags & _COORDINATES:
+            raise ValueError("The file has no coordinates, so the points "
+                             "must be given.")
+        sections.append((n * dim, 'd', 8))
+    layout, offset = [], _HEADERSIZE
+    for length, code, size in sections:
+        start, offset = offset, offset + length * size
+        layout.append((start, offset, code))
+        offset += -offset % 8
+    if layout[-1][1] > len(buffer):
+        raise ValueError("The greedy tree file is truncated.")
+    return layout, dim
+
+
+class CompactBallTree:
+    """
+    A CompactBallTree stores a ball tree in the following arrays indexed by
+    node.
+
+    - `center`: the index in `points` of the center.
+    - `right`: the right child, or `-1` for a leaf.  The left child is
+      `right - 1`.
+    - `radius`: the radius.
+    - `size`: the number of points in the subtree.
+
+    If the tree is built from a greedy permutation, `points` is in greedy
+    order and the optional `order` array holds the index of each point in the
+    input.
+    """
+    def __init__(self, points, center, right, radius=None, size=None,
+                 metric=None, order=None):
+        self.points = points
+        self.center = center
+        self.right = right
+        self.order = order
+        self.metric = MetricSpace() if metric is None else metric
+        if radius is None or size is None:
+            n = len(center)
+            self.radius = array('d', bytes(8 * n))
+            self.size = array(center.typecode, bytes(center.itemsize * n))
+            self.update()
+        else:
+            self.radius = radius
+            self.size = size
+
+    @classmethod
+    def tree(cls, agp, metric=None, size=0):
+        """
+        Build a compact tree from an augmented greedy permutation `agp`.
+
+        The augmented greedy permutation is given as an iterable of pairs
+        `(p, i)` where `p` is a new point and `i` is the index of its
+        predecessor, as output by `greedy(M, tree=True)`.
+        The optional `size` is the number of points, if it is known, and is
+        only used to pick the width of the integer arrays.
+        """
+        points = []
+        center = _indexarray(2 * size)
+        right = _indexarray(2 * size)
+        leaf = _indexarray(2 * size)
+        for p, i in agp:
+            j = len(points)
+            points.append(p)
+            if i is None:
+                center.append(j)
+                right.append(-1)
+                leaf.append(0)
+            else:
+                node, child = leaf[i], len(center)
+                center.extend((i, j))
+                right.extend((-1, -1))
+                right[node] = child + 1
+                leaf[i] = child
+                leaf.append(child + 1)
+        return cls(points, center, right, metric=metric)
+
+    @classmethod
+    def fromball(cls, ball):
+        """
+        Return a compact copy of the ball tree rooted at `ball`.
+        """
+        points, index = [], {}
+        center, right = _indexarray(2 * len(ball)), _indexarray(2 * len(ball))
+        radius, size = array('d'), _indexarray(2 * len(ball))
+        stack = [(ball, 0)]
+        center.append(0)
+        right.append(-1)
+        radius.append(0)
+        size.append(0)
+        while stack:
+            b, node = stack.pop()
+            if b.center not in index:
+                index[b.center] = len(points)
+                points.append(b.center)
+            center[node] = index[b.center]
+            radius[node] = b.radius
+            size[node] = len(b)
+            if not b.isleaf():
+                child = len(center)
+                right[node] = child + 1
+                center.extend((0, 0))
+                right.extend((-1, -1))
+                radius.extend((0, 0))
+                size.extend((0, 0))
+                stack.append((b.left, child))
+                stack.append((b.right, child + 1))
+        return cls(points, center, right, radius, size, ball.metric)
+
+    def toball(self):
+        """
+        Return a copy of the tree made of `balltree.Ball` objects.
+        """
+        BallTree = Ball(self.metric)
+        root = BallTree(self.points[self.center[0]])
+        stack = [(root, 0)]
+        while stack:
+            b, node = stack.pop()
+            b.radius = self.radius[node]
+            b._len = self.size[node]
+            r = self.right[node]
+            if r >= 0:
+                b.left = BallTree(self.points[self.center[r - 1]])
+                b.right = BallTree(self.points[self.center[r]])
+                stack.append((b.left, r - 1))
+                stack.append((b.right, r))
+        return root
+
+    def predecessors(self):
+        """
+        Return an array with the index of the predecessor of each point in
+        `points` or `-1` for the first point.
+
+        The predecessor of the center of a right child is the center of its
+        parent.
+        """
+        pred = array(self.center.typecode, [-1]) * len(self.points)
+        for node in range(len(self.center)):
+            r = self.right[node]
+            if r >= 0:
+                pred[self.center[r]] = self.center[node]
+        return pred
+
+    def save(self, path, coordinates=None):
+        """
+        Write the tree to the file at `path` in the format described in the
+        module documentation.
+
+        If `coordinates` is set, then the points are stored as vectors of
+        floats, so the tree can be loaded without them.  A `ValueError` is
+        raised if the points are not vectors of one dimension.  By default,
+        the coordinates are stored only if the points are such vectors.
+        """
+        n = len(self.points)
+        order = self.order
+        if order is None:
+            order = array(self.center.typecode, range(n))
+        arrays = [self.center, self.right, self.size, self.radius, order,
+                  self.predecessors()]
+        flags = _BIGENDIAN if sys.byteorder == 'big' else 0
+        dim = 0
+        if coordinates or coordinates is None:
+            coords = _coordinates(self.points)
+            if coords is not None:
+                flags |= _COORDINATES
+                dim = len(coords) // n if n else 0
+                arrays.append(coords)
+            elif coordinates:
+                raise ValueError("The points are not vectors of one "
+                                 "dimension, so their coordinates cannot be "
+                                 "stored.  Use `coordinates=False`.")
+        with open(path, 'wb') as f:
+            header = _HEADER.pack(_MAGIC, _VERSION, flags,
+                                  self.center.itemsize, 0,
+                                  len(self.center), n, dim)
+            f.write(header.ljust(_HEADERSIZE, b'\0'))
+            for a in arrays:
+                data = memoryview(a).cast('B')
+                f.write(data)
+                f.write(bytes(-len(data) % 8))
+
+    @classmethod
+    def load(cls, path, points=None, metric=None):
+        """
+        Memory-map a tree written by `save` and return it.
+
+        The arrays of the tree are views of the file, so loading does not
+        depend on the size of the tree and processes that load the same file
+        share one copy of it in the page cache.
+
+        If `points` is given, it is the collection of input points in their
+        original order.  Otherwise, the coordinates stored in the file are
+        used and each point is created as a `Point` when it is accessed.
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _HEADERSIZE:
+                raise ValueError("Not a greedy tree file.")
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            layout, dim = _layout(buffer, points is None)
+        except ValueError:
+            buffer.close()
+            raise
+        view = memoryview(buffer)
+        center, right, size, radius, order, pred, *coords = [
+            view[start:end].cast(code) for start, end, code in layout]
+        if points is not None:
+            points = _Permuted(points, order)
+        else:
+            points = PointArray(coords[0], dim)
+        if metric is None:
+            metric = MetricSpace(turnoffcache=True)
+        T = cls(points, center, right, radius, size, metric, order)
+        T.pred = pred
+        T._buffer = buffer
+        return T
+
+    def update(self):
+        """
+        Compute the `radius` and `size` of every node.
+
+        Every child has a larger index than its parent, so the nodes are
+        processed in reverse order.
+        """
+        for node in reversed(range(len(self.center))):
+            r = self.right[node]
+            if r < 0:
+                self.radius[node] = 0
+                self.size[node] = 1
+            else:
+                self.size[node] = self.size[r - 1] + self.size[r]
+                self.radius[node] = max(
+                    self.radius[r - 1],
+                    self.farthest(self.points[self.center[node]], r))
+
+    def dist(self, node, q):
+        """
+        Return the distance from the center of `node` to `q`.
+        """
+        return self.metric.dist(self.points[self.center[node]], q)
+
+    def isleaf(self, node):
+        return self.right[node] < 0
+
+    def __len__(self):
+        return self.size[0]
+
+    def __iter__(self):
+        return self._points(0)
+
+    def _points(self, node):
+        """
+        Iterate over the points in the subtree rooted at `node`.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            r = self.right[node]
+            if r < 0:
+                yield self.points[self.center[node]]
+            else:
+                stack.append(r)
+                stack.append(r - 1)
+
+    def _heap(self, q):
+        """
+        Return a heap ordered by decreasing radius containing the root.
+
+        The entries are `(-radius, node, distance to q)`.
+        """
+        return [(-self.radius[0], 0, self.dist(0, q))]
+
+    def farthest(self, q, node=0):
+        """
+        Find the distance from `q` to the farthest point in the subtree
+        rooted at `node`.
+        """
+        best = 0
+        stack = [(node, self.dist(node, q))]
+        while stack:
+            node, d = stack.pop()
+            best = max(best, d)
+            r = self.right[node]
+            if r >= 0 and d + self.radius[node] > best:
+                stack.append((r - 1, d))
+                stack.append((r, self.dist(r, q)))
+        return best
+
+    def nn(self, query):
+        """
+        Return the point in the ball tree that is closest to the query.
+        """
+        return self.ann(query, 1)
+
+    def ann(self, query, approx=1):
+        """
+        Return a point in the ball tree whose distance to the query is within
+        a factor of `approx` of the nearest.
+        """
+        H = self._heap(query)
+        nbr, radius = 0, H[0][2]
+        while H:
+            _, node, d = heappop(H)
+            r = self.right[node]
+            if r >= 0:
+                dr = self.dist(r, query)
+                if dr < radius:
+                    nbr, radius = r, dr
+                for child, dc in ((r - 1, d), (r, dr)):
+                    if dc - self.radius[child] <= radius / approx:
+                        heappush(H, (-self.radius[child], child, dc))
+        return self.points[self.center[nbr]]
+
+    def farthest_point(self, query):
+        """
+        Return the point in the ball tree that is farthest from the query.
+        """
+        H = self._heap(query)
+        nbr, radius = 0, H[0][2]
+        while H:
+            _, node, d = heappop(H)
+            if d > radius:
+                nbr, radius = node, d
+            r = self.right[node]
+            if r >= 0:
+                for child, dc in ((r - 1, d), (r, self.dist(r, query))):
+                    if dc + self.radius[child] > radius:
+                        heappush(H, (-self.radius[child], child, dc))
+        return self.points[self.center[nbr]]
+
+    def _range_search(self, center, radius, slack=0):
+        """
+        Iterate over the maximal nodes contained in
+        `ball(center, radius + slack)`.
+        """
+        H = self._heap(center)
+        while H:
+            _, node, d = heappop(H)
+            if d + self.radius[node] <= radius + slack:
+                yield node
+            else:
+                r = self.right[node]
+                if r >= 0:
+                    for child, dc in ((r - 1, d), (r, self.dist(r, center))):
+                        if dc - self.radius[child] <= radius:
+                            heappush(H, (-self.radius[child], child, dc))
+
+    def range_search(self, center, radius, slack=0):
+        """
+        Iterate over the points in `ball(center, radius)`.
+        The output may include points contained in the slightly larger ball:
+        `ball(center, radius + slack)`.
+        """
+        for node in self._range_search(center, radius, slack):
+            yield from self._points(node)
+
+    def range_count(self, center, radius, slack=0):
+        """
+        Return the number of points in `ball(center, radius)`.
+        """
+        return sum(self.size[node]
+                   for node in self._range_search(center, radius, slack))
+
+    def approx_range_search(self, center, radius, approx):
+        """
+        Iterate over the points `ball(center, radius)`.
+        The output may include points contained in the slightly larger ball:
+        `ball(center, radius * approx)`.
+        """
+        yield from self.range_search(center, radius, (approx - 1) * radius)
+
+    def approx_range_count(self, center, radius, approx):
+        """
+        Return the number of points in `ball(center, radius)`.
+        The output may include points contained in the slightly larger ball:
+        `ball(center, radius * approx)`.
+        """
+        return self.range_count(center, radius, (approx - 1) * radius)
+
+    def _knn(self, k, query, approx):
+        assert approx >= 1
+        N = _KNNHeap(self, query, k)
+        H = self._heap(query)
+        N.insert(0, H[0][2])
+        close_enough = (approx - 1) / 4
+
+        while H:
+            entry = heappop(H)
+            _, node, d = entry
+            if self.radius[node] <= close_enough * N.radius:
+                heappush(H, entry)
+                break
+            r = self.right[node]
+            dr = self.dist(r, query)
+            if node in N:
+                N.refine(node, d, dr)
+            else:
+                N.insert(r - 1, d)
+                N.insert(r, dr)
+                N.tighten()
+            for child, dc in ((r - 1, d), (r, dr)):
+                if dc - self.radius[child] <= N.radius:
+                    heappush(H, (-self.radius[child], child, dc))
+        return N, H
+
+    def knn_dist(self, k, query, approx=1):
+        N, _ = self._knn(k, query, approx)
+        return N.radius
+
+    def knn(self, k, query, approx=1):
+        """
+        Iterate over the k nearest points to the give query.
+
+        For an approximation, the output will be a set of at least k points in
+        the ball of radius `approx` times the distance to the true k nearest
+        neighbors.
+        """
+        N, H = self._knn(k, query, approx)
+        R = N.radius
+        while H:
+            _, node, d = heappop(H)
+            if d - self.radius[node] <= R:
+                yield from self._points(node)
+
+    def height(self):
+        """
+        Return the number of nodes on the longest root to leaf path.
+        """
+        depth = array('i', bytes(4 * len(self.center)))
+        depth[0] = 1
+        for node in range(len(self.center)):
+            r = self.right[node]
+            if r >= 0:
+                depth[r - 1] = depth[r] = depth[node] + 1
+        return max(depth)
+
+
+class _Permuted:
+    """
+    A view of the sequence `points` in the order given by `order`.
+    """
+    def __init__(self, points, order):
+        self.points = points
+        self.order = order
+
+    def __getitem__(self, index):
+        return self.points[self.order[index]]
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class _KNNHeap(MaxHeap):
+    """
+    The same as `knnheap.KNNHeap`, but for the nodes of a `CompactBallTree`.
+    The distance from the query to the center of each node is passed in, so
+    that it is not recomputed.
+    """
+    def __init__(self, tree, query, k):
+        super().__init__()
+        self.tree = tree
+        self.query = query
+        self.k = k
+        self.weight = 0
+
+    @property
+    def radius(self):
+        return self.priority(self.findmax())
+
+    def insert(self, node, d):
+        super().insert(node, d + self.tree.radius[node])
+        self.weight += self.tree.size[node]
+
+    def remove(self, node):
+        upper_bound = self.priority(node)
+        super().remove(node)
+        self.weight -= self.tree.size[node]
+        return upper_bound
+
+    def refine(self, node, d, dr):
+        """
+        Replace `node` by its children, whose centers are at distances `d` and
+        `dr` from the query.
+        """
+        ub = self.remove(node)
+        r = self.tree.right[node]
+        for child, dc in ((r - 1, d), (r, dr)):
+            super().insert(child, min(ub, dc + self.tree.radius[child]))
+            self.weight += self.tree.size[child]
+        self.tighten()
+
+    def tighten(self):
+        size = self.tree.size
+        while self.weight - size[self.findmax()] >= self.k:
+            self.weight -= size[self.findmax()]
+            self.removemax()
@@ -0,0 +1,167 @@
+from metricspaces import MetricSpace
+
+
+"""
+This module collapses the exact duplicates of a point set before a greedy
+permutation is computed.
+
+The distinct points are found by hashing, and each one gets the total mass
+of its copies.  The greedy permutation of the distinct points, computed with
+these masses, is then expanded back to the indices of the input.  The copies
+that were dropped come at the end of the permutation, because their insertion
+radius is zero, and the predecessor of each copy is its first occurrence.
+
+The cost of the greedy permutation then depends on the number of distinct
+points rather than on the number of input points.
+"""
+
+
+def _key(p):
+    """
+    Return a hashable key for the point `p`.  Points that cannot be hashed,
+    such as lists or rows of an array, are turned into tuples.
+    """
+    try:
+        hash(p)
+        return p
+    except TypeError:
+        return tuple(p)
+
+
+class Deduplicated:
+    """
+    The distinct points of a sequence and their multiplicities.
+
+    - `points` is the list of distinct points in the order of their first
+      occurrence, or an array of rows if the input is a NumPy array.
+    - `mass` is the list of the total masses of the copies of each distinct
+      point.  Each copy has mass one unless a `mass` list is given.
+    - `inverse` is the list of the index of the distinct point of each input
+      point.
+    - `first` is the list of the input index of the first copy of each
+      distinct point.
+    """
+    def __init__(self, points, mass=None):
+        if hasattr(points, 'ndim') and points.ndim == 2:
+            self._fromarray(points, mass)
+            return
+        points = list(points)
+        if mass is not None and len(mass) != len(points):
+            raise ValueError("`mass` must of same length as `points`")
+        index = {}
+        self.points, self.mass, self.first, self.inverse = [], [], [], []
+        for i, p in enumerate(points):
+            k = _key(p)
+            j = index.get(k)
+            if j is None:
+                j = index[k] = len(self.points)
+                self.points.append(p)
+                self.first.append(i)
+                self.mass.append(0)
+            self.inverse.append(j)
+            self.mass[j] += 1 if mass is None else mass[i]
+
+    def _fromarray(self, P, mass):
+        """
+        Find the distinct rows of the array `P` with `numpy.unique`.  The rows
+        are put back in the order of their first occurrence.
+        """
+        import numpy as np
+        if mass is not None and len(mass) != len(P):
+            raise ValueError("`mass` must of same length as `points`")
+        _, first, inverse, counts = np.unique(P, axis=0, return_index=True,
+                                              return_inverse=True,
+                                              return_counts=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        inverse = rank[inverse.reshape(-1)]
+        self.first = first[order].tolist()
+        self.inverse = inverse.tolist()
+        self.points = P[first[order]]
+        if mass is None:
+            self.mass = counts[order].tolist()
+        else:
+            self.mass = np.bincount(inverse, weights=mass,
+                                    minlength=len(order)).tolist()
+
+    def copies(self, j):
+        """
+        Return the list of the input indices of the copies of the distinct
+        point `j`, in input order.
+        """
+        return [i for i, k in enumerate(self.inverse) if k == j]
+
+    def expand(self, order, tree=False):
+        """
+        Return the list of input indices for a permutation `order` of the
+        indices of the distinct points.
+
+        The first copies are in the order of `order`.  They are followed by
+        the other copies, grouped by their distinct points in the same order.
+        If `tree` is set, `order` holds `(index, predecessor)` pairs, where
+        `predecessor` is a position in `order`, and the output holds
+        `(input index, predecessor)` pairs.  The predecessor of each later
+        copy is the position of its first copy.
+        """
+        order = list(order)
+        later = [[] for j in self.first]
+        for i, j in enumerate(self.inverse):
+            if i != self.first[j]:
+                later[j].append(i)
+        if tree:
+            output = [(self.first[j], pred) for j, pred in order]
+            order = [j for j, pred in order]
+        else:
+            output = [self.first[j] for j in order]
+        for position, j in enumerate(order):
+            for i in later[j]:
+                output.append((i, position) if tree else i)
+        return output
+
+    def __len__(self):
+        return len(self.first)
+
+
+def greedy(points, space=None, algorithm=None, mass=None, seed=None,
+           tree=False, **kwargs):
+    """
+    Return the list of the indices of `points` ordered by a greedy
+    permutation, computed on the distinct points only.
+
+    The metric space of the distinct points is made by `space`, which is
+    `ArrayMetricSpace` for a NumPy array and `MetricSpace` otherwise.  The
+    greedy permutation is computed by `algorithm`, which is
+    `clarksongreedy.greedy` by default.  It is given the masses of the
+    distinct points as `mass` and the other keyword arguments.
+    The optional `seed` is the index of the first input point.
+
+    If `tree` is set, the list holds `(index, predecessor)` pairs, where the
+    `predecessor` is a position in the list.  See `Deduplicated.expand`.
+    The `pointtree` and `gettransportplan` outputs are not supported, because
+    they refer to the distinct points.
+    """
+    for name in ('pointtree', 'gettransportplan'):
+        if kwargs.get(name):
+            raise ValueError("`" + name + "` is not supported by "
+                             "`dedup.greedy`.")
+    D = Deduplicated(points, mass)
+    if space is None:
+        if hasattr(points, 'ndim'):
+            from greedypermutation.metrics import ArrayMetricSpace
+            space = ArrayMetricSpace
+        else:
+            space = MetricSpace
+    if algorithm is None:
+        from greedypermutation.clarksongreedy import greedy as algorithm
+    M = space(D.points)
+    distinct = list(M)
+    index = {_key(p): j for j, p in enumerate(distinct)}
+    if seed is not None:
+        seed = distinct[D.inverse[seed]]
+    gp = algorithm(M, seed=seed, tree=True, mass=D.mass, **kwargs)
+    if tree:
+        order = [(index[_key(p)], i) for p, i in gp]
+    else:
+        order = [index[_key(p)] for p, i in gp]
+    return D.expand(order, tree)
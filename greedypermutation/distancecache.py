@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from greedypermutation.metrics import dists
+
+
+"""
+This module contains a bounded cache of distances for expensive metrics.
+
+A `CachedMetric` wraps a metric space and stores the distances it computes.
+Pass it in place of the metric space, for example to `greedy_tree`, and the
+same cache is used to build the neighbor graph and to compute the radii of
+the tree.  The underlying metric space should not cache its own distances,
+for example a `MetricSpace` made with `turnoffcache=True`.
+"""
+
+
+_MISSING = object()
+
+
+class CachedMetric:
+    """
+    A proxy for a metric space that caches at most `maxsize` distances.
+
+    The pairs are found by `key(point)`, which is the identity of the point
+    by default.  For points given by indices, or any other values that can
+    be compared, `key` can be the identity function.  Two equal points that
+    are different objects are different keys for the default key.  Each
+    cached distance keeps references to its two points, so the `id` of a
+    point cannot be reused by a new object while its distances are cached.
+
+    The `policy` chooses which distance is evicted when the cache is full.
+
+    - `'lru'`: the least recently used distance.
+    - `'clock'`: the next distance under the clock hand that has not been
+      used since the hand last passed it.  This approximates LRU, but a hit
+      only sets a flag and does not reorder the cache.  A new distance is
+      not marked as used until its first hit, so distances that are only
+      computed once are evicted first.
+
+    If `maxsize` is `None`, the cache is not bounded.
+    The `hits`, `misses` and `evictions` are counted.
+    Everything other than the distances is passed through to `metric`.
+    """
+    def __init__(self, metric, maxsize=1 << 20, policy='lru', key=id):
+        if policy not in ('lru', 'clock'):
+            raise ValueError("The policy must be 'lru' or 'clock'.")
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("The cache must hold at least one distance.")
+        self.metric = metric
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key
+        if policy == 'clock' and maxsize is not None:
+            self._get, self._put = self._clock_get, self._clock_put
+        else:
+            self._get, self._put = self._lru_get, self._lru_put
+        self.clear()
+
+    def clear(self):
+        """
+        Remove all of the distances and set the counters back to zero.
+        """
+        self.hits = self.misses = self.evictions = 0
+        self._cache = OrderedDict()
+        # The slots of the clock.
+        self._keys, self._values, self._used = [], [], bytearray()
+        self._hand = 0
+
+    def info(self):
+        """
+        Return a dictionary of the counters and the size of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._cache),
+                'maxsize': self.maxsize}
+
+    def _pair(self, a, b):
+        ka, kb = self.key(a), self.key(b)
+        return (ka, kb) if ka <= kb else (kb, ka)
+
+    def _lru_get(self, k):
+        value = self._cache.get(k, _MISSING)
+        if value is not _MISSING:
+            self._cache.move_to_end(k)
+        return value
+
+    def _lru_put(self, k, value):
+        cache = self._cache
+        cache[k] = value
+        if self.maxsize is not None and len(cache) > self.maxsize:
+            cache.popitem(last=False)
+            self.evictions += 1
+
+    def _clock_get(self, k):
+        slot = self._cache.get(k)
+        if slot is None:
+            return _MISSING
+        self._used[slot] = 1
+        return self._values[slot]
+
+    def _clock_put(self, k, value):
+        keys, values, used = self._keys, self._values, self._used
+        slot = self._cache.get(k)
+        if slot is not None:
+            values[slot] = value
+            return
+        if len(keys) < self.maxsize:
+            self._cache[k] = len(keys)
+            keys.append(k)
+            values.append(value)
+            used.append(0)
+            return
+        # Give every recently used distance a second chance.
+        hand = self._hand
+        while used[hand]:
+            used[hand] = 0
+            hand = (hand + 1) % self.maxsize
+        del self._cache[keys[hand]]
+        self.evictions += 1
+        self._cache[k] = hand
+        keys[hand], values[hand], used[hand] = k, value, 0
+        self._hand = (hand + 1) % self.maxsize
+
+    def dist(self, a, b):
+        k = self._pair(a, b)
+        entry = self._get(k)
+        if entry is _MISSING:
+            self.misses += 1
+            value = self.metric.dist(a, b)
+            self._put(k, (value, a, b))
+            return value
+        self.hits += 1
+        return entry[0]
+
+    def dists(self, a, points):
+        """
+        Return the distances from `a` to each of the `points`.
+
+        The distances that are not in the cache are computed in one batch.
+        """
+        points = list(points)
+        keys = [self._pair(a, p) for p in points]
+        entries = [self._get(k) for k in keys]
+        values = [None if entry is _MISSING else entry[0]
+                  for entry in entries]
+        missing = [i for i, entry in enumerate(entries) if entry is _MISSING]
+        self.hits += len(points) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = dists(self.metric, a, [points[i] for i in missing])
+            for i, value in zip(missing, computed):
+                values[i] = value
+                self._put(keys[i], (value, a, points[i]))
+        return values
+
+    def rankdists(self, a, points):
+        return self.dists(a, points)
+
+    rankpower = 1
+
+    def distsq(self, a, b):
+        return self.dist(a, b) ** 2
+
+    def comparedist(self, x, a, b, delta=0, alpha=1):
+        return self.dist(x, a) < alpha * self.dist(x, b) - delta
+
+    def distlt(self, a, b, delta=0):
+        return self.dist(a, b) < delta
+
+    def __iter__(self):
+        return iter(self.metric)
+
+    def __len__(self):
+        return len(self.metric)
+
+    def __contains__(self, point):
+        return point in self.metric
+
+    def __getattr__(self, name):
+        return getattr(self.metric, name)
@@ -1,6 +1,5 @@
-import logging
+from heapq import heappop, heappush
 from math import log2, floor, inf
-from collections import defaultdict
 
 
 class BucketQueue:
@@ -12,28 +11,39 @@ class BucketQueue:
 
     When inserting an item, if the level is within num_buckets of the current max level,
     then the item is inserted into the corresponding bucket.
-    Else, it goes on the backburner.
+    Else, it goes on the backburner, which is also grouped by level.
     Removemax pops the largest bucket.
+
+    The number of items and the max level are maintained as the queue
+    changes.  The levels of the buckets are also kept in a heap, so when the
+    top bucket empties, the next level is found without scanning all of the
+    buckets.  Each level is in the heap at most once, even if its bucket is
+    emptied and made again.  After that, the levels of the backburner that are now within
+    num_buckets of the max level are moved back into the queue.
+    If the queue is empty, the whole top of the backburner is moved back.
     """
 
     def __init__(
         self,
         items=(),
         key=lambda x: x,
-        bucket_size=1,
+        bucket_size=2,
         num_buckets=None,
     ):
-        self.buckets = defaultdict(set)                                         # maps levels to buckets
-        self.levels = dict()                                                    # maps items to levels
-        if bucket_size < 1:
-            logging.error(f"Bucket parameter passed is {bucket_size}.")
+        if bucket_size <= 1:
             raise RuntimeError("Bucket size should be greater than 1.")
-        self.bucket_size = bucket_size  # should be greater than 1
+        self.buckets = dict()                                                   # maps levels to buckets
+        self.backburner = dict()                                                # maps levels to buckets
+        self.levels = dict()                                                    # maps items to levels
+        self.bucket_size = bucket_size
         self.key = key
         self.num_buckets = inf if num_buckets is None else num_buckets
+        self._logbase = log2(bucket_size)
+        self._order = []                                                        # negated levels of the buckets
+        self._ordered = set()                                                   # levels in _order
+        self._maxlevel = None
         for item in items:
             self.insert(item, key(item))
-        logging.debug(f"Number of buckets at construction is {len(self.buckets)}")
 
     def insert(self, item, priority=None):
         """
@@ -41,30 +51,27 @@ class BucketQueue:
         """
         if priority is None:
             priority = self.key(item)
-        # Compute the level to insert item.
         level = self._bucket(priority)
-        # Check if item should go on the backburner
-        if self._too_small(level):
-            level = "bb"
-        # else add it to bucket on main queue
         self.levels[item] = level
-        self.buckets[level].add(item)
+        if self._too_small(level):
+            self.backburner.setdefault(level, set()).add(item)
+        else:
+            self._add(item, level)
 
     def findmax(self):
         """
         Return an item from the bucket with the highest level in the queue without removing it.
+        A RuntimeError is raised if the queue is empty.
         """
-        max_level = self.maxlevel()
-        max_item = next(iter(self.buckets[max_level]))
-        return max_item
+        if self._maxlevel is None:
+            raise RuntimeError("Bucket queue is empty.")
+        return next(iter(self.buckets[self._maxlevel]))
 
     def removemax(self):
         """
         Remove an arbitrary item from the bucket with highest level in the queue.
         A RuntimeError is raised if the queue is empty.
         """
-        if len(self) == 0:
-            raise RuntimeError("Bucket queue is empty.")
         output = self.findmax()
         self._remove_item(output)
         return output
@@ -72,82 +79,127 @@ class BucketQueue:
     def changepriority(self, item, priority=None):
         """
         Update the priority of an existing item to the input priority.
+        Nothing moves if the item stays at the same level.
         """
+        if priority is None:
+            priority = self.key(item)
+        if self.levels.get(item) == self._bucket(priority):
+            return
         self._remove_item(item)
         self.insert(item, priority)
 
-    def _remove_item(self, item):
+    def changepriority_many(self, items):
         """
-        Remove given item from its bucket in the queue.
-        A RuntimeError is raised if the item is not in the queue.
+        Recompute the priorities of all of the `items` from the key.
         """
-        if item not in self.levels:
-            raise RuntimeError("Removing non-existent item")
-        level = self.levels[item]
-        if item not in self.buckets[level]:
-            raise RuntimeError("Removing non-existent item")
-        del self.levels[item]
-        self.buckets[level].remove(item)
-        if self._bucket_empty(level):
-            self._remove_bucket(level)
+        for item in items:
+            self.changepriority(item)
 
-    def _remove_bucket(self, level):
+    def remove(self, item):
         """
-        Remove bucket for given level from the queue.
+        Remove `item` from the queue.
         """
-        if level in self.buckets:
-            del self.buckets[level]
+        self._remove_item(item)
 
-    def _bucket_empty(self, level):
+    def maxlevel(self):
         """
-        Return True if the bucket for given level is empty.
+        Return the level of the top-most bucket in the queue, or `None` if
+        the queue is empty.
         """
-        return len(self.buckets[level]) == 0
+        return self._maxlevel
 
-    def _has_buckets(self):
+    def maxpriority(self):
         """
-        Return True if the queue has a non-zero number of buckets.
+        Return the largest priority, as given by the key, of an item in the
+        bucket with the highest level.
+
+        The item returned by `findmax` is within a factor of `bucket_size` of
+        this priority.
         """
-        return len({x for x in self.buckets} - {"bb"}) > 0
+        self.findmax()
+        return max(self.key(item) for item in self.buckets[self._maxlevel])
 
-    def maxlevel(self):
+    def _add(self, item, level):
         """
-        Compute the level of the top-most bucket in the queue.
+        Add the item to the bucket of the given level in the main queue.
         """
-        max_level = max(self.buckets)
-        while self._bucket_empty(max_level) and self._has_buckets():
-            self._remove_bucket(max_level)
-            max_level -= 1
-        if not self._has_buckets():
-            # SID: Need to check backburner in this case
-            self._pop_bb()
-            return self.maxlevel()
-        return max_level
+        bucket = self.buckets.get(level)
+        if bucket is None:
+            bucket = self.buckets[level] = set()
+            if level not in self._ordered:
+                self._ordered.add(level)
+                heappush(self._order, -level)
+        bucket.add(item)
+        if self._maxlevel is None or level > self._maxlevel:
+            self._maxlevel = level
 
-    def _pop_bb(self):
+    def _remove_item(self, item):
         """
-        Pop an item from the backburner and insert it in the main queue.
-        Raises a RuntimeError if the backburner is empty.
+        Remove given item from its bucket in the queue.
+        A RuntimeError is raised if the item is not in the queue.
         """
-        bb = self.buckets['bb']
-        if len(bb) == 0:
-            raise RuntimeError("Backburner is empty.")
-        # pop off bb
-        item = bb.pop()
-        # add to main queue
-        self.insert(item)
+        if item not in self.levels:
+            raise RuntimeError("Removing non-existent item")
+        level = self.levels.pop(item)
+        bucket = self.buckets.get(level)
+        if bucket is not None and item in bucket:
+            bucket.remove(item)
+            if not bucket:
+                del self.buckets[level]
+                if level == self._maxlevel:
+                    self._drop_maxlevel()
+        else:
+            bucket = self.backburner[level]
+            bucket.remove(item)
+            if not bucket:
+                del self.backburner[level]
+
+    def _drop_maxlevel(self):
+        """
+        Find the new max level after the top bucket is emptied and refill
+        the queue from the backburner.
+        """
+        order, buckets = self._order, self.buckets
+        # The heap of levels may hold levels of buckets that were emptied.
+        while order and -order[0] not in buckets:
+            self._ordered.discard(-heappop(order))
+        self._maxlevel = -order[0] if order else None
+        self._refill()
+
+    def _refill(self):
+        """
+        Move the levels of the backburner that are within num_buckets of the
+        max level into the main queue.
+        If the main queue is empty, the max level of the backburner is used.
+        """
+        if not self.backburner:
+            return
+        top = self._maxlevel
+        if top is None:
+            top = max(self.backburner)
+        for level in [l for l in self.backburner if top - l <= self.num_buckets]:
+            for item in self.backburner.pop(level):
+                self._add(item, level)
 
     def _too_small(self, level):
         """
-        Return True if the input bucket level is so small that it should be put on the bucket queue.
+        Return True if the input bucket level is so small that it should be put on the backburner.
         """
-        return self.maxlevel() - level > self.num_buckets
+        return self._maxlevel is not None and \
+            self._maxlevel - level > self.num_buckets
 
     def _bucket(self, priority):
         """
         Compute the relevant bucket for an item given its priority.
         """
-        return floor(log2(priority + 1e-8) / log2(self.bucket_size))
+        return floor(log2(priority + 1e-8) / self._logbase)
 
     def __len__(self):
-        return sum(len(bucket) for bucket in self.buckets)
+        return len(self.levels)
+
+    def __contains__(self, item):
+        return item in self.levels
+
+    def __iter__(self):
+        while self.levels:
+            yield self.removemax()
@@ -10,16 +10,18 @@ def fvm_greedy(
     inp_trees: list[Ball],
     params: TreeParameters = TreeParameters(1, 1, 1, 1),
     space: MetricSpace = None,
+    stats=None,
 ) -> Ball:
     """
     Given a MetricSpace preprocessed into a list of greedy trees, run Clarkson's algorithm on these trees.
     This is an implementation of Clarkson's algorithm for the Finite Voronoi Method.
     The output is a greedy tree obtained by merging the input trees.
+    If a `Stats` object is given as `stats`, the heap operations and nodes moved are counted in it.
     """
     move_const, nbr_const, tidy_const, bucket_size = params
     if space is None:
         space = MetricSpace(inp_trees[0].center)
-    nbr_graph = GreedyFVMNeighborGraph(inp_trees, params, space)
+    nbr_graph = GreedyFVMNeighborGraph(inp_trees, params, space, stats)
     leaf = {}
     out_tree = None
     for p, pred in _sites(inp_trees, nbr_graph):
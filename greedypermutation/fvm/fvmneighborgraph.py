@@ -4,6 +4,8 @@ from metricspaces import metric_class, MetricSpace
 from greedypermutation.maxheap import MaxHeap
 from greedypermutation.fvm.utils import TreeParameters
 from greedypermutation.fvm.bucketqueue import BucketQueue
+from greedypermutation.instrument import CountingHeap
+from greedypermutation.metrics import dists
 
 
 @metric_class
@@ -29,9 +31,11 @@ class FVMCell:
         Update the node determining out-radius.
         """
         self.radius = -1
-        for x in self.points:
-            if self.dist(x.center) + x.radius > self.radius:
-                self.radius = self.dist(x.center) + x.radius
+        nodes = list(self.points)
+        centers = [x.center for x in nodes]
+        for x, d in zip(nodes, dists(self.metric, self.center, centers)):
+            if d + x.radius > self.radius:
+                self.radius = d + x.radius
                 self.farthest = x
 
     def tidy(self):
@@ -327,11 +331,15 @@ class GreedyFVMNeighborGraph(FVMNeighborGraph):
     A maxheap is used to store the cells based on their outradii.
     An additional parameter, `bucket_size` can be used for approximate heaps.
     If this parameter is greater than one, a bucket queue is used as the heap.
+    If a `Stats` object is given as `stats`, then the heap operations and the
+    nodes moved are counted in it.
     """
 
-    def __init__(self, G, params=TreeParameters(1, 1, 1, 1), space=None):
+    def __init__(self, G, params=TreeParameters(1, 1, 1, 1), space=None,
+                 stats=None):
         move_const, nbr_const, tidy_const, bucket_size = params
         super().__init__(G, nbr_const, move_const, tidy_const, space)
+        self.stats = stats
 
         # The root cell should be the only vertex in the graph.
         root_cell = next(iter(self._nbrs))
@@ -341,6 +349,8 @@ class GreedyFVMNeighborGraph(FVMNeighborGraph):
             )
         else:
             self.heap = MaxHeap([root_cell], key=lambda c: c.radius)
+        if stats is not None:
+            self.heap = CountingHeap(self.heap, stats)
 
     def addcell(self, newcenter, parent):
         newcell = super().addcell(newcenter, parent)
@@ -350,6 +360,11 @@ class GreedyFVMNeighborGraph(FVMNeighborGraph):
         return newcell
 
     def rebalance(self, a, b):
+        if self.stats is not None:
+            count = len(a.points)
         super().rebalance(a, b)
+        if self.stats is not None:
+            self.stats.rebalances += 1
+            self.stats.moves += len(a.points) - count
         # Update the heap priority for `b`.
         self.heap.changepriority(b)
@@ -1,19 +1,22 @@
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from greedypermutation.fvm.fvmgreedy import fvm_greedy
 from greedypermutation.fvm.simpleball import SimpleBall
 from greedypermutation.fvm.utils import TreeParameters
+from greedypermutation.instrument import counted
 from metricspaces import MetricSpace
-# from multiprocess import Process, Pipe
-from math import sqrt
+from math import isqrt
 
 
-def merge(tree_a, tree_b, params=TreeParameters(1, 1, 1, 1), space=None):
+def merge(tree_a, tree_b, params=TreeParameters(1, 1, 1, 1), space=None, stats=None):
     """
     Merges two greedy trees into a single tree.
     """
-    return fvm_greedy([tree_a, tree_b], params, space)
+    return fvm_greedy([tree_a, tree_b], params, space, stats)
 
 
-def build_tree(P, params=TreeParameters(1, 1, 1, 1), space=None):
+def build_tree(P, params=TreeParameters(1, 1, 1, 1), space=None, stats=None):
     """
     An implementation of the sequential recursive algorithm to build a greedy tree on a finite metric space `P`.
     The parameters are move_const, nbr_const, tidy_const, and, bucket_size.
@@ -22,55 +25,143 @@ def build_tree(P, params=TreeParameters(1, 1, 1, 1), space=None):
     Similarly, the nbr_constant represents the cell approximation parameter.
     The tidy_constant represents the cell tidying parameter.
     The bucket_size represents the parameter for a bucket queue.
+    If a `Stats` object is given as `stats`, the distances, heap operations and nodes moved in all merges are counted in it.
     """
     if space is None:
         space = MetricSpace([P[0]])
+    space = counted(space, stats)
     n = len(P)
     if n > 1:
-        tree_1 = build_tree(P[: n // 2], params, space)
-        tree_2 = build_tree(P[n // 2 :], params, space)
-        return merge(tree_1, tree_2, params)
+        tree_1 = build_tree(P[: n // 2], params, space, stats)
+        tree_2 = build_tree(P[n // 2 :], params, space, stats)
+        return merge(tree_1, tree_2, params, space, stats)
     else:
         return SimpleBall(space)(P[0])
 
 
-"""
-This is an implementation of the parallel algorithm.
-It runs as expected but has a dependency requirement.
-"""
-# def build_parallel(P, params=TreeParameters(1, 1, 1, 1)):
-#     """
-#     An implementation of the parallel algorithm to build a greedy tree on a finite metric space `P`.
-#     The parameters are the same as those for `build_tree`.
-#     """
-#     limit = max(100, sqrt(len(P)))
-#     space = MetricSpace([P[0]])
-#     return _build_parallel(P, params, limit, space)
-
-
-# def _build_process(
-#     P, params=TreeParameters(1, 1, 1, 1), par_writer=None, limit=10, space=None
-# ):
-#     out = _build_parallel(P, params, limit, space)
-#     par_writer.send(out)
-#     par_writer.close()
-
-
-# def _build_parallel(P, params=TreeParameters(1, 1, 1, 1), limit=10, space=None):
-#     n = len(P)
-#     if n > limit:
-#         reader, writer = Pipe()
-#         proc = Process(
-#             target=_build_process,
-#             args=(P[: n // 2], params, writer, limit, space),
-#         )
-#         proc.start()
-#         tree_1 = _build_parallel(P[n // 2 :], params, limit, space)
-#         tree_2 = reader.recv()
-#         proc.join()
-#         reader.close()
-#         proc.close()
-#         out = merge(tree_1, tree_2, params, space)
-#     else:
-#         out = build_tree(P, params, space)
-#     return out
+def build_parallel(
+    P, params=TreeParameters(1, 1, 1, 1), space=None, leafsize=None, workers=None
+):
+    """
+    An implementation of the parallel algorithm to build a greedy tree on a finite metric space `P`.
+    The parameters are the same as those for `build_tree`.
+
+    The input is split in the same way as in `build_tree` until the pieces have at most `leafsize` points.
+    The trees on these pieces are built by `build_tree` in a pool of `workers` processes.
+    Then, the trees are merged with `fvm_greedy` in rounds, where all of the merges in a round are done in parallel.
+    The merges follow the recursion of `build_tree`, so the resulting tree has the same guarantees.
+
+    Trees are passed between processes as arrays of point indices and radii rather than as `SimpleBall` objects.
+    The points are sent to each worker once, when the pool starts.
+    """
+    if space is None:
+        space = MetricSpace([P[0]])
+    n = len(P)
+    if leafsize is None:
+        leafsize = max(100, isqrt(n))
+    if n <= leafsize:
+        return build_tree(P, params, space)
+
+    rounds = defaultdict(list)
+    _schedule(0, n, leafsize, rounds)
+    codes = {}
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(P, params)
+    ) as pool:
+        leaves = rounds.pop(0)
+        for piece, code in zip(leaves, pool.map(_build_piece, leaves)):
+            codes[piece] = code
+        for height in sorted(rounds):
+            merges = rounds[height]
+            pairs = [(codes.pop((lo, mid)), codes.pop((mid, hi))) for lo, mid, hi in merges]
+            for (lo, mid, hi), code in zip(merges, pool.map(_merge_codes, pairs)):
+                codes[lo, hi] = code
+    return decode(codes[0, n], P, space)
+
+
+def _schedule(lo, hi, leafsize, rounds):
+    """
+    Record the pieces and merges used by `build_tree` on `P[lo:hi]` in `rounds`, which maps a height in the recursion to a list.
+    The pieces are pairs `(lo, hi)` at height zero and the merges are triples `(lo, mid, hi)`.
+    Return the height of this piece.
+    """
+    if hi - lo <= leafsize:
+        rounds[0].append((lo, hi))
+        return 0
+    mid = lo + (hi - lo) // 2
+    height = 1 + max(
+        _schedule(lo, mid, leafsize, rounds), _schedule(mid, hi, leafsize, rounds)
+    )
+    rounds[height].append((lo, mid, hi))
+    return height
+
+
+def encode(tree, index):
+    """
+    Return a compact encoding of the greedy tree `tree` as a triple `(root, pairs, radii)`.
+
+    The points are replaced by integers using the function `index`.
+    The `root` is the index of the center of the tree.
+    The nonleaf nodes are listed in preorder.
+    For each one, `pairs` stores the index of the center of its right child followed by the index of its own center and `radii` stores its radius.
+    """
+    pairs, radii = array("q"), array("d")
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if not node.isleaf():
+            pairs.append(index(node.right.center))
+            pairs.append(index(node.center))
+            radii.append(node.radius)
+            stack.append(node.right)
+            stack.append(node.left)
+    return index(tree.center), pairs, radii
+
+
+def decode(code, P, space=None):
+    """
+    Rebuild a tree of `SimpleBall`s from an encoding produced by `encode`.
+    The integers in the encoding are indices into `P`.
+    """
+    root, pairs, radii = code
+    if space is None:
+        space = MetricSpace([P[root]])
+    BallTree = SimpleBall(space)
+    tree = BallTree(P[root])
+    leaf = {root: tree}
+    for i, radius in enumerate(radii):
+        p, q = pairs[2 * i], pairs[2 * i + 1]
+        node = leaf[q]
+        leaf[q] = node.left = BallTree(P[q])
+        leaf[p] = node.right = BallTree(P[p])
+        node.radius = radius
+    tree.count()
+    return tree
+
+
+# The state of a worker process in `build_parallel`.
+_worker = {}
+
+
+def _init_worker(P, params):
+    _worker["P"] = P
+    _worker["params"] = params
+    _worker["space"] = MetricSpace([P[0]])
+    _worker["index"] = {id(p): i for i, p in enumerate(P)}
+
+
+def _encode(tree):
+    index = _worker["index"]
+    return encode(tree, lambda p: index[id(p)])
+
+
+def _build_piece(piece):
+    lo, hi = piece
+    P, params, space = _worker["P"], _worker["params"], _worker["space"]
+    return _encode(build_tree(P[lo:hi], params, space))
+
+
+def _merge_codes(codes):
+    P, params, space = _worker["P"], _worker["params"], _worker["space"]
+    tree_a, tree_b = (decode(code, P, space) for code in codes)
+    return _encode(merge(tree_a, tree_b, params, space))
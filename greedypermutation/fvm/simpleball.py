@@ -41,64 +41,81 @@ class SimpleBall:
                     H.append(ball.right)
             return best
 
+    def _preorder(self):
+        """
+        Return the list of the balls in the tree rooted at self, with each
+        ball before its children.
+
+        An explicit stack is used, so deep trees do not reach the recursion
+        limit.  Reversing the list gives an order in which every child comes
+        before its parent.
+        """
+        balls, stack = [], [self]
+        while stack:
+            ball = stack.pop()
+            balls.append(ball)
+            if not ball.isleaf():
+                stack.append(ball.right)
+                stack.append(ball.left)
+        return balls
+
     def approx_radii(self):
         """
-        Recursively approximate the `radius` of every ball in the tree rooted at self.
+        Approximate the `radius` of every ball in the tree rooted at self.
         """
         if not hasattr(self, "scale"):
             raise RuntimeError("Missing scale parameter.")
         if not hasattr(self, "gp"):
             raise RuntimeError("Missing gp-approx parameter.")
-        if self.isleaf():
-            self.radius = 0
-        else:
-            self.left.approx_radii()
-            self.right.approx_radii()
-            # SID: To compute approximate node radii, we need scale and locally greedy parameters
-            self.radius = min(
-                max(self.left.radius, self.dist(self.right.center) + self.right.radius),
-                self.scale * self.gp * self.dist(self.right.center) / (self.scale - 1),
-            )
+        for ball in reversed(self._preorder()):
+            if ball.isleaf():
+                ball.radius = 0
+            else:
+                # SID: To compute approximate node radii, we need scale and locally greedy parameters
+                d = ball.dist(ball.right.center)
+                ball.radius = min(
+                    max(ball.left.radius, d + ball.right.radius),
+                    ball.scale * ball.gp * d / (ball.scale - 1),
+                )
 
     def exact_radii(self):
         """
-        Recursively compute the `radius` of every ball in the tree rooted at self.
+        Compute the `radius` of every ball in the tree rooted at self.
         """
-        if self.isleaf():
-            self.radius = 0
-        else:
-            self.left.exact_radii()
-            self.right.exact_radii()
-            # SID: To compute approximate node radii, we need scale and locally greedy parameters
-            self.radius = max(self.left.radius, self.right.farthest(self.center))
+        for ball in reversed(self._preorder()):
+            if ball.isleaf():
+                ball.radius = 0
+            else:
+                ball.radius = max(ball.left.radius, ball.right.farthest(ball.center))
 
     def count(self):
         """
-        Recursively compute the count of every ball in the tree rooted at self.
+        Compute the count of every ball in the tree rooted at self.
         """
-        if self.isleaf():
-            self._len = 1
-        else:
-            self.left.count()
-            self.right.count()
-            self._len = len(self.left) + len(self.right)
+        for ball in reversed(self._preorder()):
+            if ball.isleaf():
+                ball._len = 1
+            else:
+                ball._len = len(ball.left) + len(ball.right)
 
     def __len__(self):
         return self._len
 
     def __iter__(self):
         """
-        Iterate over the points.
+        Iterate over the points from the leftmost leaf to the rightmost leaf.
 
-        Note that the current immplementation is simple, but not as efficient
-        asymptotically as the non-recursive approach.  This is an issue with
-        recursive iterators.
+        An explicit stack of balls is used instead of nested generators, so
+        the iteration takes time proportional to the number of balls.
         """
-        if self.isleaf():
-            yield self.center
-        else:
-            yield from self.left
-            yield from self.right
+        stack = [self]
+        while stack:
+            ball = stack.pop()
+            if ball.isleaf():
+                yield ball.center
+            else:
+                stack.append(ball.right)
+                stack.append(ball.left)
 
     def heap(self):
         """
@@ -76,16 +76,31 @@ class Node:
 
     def update(self):
         """
-        Update the weight and the radius list.
-        """
+        Update the weight and the radius list of every node in the subtree
+        rooted at `self`.
 
-        for c in reversed(self.children):
-            c.update()
-            self.weight = 1 + sum(c.weight for c in self.children)
-            self.radii.append(max(self.radii[-1],
-                                  c.farthest_descendant(self.point)
-                                  ))
-        self.radii.reverse()
+        The nodes are visited with an explicit stack, so deep trees do not
+        reach the recursion limit.  Every child is updated before its parent.
+        """
+        for node in reversed(self._preorder()):
+            node.weight = 1 + sum(c.weight for c in node.children)
+            for c in reversed(node.children):
+                node.radii.append(max(node.radii[-1],
+                                      c.farthest_descendant(node.point)
+                                      ))
+            node.radii.reverse()
+
+    def _preorder(self):
+        """
+        Return the list of the nodes in the subtree rooted at `self` in the
+        order of `__iter__`.
+        """
+        nodes, stack = [], [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(reversed(node.children))
+        return nodes
 
     @property
     def radius(self):
@@ -100,20 +115,21 @@ class Node:
         """
         dist = self.metric.dist
         farthest = dist(self.point, point)
-        for c in self.children:
-            if dist(c.point, point) + c.radius > farthest:
-                farthest = max(farthest, c.farthest_descendant(point))
+        stack = list(self.children)
+        while stack:
+            c = stack.pop()
+            d = dist(c.point, point)
+            if d + c.radius > farthest:
+                farthest = max(farthest, d)
+                stack.extend(c.children)
         return farthest
 
     def __iter__(self):
         """
-        Iterate over all points in the bunch.
-
-        Warning.  This iteration is destructive.
+        Iterate over all points in the subtree rooted at `self`.
         """
-        yield self.point
-        for child in self.children:
-            yield from child
+        for node in self._preorder():
+            yield node.point
 
     def __len__(self):
         return self.weight
@@ -0,0 +1,235 @@
+from greedypermutation.metrics import dists, rankdists, rankpower
+
+
+"""
+This module contains tools to count the work done by the algorithms.
+
+A `Stats` object is passed as the `stats` parameter of a greedy permutation
+or greedy tree construction.  The metric space and the heap are then wrapped
+in proxies that count the distances and the heap operations, and the neighbor
+graph counts the points moved by each rebalance.
+If no `Stats` object is given, nothing is wrapped and nothing is counted.
+
+An `ApproximationReport` records how far the choices of an approximate heap
+are from the exact greedy choices.
+"""
+
+
+class Stats:
+    """
+    A collection of counters.
+
+    - `distances`: the number of distances requested from the metric space,
+      including those found in its cache.
+    - `heap_inserts`, `heap_updates`, `heap_removals`: the number of
+      insertions, priority changes, and removals in the heap of cells.
+    - `rebalances`: the number of pairs of cells rebalanced.
+    - `moves`: the number of points (or nodes) moved between cells.
+    - `steps`: the number of completed steps, such as the points output so
+      far by a greedy permutation.
+
+    If `history` is set, the counts for each step are stored in the list
+    `history`.
+    If a `callback` is given, it is called with the index of each step and
+    the dictionary of the counts for that step.
+    """
+    COUNTERS = ('distances', 'heap_inserts', 'heap_updates', 'heap_removals',
+                'rebalances', 'moves')
+
+    def __init__(self, history=False, callback=None):
+        self.history = [] if history else None
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        """
+        Set all of the counters back to zero and clear the history.
+        """
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.steps = 0
+        self._last = self.counts()
+        if self.history is not None:
+            self.history.clear()
+
+    def counts(self):
+        """
+        Return a dictionary of the current values of the counters.
+        """
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def step(self):
+        """
+        Mark the end of a step.
+
+        The counts since the previous step are added to the history and
+        passed to the callback.
+        """
+        counts = self.counts()
+        delta = {name: counts[name] - self._last[name]
+                 for name in self.COUNTERS}
+        self._last = counts
+        if self.history is not None:
+            self.history.append(delta)
+        if self.callback is not None:
+            self.callback(self.steps, delta)
+        self.steps += 1
+
+    def __repr__(self):
+        counts = ', '.join(name + '=' + str(value)
+                           for name, value in self.counts().items())
+        return 'Stats(' + counts + ', steps=' + str(self.steps) + ')'
+
+
+class CountingMetric:
+    """
+    A proxy for a metric space that counts the distances requested from it
+    in `stats.distances`.
+
+    Everything other than the distances is passed through to the underlying
+    `metric`.
+    """
+    def __init__(self, metric, stats):
+        self.metric = metric
+        self.stats = stats
+
+    def dist(self, a, b):
+        self.stats.distances += 1
+        return self.metric.dist(a, b)
+
+    def dists(self, a, points):
+        if not hasattr(points, '__len__'):
+            points = list(points)
+        self.stats.distances += len(points)
+        return dists(self.metric, a, points)
+
+    def rankdists(self, a, points):
+        if not hasattr(points, '__len__'):
+            points = list(points)
+        self.stats.distances += len(points)
+        return rankdists(self.metric, a, points)
+
+    @property
+    def rankpower(self):
+        return rankpower(self.metric)
+
+    def distsq(self, a, b):
+        return self.dist(a, b) ** 2
+
+    def comparedist(self, x, a, b, delta=0, alpha=1):
+        return self.dist(x, a) < alpha * self.dist(x, b) - delta
+
+    def distlt(self, a, b, delta=0):
+        return self.dist(a, b) < delta
+
+    def __iter__(self):
+        return iter(self.metric)
+
+    def __len__(self):
+        return len(self.metric)
+
+    def __contains__(self, point):
+        return point in self.metric
+
+    def __getattr__(self, name):
+        return getattr(self.metric, name)
+
+
+class CountingHeap:
+    """
+    A proxy for a `MaxHeap` or a `BucketQueue` that counts the insertions,
+    priority changes, and removals in `stats`.
+    """
+    def __init__(self, heap, stats):
+        self.heap = heap
+        self.stats = stats
+
+    def insert(self, item, *args):
+        self.stats.heap_inserts += 1
+        return self.heap.insert(item, *args)
+
+    def changepriority(self, item, *args):
+        self.stats.heap_updates += 1
+        return self.heap.changepriority(item, *args)
+
+    def changepriority_many(self, items):
+        items = list(items)
+        self.stats.heap_updates += len(items)
+        return self.heap.changepriority_many(items)
+
+    def removemax(self):
+        self.stats.heap_removals += 1
+        return self.heap.removemax()
+
+    def remove(self, item):
+        self.stats.heap_removals += 1
+        return self.heap.remove(item)
+
+    def __iter__(self):
+        while len(self.heap):
+            yield self.removemax()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.heap
+
+    def __getattr__(self, name):
+        return getattr(self.heap, name)
+
+
+class ApproximationReport:
+    """
+    A record of the approximation realized by a greedy permutation that is
+    computed with an approximate heap.
+
+    At each step, `record` is given the radius of the cell that was chosen
+    and the largest radius of any cell.  Their ratio is appended to `ratios`.
+    The ratio is at least one and it is exactly one for an exact heap.
+    The `bound` is the guarantee of the heap, such as the `bucket_size` of a
+    bucket queue.
+    """
+    def __init__(self, bound=1):
+        self.bound = bound
+        self.ratios = []
+
+    def record(self, chosen, largest):
+        """
+        Record a step in which a cell of radius `chosen` was taken when the
+        largest radius was `largest`.
+        """
+        if chosen > 0:
+            self.ratios.append(largest / chosen)
+        else:
+            self.ratios.append(1 if largest == 0 else float('inf'))
+
+    @property
+    def worst(self):
+        """
+        The largest ratio of any step, or 1 if there are no steps.
+        """
+        return max(self.ratios, default=1)
+
+    def within_bound(self):
+        """
+        Return True if and only if every ratio is at most the `bound`.
+        """
+        return self.worst <= self.bound
+
+    def __repr__(self):
+        return 'ApproximationReport(steps=' + str(len(self.ratios)) + \
+            ', worst=' + str(self.worst) + ', bound=' + str(self.bound) + ')'
+
+
+def counted(metric, stats):
+    """
+    Return `metric` wrapped to count its distances in `stats`.
+
+    If `stats` is `None` or `metric` already counts into `stats`, then
+    `metric` is returned unchanged.
+    """
+    if stats is None or \
+            (isinstance(metric, CountingMetric) and metric.stats is stats):
+        return metric
+    return CountingMetric(metric, stats)
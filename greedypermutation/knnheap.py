@@ -50,6 +50,3 @@ class KNNHeap(MaxHeap):
         while self.weight - self.top_weight >= self.k:
             self.weight -= self.top_weight
             self.removemax()
-
-    def __contains__(self, item):
-        return item in self._itemmap
@@ -17,8 +17,7 @@ def knnsample(M, k, seed=None):
         point = cell.farthest
         if point is None:
             break
-        cell.points.remove(point)
-        cell.updateradius()
+        cell.removepoint(point)
 
         radius = 2 * M.dist(point, cell.center)
 
@@ -1,17 +1,250 @@
-from ds2.priorityqueue import PriorityQueue
+from heapq import heapify, heappop, heappush
+from itertools import count
 
 
-class MaxHeap(PriorityQueue):
+"""
+This module contains the max heaps used to order cells and balls by radius.
+
+`MaxHeap` is an indexed d-ary heap.  The items and their priorities are kept
+in two parallel lists along with a dictionary from each item to its position,
+so the priority of an item is only computed when it is inserted or changed.
+
+`LazyMaxHeap` has the same interface, but never moves an item within the
+heap.  A change of priority pushes a new entry and the old entry is skipped
+when it reaches the top.
+"""
+
+
+class MaxHeap:
+    """
+    A max heap of distinct hashable items.
+
+    Each node has `arity` children.  The default binary heap breaks ties
+    between equal priorities in the same way as earlier versions, so the
+    greedy permutations do not change.
+
+    The priority of an item is `key(item)` unless it is given explicitly to
+    `insert` or `changepriority`.
+    Iterating over the heap removes the items in order of decreasing
+    priority.  Items may be inserted during the iteration.
+    """
+    def __init__(self, items=(), key=lambda x: x, arity=2):
+        self._key = key
+        self._arity = arity
+        self._items = list(items)
+        self._priorities = [key(item) for item in self._items]
+        self._index = {item: i for i, item in enumerate(self._items)}
+        self._heapify()
+
+    def insert(self, item, priority=None):
+        """
+        Add `item` to the heap.
+        """
+        if priority is None:
+            priority = self._key(item)
+        i = len(self._items)
+        self._items.append(item)
+        self._priorities.append(priority)
+        self._index[item] = i
+        self._up(i)
+
+    def findmax(self):
+        """
+        Return an item of maximum priority.
+        """
+        return self._items[0]
+
+    def removemax(self):
+        """
+        Remove and return an item of maximum priority.
+        """
+        item = self._items[0]
+        self._removeat(0)
+        return item
+
+    def remove(self, item):
+        """
+        Remove `item` from the heap.
+        """
+        self._removeat(self._index[item])
+
+    def priority(self, item):
+        """
+        Return the priority of `item`.
+        """
+        return self._priorities[self._index[item]]
+
+    def changepriority(self, item, priority=None):
+        """
+        Set the priority of `item` to `priority` or to `key(item)`.
+        """
+        if priority is None:
+            priority = self._key(item)
+        i = self._index[item]
+        old = self._priorities[i]
+        self._priorities[i] = priority
+        if priority > old:
+            self._up(i)
+        elif priority < old:
+            self._down(i)
+
+    def changepriority_many(self, items):
+        """
+        Recompute the priorities of all of the `items` from the key.
+
+        The items are updated in order, so the result is the same as calling
+        `changepriority` on each of them.
+        """
+        index, priorities, key = self._index, self._priorities, self._key
+        up, down = self._up, self._down
+        for item in items:
+            i = index[item]
+            old, priorities[i] = priorities[i], key(item)
+            if priorities[i] > old:
+                up(i)
+            elif priorities[i] < old:
+                down(i)
+
+    def _removeat(self, i):
+        items, priorities = self._items, self._priorities
+        del self._index[items[i]]
+        item, priority = items.pop(), priorities.pop()
+        if i < len(items):
+            old = priorities[i]
+            items[i], priorities[i] = item, priority
+            self._index[item] = i
+            if priority > old:
+                self._up(i)
+            else:
+                self._down(i)
+
+    def _up(self, i):
+        items, priorities, index = self._items, self._priorities, self._index
+        item, priority = items[i], priorities[i]
+        d = self._arity
+        while i > 0:
+            parent = (i - 1) // d
+            if priority <= priorities[parent]:
+                break
+            items[i], priorities[i] = items[parent], priorities[parent]
+            index[items[i]] = i
+            i = parent
+        items[i], priorities[i] = item, priority
+        index[item] = i
+
+    def _down(self, i):
+        items, priorities, index = self._items, self._priorities, self._index
+        item, priority = items[i], priorities[i]
+        d, n = self._arity, len(items)
+        while True:
+            first = d * i + 1
+            if first >= n:
+                break
+            best, bestpriority = first, priorities[first]
+            for child in range(first + 1, min(first + d, n)):
+                if priorities[child] > bestpriority:
+                    best, bestpriority = child, priorities[child]
+            if bestpriority <= priority:
+                break
+            items[i], priorities[i] = items[best], bestpriority
+            index[items[i]] = i
+            i = best
+        items[i], priorities[i] = item, priority
+        index[item] = i
+
+    def _heapify(self):
+        for i in reversed(range((len(self._items) + self._arity - 2)
+                                // self._arity)):
+            self._down(i)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._index
+
+    def __iter__(self):
+        while self._items:
+            yield self.removemax()
+
+
+class LazyMaxHeap:
+    """
+    A max heap with the same interface as `MaxHeap` that uses lazy deletion.
+
+    Changing the priority of an item or removing it leaves a stale entry in
+    the heap that is discarded when it reaches the top.  The heap is rebuilt
+    when the stale entries outnumber the live ones.  This makes changes of
+    priority cheap when most of them are never seen at the top of the heap.
+    """
     def __init__(self, items=(), key=lambda x: x):
-        super().__init__(items, key=lambda x: -key(x))
+        self._key = key
+        self._counter = count()
+        self._current = {}
+        self._entries = []
+        for item in items:
+            self._current[item] = self._entry(item, key(item))
+        self._entries = list(self._current.values())
+        heapify(self._entries)
+
+    def _entry(self, item, priority):
+        return [-priority, next(self._counter), item]
 
     def insert(self, item, priority=None):
-        if priority is not None:
-            priority = -priority
-        super().insert(item, priority)
+        if priority is None:
+            priority = self._key(item)
+        entry = self._entry(item, priority)
+        self._current[item] = entry
+        heappush(self._entries, entry)
+
+    def _clean(self):
+        entries, current = self._entries, self._current
+        while current.get(entries[0][2]) is not entries[0]:
+            heappop(entries)
+
+    def findmax(self):
+        self._clean()
+        return self._entries[0][2]
+
+    def removemax(self):
+        self._clean()
+        item = heappop(self._entries)[2]
+        del self._current[item]
+        return item
+
+    def remove(self, item):
+        del self._current[item]
+        self._compact()
 
     def priority(self, item):
-        return - self._entries[self._itemmap[item]].priority
+        return -self._current[item][0]
+
+    def changepriority(self, item, priority=None):
+        if priority is None:
+            priority = self._key(item)
+        if self.priority(item) != priority:
+            self.insert(item, priority)
+            self._compact()
+
+    def changepriority_many(self, items):
+        for item in items:
+            self.changepriority(item)
+
+    def _compact(self):
+        """
+        Rebuild the heap from the live entries if at least half of the
+        entries are stale.
+        """
+        if len(self._entries) > 2 * len(self._current) + 16:
+            self._entries = list(self._current.values())
+            heapify(self._entries)
+
+    def __len__(self):
+        return len(self._current)
+
+    def __contains__(self, item):
+        return item in self._current
 
-    findmax = PriorityQueue.findmin
-    removemax = PriorityQueue.removemin
+    def __iter__(self):
+        while self._current:
+            yield self.removemax()
@@ -0,0 +1,369 @@
+import math
+
+
+"""
+This module contains a registry of metrics on vectors of coordinates and a
+metric space that stores its points in a NumPy array.
+
+Each `Metric` has three kernels:
+
+- `pair(a, b)` computes one distance between two sequences of floats,
+- `one_to_many(a, B)` computes the distances from the vector `a` to each row
+  of the array `B`,
+- `many_to_many(A, B)` computes the matrix of distances between the rows of
+  `A` and the rows of `B`.
+
+The last two work on NumPy arrays.  NumPy is only imported when they are
+called or when an `ArrayMetricSpace` is made.
+
+The algorithms ask for many distances from one point at once with `dists`.
+It uses the `dists` method of the metric space if it has one and otherwise
+computes the distances one at a time.
+
+Many decisions only compare distances.  For these, `rankdists` returns rank
+distances, which are the distances raised to the power `rankpower(M)`.
+For the Euclidean metric the power is two, so the square roots are skipped.
+A comparison `d(x, a) < alpha * d(x, b)` becomes
+`rank(x, a) < alpha ** power * rank(x, b)`.
+"""
+
+
+class Metric:
+    """
+    A named metric with a kernel for single distances and kernels for
+    batches of distances.
+
+    If `many_to_many` is not given, it applies `one_to_many` to each row.
+    The `rank_one_to_many` kernel computes the distances raised to the
+    `power`.  By default, the power is one and it is `one_to_many`.
+    """
+    def __init__(self, name, pair, one_to_many, many_to_many=None,
+                 rank_one_to_many=None, power=1):
+        self.name = name
+        self.pair = pair
+        self.one_to_many = one_to_many
+        self.rank_one_to_many = rank_one_to_many or one_to_many
+        self.power = power
+        if many_to_many is None:
+            many_to_many = self._many_to_many
+        self.many_to_many = many_to_many
+
+    def _many_to_many(self, A, B):
+        import numpy as np
+        return np.array([self.one_to_many(a, B) for a in A]).reshape(
+            len(A), len(B))
+
+    def __repr__(self):
+        return 'Metric(' + self.name + ')'
+
+
+METRICS = {}
+
+
+def register(metric, *aliases):
+    """
+    Add `metric` to the registry under its name and each of the `aliases`.
+    """
+    for name in (metric.name,) + aliases:
+        METRICS[name] = metric
+    return metric
+
+
+def getmetric(metric):
+    """
+    Return the registered `Metric` with the name `metric`.
+
+    A `Metric` object is returned unchanged.
+    A `ValueError` is raised if there is no such metric.
+    """
+    if isinstance(metric, Metric):
+        return metric
+    try:
+        return METRICS[metric.lower()]
+    except KeyError:
+        raise ValueError("Unknown metric " + repr(metric) + ".  The known "
+                         "metrics are: " + ', '.join(sorted(METRICS)) + '.')
+
+
+def _euclidean_many(A, B):
+    # Expand |a - b|^2 = |a|^2 + |b|^2 - 2<a, b>, so the distances use a
+    # matrix product instead of an array of differences.
+    D = (A * A).sum(axis=1)[:, None] + (B * B).sum(axis=1)[None, :]
+    D -= 2 * (A @ B.T)
+    return D.clip(0) ** 0.5
+
+
+def _sqeuclidean(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def _sqeuclidean_many(A, B):
+    D = (A * A).sum(axis=1)[:, None] + (B * B).sum(axis=1)[None, :]
+    D -= 2 * (A @ B.T)
+    return D.clip(0)
+
+
+def _cosine(a, b):
+    # The cosine distance is half of the squared distance between the unit
+    # vectors, which is exactly zero from a vector to itself and never
+    # negative.  The cosine distance from the zero vector to any other vector
+    # is one.
+    na, nb = math.hypot(*a), math.hypot(*b)
+    if not (na and nb):
+        return 0.0 if na == nb else 1.0
+    return sum((x / na - y / nb) ** 2 for x, y in zip(a, b)) / 2
+
+
+def _cosine_one(a, B):
+    U, zeros = _unit(B)
+    u, zero = _unit(a[None, :])
+    D = U - u
+    D = (D * D).sum(axis=1) / 2
+    D[zeros] = 1.0
+    if zero[0]:
+        D[:] = 1.0
+        D[zeros] = 0.0
+    return D
+
+
+def _cosine_many(A, B):
+    U, azeros = _unit(A)
+    V, bzeros = _unit(B)
+    D = U[:, None, :] - V[None, :, :]
+    D = (D * D).sum(axis=2) / 2
+    D[azeros, :] = 1.0
+    D[:, bzeros] = 1.0
+    D[azeros[:, None] & bzeros[None, :]] = 0.0
+    return D
+
+
+def _unit(A):
+    """
+    Return the rows of `A` divided by their norms and the mask of the rows
+    whose norms are zero.
+    """
+    norms = (A * A).sum(axis=1) ** 0.5
+    zeros = norms == 0
+    return A / _nonzero(norms)[:, None], zeros
+
+
+def _nonzero(norms):
+    """
+    Replace the zero norms by infinity, so that the cosine distance from the
+    zero vector to any other vector is one.
+    """
+    norms[norms == 0] = math.inf
+    return norms
+
+
+def _sqeuclidean_one(a, B):
+    import numpy as np
+    D = B - a
+    return np.einsum('ij,ij->i', D, D)
+
+
+register(Metric('euclidean',
+                math.dist,
+                lambda a, B: _sqeuclidean_one(a, B) ** 0.5,
+                _euclidean_many,
+                _sqeuclidean_one,
+                power=2),
+         'l2')
+register(Metric('sqeuclidean',
+                _sqeuclidean,
+                _sqeuclidean_one,
+                _sqeuclidean_many))
+register(Metric('l1',
+                lambda a, b: sum(abs(x - y) for x, y in zip(a, b)),
+                lambda a, B: abs(B - a).sum(axis=1),
+                lambda A, B: abs(A[:, None, :] - B[None, :, :]).sum(axis=2)),
+         'manhattan', 'cityblock')
+register(Metric('linf',
+                lambda a, b: max((abs(x - y) for x, y in zip(a, b)),
+                                 default=0.0),
+                lambda a, B: abs(B - a).max(axis=1, initial=0.0),
+                lambda A, B: abs(A[:, None, :] - B[None, :, :]).max(
+                    axis=2, initial=0.0)),
+         'chebyshev')
+register(Metric('cosine', _cosine, _cosine_one, _cosine_many))
+
+
+def dists(M, a, points):
+    """
+    Return a sequence of the distances in `M` from `a` to each of the
+    `points`.
+
+    The distances are computed in one batch if `M` has a `dists` method.
+    """
+    batch = getattr(M, 'dists', None)
+    if batch is not None:
+        return batch(a, points)
+    return [M.dist(a, p) for p in points]
+
+
+def rankpower(M):
+    """
+    Return the power of the distances given by `rankdists` for `M`.
+    """
+    return getattr(M, 'rankpower', 1)
+
+
+def rankdists(M, a, points):
+    """
+    Return a sequence of the rank distances in `M` from `a` to each of the
+    `points`, that is, the distances raised to the power `rankpower(M)`.
+
+    Metric spaces without a `rankdists` method give their distances.
+    """
+    batch = getattr(M, 'rankdists', None)
+    if batch is not None:
+        return batch(a, points)
+    return dists(M, a, points)
+
+
+class ArrayMetricSpace:
+    """
+    A metric space on the rows of an `(n, d)` array of coordinates.
+
+    The points are the row indices `0, ..., n - 1`, so they are small
+    hashable objects for the cells and trees built on the space.  Any other
+    value given as a point is used as its own vector of coordinates, which
+    allows queries that are not in the space.
+
+    The `metric` is a registered name or a `Metric`.  Single distances use
+    its `pair` kernel on the rows stored as lists of floats, which is faster
+    than indexing the array.  The `dists` method uses the `one_to_many`
+    kernel for batches of at least `batchsize` points and `pairwise` uses the
+    `many_to_many` kernel.
+    The `rankdists` method uses the `rank_one_to_many` kernel, whose values
+    are the distances raised to the power `rankpower`.
+    Nothing is cached, because each distance is cheap to compute again.
+
+    An array of floats is used without a copy.  If `lists` is False, then
+    the rows are not also stored as lists, so the space takes no more memory
+    than the array, but single distances are slower.
+    """
+    def __init__(self, P, metric='euclidean', batchsize=16, lists=True):
+        import numpy as np
+        self._np = np
+        coords = np.asarray(P, dtype=float)
+        if coords.ndim == 1:
+            coords = coords.reshape(-1, 1)
+        if coords.ndim != 2:
+            raise ValueError("Expected an array with one point per row.")
+        self.coords = coords
+        self.metric = getmetric(metric)
+        self.batchsize = batchsize
+        self._rows = coords.tolist() if lists else coords
+        self._pair = self.metric.pair
+        self.rankpower = self.metric.power
+
+    def _row(self, p):
+        if isinstance(p, (int, self._np.integer)):
+            return self._rows[p]
+        return p
+
+    def _array(self, points):
+        np = self._np
+        if isinstance(points, np.ndarray) and points.dtype.kind in 'iu':
+            return self.coords[points]
+        if isinstance(points, range) or (
+                points and isinstance(points[0], (int, np.integer))):
+            return self.coords[np.fromiter(points, dtype=np.intp,
+                                           count=len(points))]
+        if not len(points):
+            return np.empty((0, self.coords.shape[1]))
+        return np.array(points, dtype=float).reshape(len(points), -1)
+
+    def dist(self, a, b):
+        """
+        Return the distance between the points `a` and `b`.
+        """
+        return self._pair(self._row(a), self._row(b))
+
+    def dists(self, a, points):
+        """
+        Return the distances from `a` to each of the `points`.
+
+        If `points` is an array of row indices, the distances are returned
+        as an array.
+        """
+        return self._batch(self.metric.one_to_many, 1, a, points)
+
+    def rankdists(self, a, points):
+        """
+        Return the distances from `a` to each of the `points`, raised to the
+        power `rankpower`.
+
+        If `points` is an array of row indices, the distances are returned
+        as an array.
+        """
+        return self._batch(self.metric.rank_one_to_many, self.rankpower, a,
+                           points)
+
+    def _batch(self, kernel, power, a, points):
+        """
+        Apply the `kernel` to `a` and the `points`, or compute the distances
+        one at a time and raise them to the `power` for small batches.
+        """
+        np = self._np
+        indices = isinstance(points, np.ndarray) and points.dtype.kind in 'iu'
+        if not indices and not isinstance(points, (list, tuple, range)):
+            points = list(points)
+        if len(points) < self.batchsize:
+            pair, row, rows = self._pair, self._row(a), self._rows
+            if indices:
+                return np.array([pair(row, rows[p]) ** power
+                                 for p in points.tolist()])
+            return [pair(row, self._row(p)) ** power for p in points]
+        D = kernel(np.array(self._row(a), dtype=float), self._array(points))
+        return D if indices else D.tolist()
+
+    def pairwise(self, A, B):
+        """
+        Return the array of distances between each point of `A` and each
+        point of `B`.
+        """
+        A, B = list(A), list(B)
+        return self.metric.many_to_many(self._array(A), self._array(B))
+
+    def distsq(self, a, b):
+        return self.dist(a, b) ** 2
+
+    def comparedist(self, x, a, b, delta=0, alpha=1):
+        return self.dist(x, a) < alpha * self.dist(x, b) - delta
+
+    def distlt(self, a, b, delta=0):
+        return self.dist(a, b) < delta
+
+    def add(self, point):
+        """
+        Add a point with the coordinates `point` to the end of the space.
+
+        This copies the array, so it takes time proportional to its size.
+        """
+        row = [float(x) for x in point]
+        self.coords = self._np.vstack([self.coords, [row]])
+        if isinstance(self._rows, list):
+            self._rows.append(row)
+        else:
+            self._rows = self.coords
+
+    def point(self, index):
+        """
+        Return the coordinates of the point `index` as an array.
+        """
+        return self.coords[index]
+
+    def __getitem__(self, index):
+        return range(len(self))[index]
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, point):
+        return isinstance(point, (int, self._np.integer)) and \
+            0 <= point < len(self)
@@ -1,33 +1,138 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import DefaultDict
 from ds2.graph import Graph
 from metricspaces import metric_class
-from greedypermutation.maxheap import MaxHeap
+from greedypermutation.maxheap import MaxHeap, LazyMaxHeap
+from greedypermutation.fvm.bucketqueue import BucketQueue
+from greedypermutation.instrument import CountingHeap, counted
+from greedypermutation.metrics import dists, rankdists, rankpower
 import math as Math
 from random import randrange, seed
 
 
 @metric_class
 class Cell:
-    def __init__(self, center):
+    # A mapping from the points to their masses, set by a weighted graph.
+    weights = None
+
+    def __init__(self, center, mass=1):
         """
         Create a new cell with the given `center`.
 
-        A new cell only contains a single point, its center.
+        A new cell only contains a single point, its center, whose `mass` is
+        the total mass of the cell.  The mass is kept up to date as points
+        are added and removed, so it is never computed from the points.
+
+        The distances from the center to the other points are kept in a
+        `LazyMaxHeap`, so they are computed once per point and the farthest
+        point can be found again after points are removed without a scan of
+        the cell.  The heap holds rank distances (see `metrics.rankdists`),
+        but the `radius` is always a true distance.
+
+        If the class has `weights`, then `farthest` is the point with the
+        largest distance times its weight and this product is the
+        `weightedradius`.  A second heap holds these products as rank
+        distances.  Points of weight zero are only farthest if all of the
+        points have weight zero.
         """
         self.points = {center}
         self.center = center
+        self.mass = mass
         self.radius = 0
-
-    def addpoint(self, p):
+        self.farthest = None
+        self._far = LazyMaxHeap()
+        self._power = rankpower(self.metric)
+        if self.weights is not None:
+            self.weightedradius = 0
+            self._wfar = LazyMaxHeap()
+
+    def addpoint(self, p, mass=1):
         """
-        Add the point `p` to the cell.
+        Add the point `p` with the given `mass` to the cell.
+
+        Adding a point that is already in the cell adds to its mass.
         """
         self.points.add(p)
+        self.mass += mass
+        if p == self.center:
+            return
         d = self.dist(p)
+        rank = d ** self._power
+        self._far.insert(p, rank)
         if d > self.radius:
             self.radius = d
             self.farthest = p
+        if self.weights is not None:
+            self._wfar.insert(p, self.weights[p] ** self._power * rank)
+            self._findweighted()
+
+    def removepoint(self, p, mass=1):
+        """
+        Remove the point `p` and its `mass` from the cell.
+
+        The radius only changes if `p` was the farthest point.
+        The center cannot be removed.
+        """
+        if p == self.center:
+            raise ValueError("The center cannot be removed from its cell.")
+        self.points.remove(p)
+        self.mass -= mass
+        self._far.remove(p)
+        if self.weights is not None:
+            self._wfar.remove(p)
+            self._findfarthest()
+        elif p == self.farthest:
+            self._findfarthest()
+
+    def removepoints(self, points, mass=None):
+        """
+        Remove the set `points`, which does not contain the center, from the
+        cell.  Their total `mass` is the number of points by default.
+
+        The time is proportional to the number of points removed, plus the
+        time to discard the stale distances that reach the top of the heap.
+        """
+        self.points -= points
+        self.mass -= len(points) if mass is None else mass
+        for p in points:
+            self._far.remove(p)
+        if self.weights is not None:
+            for p in points:
+                self._wfar.remove(p)
+            self._findfarthest()
+        elif self.farthest in points:
+            self._findfarthest()
+
+    def _findfarthest(self):
+        """
+        Set the radius and the farthest point from the heap of distances.
+        """
+        far = self._far
+        if len(far) and far.priority(far.findmax()) > 0:
+            self.farthest = far.findmax()
+            if self._power == 1:
+                self.radius = far.priority(self.farthest)
+            else:
+                self.radius = self.dist(self.farthest)
+        else:
+            self.farthest = None
+            self.radius = 0
+        if self.weights is not None:
+            self._findweighted()
+
+    def _findweighted(self):
+        """
+        Set the weighted radius and the farthest point from the heap of
+        weighted distances, unless all of the weights are zero.
+        """
+        wfar = self._wfar
+        if len(wfar) and wfar.priority(wfar.findmax()) > 0:
+            self.farthest = wfar.findmax()
+            self.weightedradius = wfar.priority(self.farthest) ** \
+                (1 / self._power)
+        else:
+            self.weightedradius = 0
 
     def dist(self, point):
         """
@@ -36,6 +141,29 @@ class Cell:
         """
         return self.metric.dist(self.center, point)
 
+    def dists(self, points):
+        """
+        Return the distances between the center of the cell and each of the
+        `points`, computed in one batch if the metric supports it.
+        """
+        return dists(self.metric, self.center, points)
+
+    def rankdists(self, points):
+        """
+        Return the rank distances between the center of the cell and each of
+        the `points`.  See `metrics.rankdists`.
+        """
+        return rankdists(self.metric, self.center, points)
+
+    def within(self, points, radius):
+        """
+        Return the set of the `points`, other than the center, whose distance
+        to the center is less than `radius`.
+        """
+        points = [p for p in points if p != self.center]
+        bound = radius ** self._power
+        return {p for p, d in zip(points, self.rankdists(points)) if d < bound}
+
     def comparedist(self, point, other, alpha):
         """
         Return True iff `point` is closer to the center of this cell
@@ -52,23 +180,24 @@ class Cell:
         to the center.
 
         Also, store the farthest point.
+        This computes the distance to every point again, so it is only needed
+        when the center changes or the set of points is changed directly.
         """
-        max_dist = 0
-        max_point = None
-        for p in self.points:
-            d = self.dist(p)
-            if d > max_dist:
-                max_dist = d
-                max_point = p
-        self.radius = max_dist
-        self.farthest = max_point
+        points = [p for p in self.points if p != self.center]
+        rank = dict(zip(points, self.rankdists(points)))
+        self._far = LazyMaxHeap(points, key=rank.__getitem__)
+        if self.weights is not None:
+            weights, power = self.weights, self._power
+            self._wfar = LazyMaxHeap(
+                points, key=lambda p: weights[p] ** power * rank[p])
+        self._findfarthest()
 
     def __len__(self):
         """
-        Return the total number of points in the cell, including the center.
+        Return the number of points in the cell, including the center.
+
+        The total mass of the points, with multiplicity, is `mass`.
         """
-        # Sid: Might be better to use `NeighborGraph.cellmass(cell)`
-        #  to account for multiplicity
         return len(self.points)
 
     def __iter__(self):
@@ -100,7 +229,11 @@ class NeighborGraph(Graph):
                  nbrconstant=1,
                  moveconstant=1,
                  gettransportplan=False,
-                 mass=None):
+                 mass=None,
+                 workers=None,
+                 stats=None,
+                 transportrecords=None,
+                 weighted=False):
         """
         Initialize a new NeighborGraph.
 
@@ -120,6 +253,26 @@ class NeighborGraph(Graph):
 
         `gettransportplan` is a flag that determines whether `addcell()`
         computes transportation plans or not.
+        If a `TransportRecords` object is given as `transportrecords`, then
+        the transport of each step is also appended to it, with the cells
+        numbered in the order that they are added.  See `transport`.
+
+        The `mass` of each point is a list in the order of `M`.  Each cell
+        keeps the total mass of its points.  If `weighted` is set, then the
+        `farthest` point of each cell is the one with the largest distance to
+        the center times its mass.  See `Cell`.
+
+        If `workers` is greater than one, then `addcell()` uses a pool of that
+        many threads to find the points to move from each neighbor in
+        parallel.  The points are only moved after all of the neighbors have
+        been scanned.  The points are shared by the threads rather than copied,
+        so this pays off when the distance computations release the GIL or
+        when the cells have many neighbors.  Call `close()` to shut the pool
+        down, or use the graph as a context manager.
+
+        If a `Stats` object is given as `stats`, then the distances, the
+        rebalances and the points moved are counted in it.
+        See `instrument`.
         """
         # Initialize the `NeighborGraph` to be a `Graph`.
         super().__init__()
@@ -132,7 +285,10 @@ class NeighborGraph(Graph):
             self.mass[p] += mass[i]
 
         # Establish a class for the cells.
-        self.Vertex = Cell(M)
+        self.stats = stats
+        self.Vertex = Cell(counted(M, stats))
+        if weighted:
+            self.Vertex.weights = self.mass
 
         if nbrconstant < moveconstant:
             raise RuntimeError("The move constant must not be larger than the"
@@ -144,22 +300,41 @@ class NeighborGraph(Graph):
         # transportation plan is to be computed or not.
         self.gettransportplan = gettransportplan
 
+        # If `minradius` is positive, the points that are closer than
+        # `minradius` to a new center are dropped from the cells, and no
+        # points are moved out of cells whose radius is less than `minradius`.
+        # Their mass is kept.  This is only safe if the points closer than
+        # `minradius` to the centers are never needed, as for a greedy net.
+        self.minradius = 0
+
+        # The pool of threads used to rebalance the neighbors of a new cell.
+        self.pool = None
+        if workers is not None and workers > 1:
+            self.pool = ThreadPoolExecutor(workers)
+
         # Make a cell to start the graph.  Use the first point as the root
         # if none is given.
         P = iter(M)
         root_center = root or next(P)
-        root_cell = self.Vertex(root_center)
+        root_cell = self.Vertex(root_center, self.mass[root_center])
 
         # Add the points to the root cell.
         # It doesn't matter if the root point is also in the list of points.
         # It will not be added twice.
-        for i, p in enumerate(P):
-            root_cell.addpoint(p)
+        for p in P:
+            if p not in root_cell:
+                root_cell.addpoint(p, self.mass[p])
 
         # Add the new cell as the one vertex of the graph.
         self.addvertex(root_cell)
         self.addedge(root_cell, root_cell)
 
+        # The index of each cell in the transport records.
+        self.transportrecords = transportrecords
+        if transportrecords is not None:
+            self._cellindex = {root_cell: 0}
+            transportrecords.append(0, -1, 0, self.cellmass(root_cell))
+
         # The heap has been moved to GreedyNeighborGraph.
         # self.heap = MaxHeap([root_cell], key = lambda c: c.radius)
 
@@ -185,8 +360,9 @@ class NeighborGraph(Graph):
         of the number of points gained and lost by every cell (indexed by
         center) in this change to the neighbor graph.
         """
-        # Create the new cell.
-        newcell = self.Vertex(newcenter)
+        # Create the new cell.  Its center is moved into it with its mass by
+        # the rebalance of the cell that contains it.
+        newcell = self.Vertex(newcenter, 0)
 
         # Create transportation plan for adding this cell
         transportplan = DefaultDict(int)
@@ -194,15 +370,32 @@ class NeighborGraph(Graph):
         # Make the cell a new vertex.
         self.addvertex(newcell)
         self.addedge(newcell, newcell)
+        records = self.transportrecords
+        if records is not None:
+            step = self._cellindex[newcell] = len(self._cellindex)
 
         # Rebalance the new cell.
-        for nbr in self.nbrs(parent):
-            localtransport = self.rebalance(newcell, nbr)
+        # The scans of the neighbors are independent, so they may be done in
+        # parallel before any points are moved.
+        nbrs = list(self.nbrs(parent))
+        if self.minradius > 0:
+            nbrs = [nbr for nbr in nbrs
+                    if nbr.radius >= self.minradius or newcenter in nbr]
+        if self.pool is not None and len(nbrs) > 1:
+            moves = self.pool.map(lambda nbr: self.pointstomove(newcell, nbr),
+                                  nbrs)
+        else:
+            moves = [None] * len(nbrs)
+        for nbr, points_to_move in zip(nbrs, moves):
+            localtransport = self.rebalance(newcell, nbr, points_to_move)
             # Add change caused by this rebalance to transportation plan if
             # requested.
             if localtransport != 0 and self.gettransportplan:
                 transportplan[newcenter] += localtransport
                 transportplan[nbr.center] -= localtransport
+            if localtransport != 0 and records is not None:
+                records.append(step, self._cellindex[nbr], step,
+                               localtransport)
 
             # The heap update has been delegated to the GreedyNeighborGraph.
             # self.heap.changepriority(nbr)
@@ -223,28 +416,180 @@ class NeighborGraph(Graph):
         # transportplan
         return newcell, transportplan
 
-    def rebalance(self, a, b):
+    def pointstomove(self, a, b):
+        """
+        Return the set of points of the cell `b` that are sufficiently closer
+        to `a.center` to be moved to `a`.
+
+        This does not modify either cell.
+        If the metric has a `dists` method, then the rank distances from both
+        centers are computed in batches and compared.
+        """
+        if not hasattr(a.metric, 'dists'):
+            return {p for p in b.points
+                    if a.comparedist(p, b, self.moveconstant)}
+        points = list(b.points)
+        alpha = self.moveconstant ** a._power
+        return {p for p, da, db in zip(points, a.rankdists(points),
+                                       b.rankdists(points))
+                if da < alpha * db}
+
+    def rebalance(self, a, b, points_to_move=None):
         """
         Returns the number of points moved from `b` to `a`.
 
         Move points from the cell `b` to the cell `a` if they are
         sufficiently closer to `a.center`.
+
+        If `points_to_move` is given, it is used instead of scanning `b`.
         """
-        points_to_move =\
-            {p for p in b.points if a.comparedist(p, b, self.moveconstant)}
-        b.points -= points_to_move
-        mass_to_move = 0
+        if points_to_move is None:
+            points_to_move = self.pointstomove(a, b)
+        if self.stats is not None:
+            self.stats.rebalances += 1
+            self.stats.moves += len(points_to_move)
+        mass = self.mass
+        mass_to_move = sum(mass[p] for p in points_to_move)
+        b.removepoints(points_to_move, mass_to_move)
+        if self.minradius > 0:
+            covered = a.within(points_to_move, self.minradius)
+            a.mass += sum(mass[p] for p in covered)
+            points_to_move = points_to_move - covered
         for p in points_to_move:
-            a.addpoint(p)
-            mass_to_move += self.mass[p]
-        # The radius of self (`a`) is automatically updated by addpoint.
-        # The other radius needs to be manually updated.
-        b.updateradius()
+            a.addpoint(p, mass[p])
+        # The radius and mass of self (`a`) are automatically updated by
+        # addpoint and those of `b` by removepoints.
         return mass_to_move
 
     def nbrs_of_nbrs(self, u):
         return {b for a in self.nbrs(u) for b in self.nbrs(a)}
 
+    def locate(self, p, start=None):
+        """
+        Return the cell whose center is nearest to `p`.
+
+        The cell is found by a walk in the graph.  It starts at `start` (or at
+        an arbitrary cell) and moves to the neighbor with the nearest center
+        until no neighbor is nearer than the current cell.
+        If `p` is outside of the ball of the last cell, then the walk might
+        have stopped early, so all of the cells are checked.
+        """
+        cell = start if start is not None else next(iter(self._nbrs))
+        d = cell.dist(p)
+        while True:
+            best, bestdist = cell, d
+            for nbr in self.nbrs(cell):
+                dist = nbr.dist(p)
+                if dist < bestdist:
+                    best, bestdist = nbr, dist
+            if best is cell:
+                break
+            cell, d = best, bestdist
+        if d > cell.radius:
+            cell = min(self._nbrs, key=lambda c: c.dist(p))
+        return cell
+
+    def addpoint(self, p, mass=1, start=None):
+        """
+        Add a new point `p` to the cell with the nearest center and return
+        that cell.
+
+        The cell is found with `locate`.  If the radius of the cell grows, then
+        it is connected to the cells that are now close enough to be
+        neighbors.  These are searched among all of the cells, because the
+        neighbors of its neighbors might not contain all of them.
+        """
+        cell = self.locate(p, start)
+        radius = cell.radius
+        self.mass[p] += mass
+        cell.addpoint(p, mass)
+        if cell.radius > radius:
+            for other in list(self._nbrs):
+                if self.iscloseenoughto(cell, other):
+                    self.addedge(cell, other)
+        return cell
+
+    def findcell(self, p):
+        """
+        Return the cell that contains the point `p`.
+
+        The cell with the nearest center is checked first, then its
+        neighbors, and then all of the cells.
+        """
+        cell = self.locate(p)
+        if p in cell:
+            return cell
+        for other in self.nbrs(cell):
+            if p in other:
+                return other
+        for other in self._nbrs:
+            if p in other:
+                return other
+        raise KeyError(p)
+
+    def removepoint(self, p):
+        """
+        Remove the point `p` and return the set of cells whose points changed.
+
+        If `p` is not the center of its cell, it is simply removed from the
+        cell.  If it is a center, then the other points of its cell are
+        moved with `rebalance` to the neighbor with the nearest center and
+        the cell is removed with `removecell`.  The neighbors that grew are
+        connected to the cells that are now close enough.
+        If the cell has no other neighbors, the points are moved to the
+        other cell with the nearest center instead.  Only if there is no
+        other cell does the point of the cell nearest to `p` become its new
+        center.
+        """
+        cell = self.findcell(p)
+        mass = self.mass.pop(p)
+        if p != cell.center:
+            cell.removepoint(p, mass)
+            return {cell}
+        cell.points.discard(p)
+        cell.mass -= mass
+        nbrs = [nbr for nbr in self.nbrs(cell) if nbr is not cell]
+        if not nbrs:
+            nbrs = [other for other in self._nbrs if other is not cell]
+        if not nbrs:
+            if cell.points:
+                cell.center = min(cell.points, key=cell.dist)
+                cell.updateradius()
+            return {cell}
+        # Assign every point to the neighbor with the nearest center before
+        # any of them are moved.
+        moves = defaultdict(set)
+        for q in cell.points:
+            moves[min(nbrs, key=lambda nbr: nbr.dist(q))].add(q)
+        radii = {nbr: nbr.radius for nbr in moves}
+        for nbr, points_to_move in moves.items():
+            self.rebalance(nbr, cell, points_to_move)
+        nearby = self.nbrs_of_nbrs(cell)
+        self.removecell(cell)
+        nearby.discard(cell)
+        # Connect the cells that grew to the cells that are now close enough.
+        # These are searched near the removed cell, or among all of the cells
+        # if the radius more than doubled.
+        for nbr in moves:
+            if nbr.radius > 2 * radii[nbr]:
+                candidates = self._nbrs
+            else:
+                candidates = nearby | self.nbrs_of_nbrs(nbr)
+            for other in candidates:
+                if self.iscloseenoughto(nbr, other):
+                    self.addedge(nbr, other)
+        return set(moves)
+
+    def removecell(self, cell):
+        """
+        Remove the vertex `cell` and all of its edges from the graph.
+        """
+        for nbr in list(self.nbrs(cell)):
+            if nbr is not cell:
+                self.removeedge(cell, nbr)
+        del self._nbrs[cell]
+        self._V.discard(cell)
+
     def prunenbrs(self, u):
         """
         Eliminate neighbors that are too far with respect to the current
@@ -261,10 +606,25 @@ class NeighborGraph(Graph):
 
     def cellmass(self, cell):
         """
-        Method to compute the number of points with multiplicity in a cell.
+        Return the total mass of the points in `cell`, with multiplicity.
         Better to use this than `len(cell)`.
         """
-        return sum(self.mass[p] for p in cell)
+        return cell.mass
+
+    def close(self):
+        """
+        Shut down the pool of threads, if there is one.  The graph can still
+        be used, but without the pool.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 class GreedyNeighborGraph(NeighborGraph):
@@ -274,24 +634,169 @@ class GreedyNeighborGraph(NeighborGraph):
                  nbrconstant=1,
                  moveconstant=1,
                  gettransportplan=False,
-                 mass=None):
+                 mass=None,
+                 workers=None,
+                 stats=None,
+                 bucket_size=1,
+                 transportrecords=None,
+                 weighted=False):
+        """
+        Initialize a new GreedyNeighborGraph.
+
+        The cells are kept in a heap ordered by their radii.  If
+        `bucket_size` is greater than one, then the heap is a `BucketQueue`
+        that groups the radii into buckets whose ends differ by a factor of
+        `bucket_size`.  The largest cell is then only found up to that factor,
+        but the heap operations take constant amortized time.
+        If `weighted` is set, then the heap is ordered by the weighted
+        radii of the cells, and then by their radii.  The `priority` function
+        gives the radius or the weighted radius of a cell.
+        The other parameters are as in `NeighborGraph`.
+        """
         super().__init__(M, root, nbrconstant, moveconstant, gettransportplan,
-                         mass)
+                         mass, workers, stats, transportrecords, weighted)
 
         # The root cell should be the only vertex in the graph.
         root_cell = next(iter(self._nbrs))
-        self.heap = MaxHeap([root_cell], key=lambda c: c.radius)
+        self.bucket_size = bucket_size
+        if weighted:
+            key = lambda c: c.weightedradius
+        else:
+            key = lambda c: c.radius
+        self.priority = key
+        if bucket_size > 1:
+            if weighted and not all(self.mass.values()):
+                raise ValueError("A weighted graph with zero masses needs an"
+                                 " exact heap (`bucket_size` of 1).")
+            self.heap = BucketQueue([root_cell], key=key,
+                                    bucket_size=bucket_size)
+        elif weighted:
+            # The cells whose points all have mass zero have a weighted
+            # radius of zero, so they are ordered by their radii to come
+            # before the cells without any points other than their centers.
+            self.heap = MaxHeap([root_cell],
+                                key=lambda c: (c.weightedradius, c.radius))
+        else:
+            self.heap = MaxHeap([root_cell], key=key)
+        if stats is not None:
+            self.heap = CountingHeap(self.heap, stats)
+        self._rebalanced = None
+
+    def maxradius(self):
+        """
+        Return the largest radius of a cell, or the largest weighted radius
+        if the graph is weighted.
+
+        For a bucket queue, only the cells in the top bucket are checked.
+        """
+        if self.bucket_size > 1:
+            return self.heap.maxpriority()
+        return self.priority(self.heap.findmax())
 
     def addcell(self, newcenter, parent):
-        newcell, transportplan = super().addcell(newcenter, parent)
+        # The priorities of the rebalanced cells are updated together after
+        # all of the neighbors have been rebalanced.
+        self._rebalanced = []
+        try:
+            newcell, transportplan = super().addcell(newcenter, parent)
+        finally:
+            rebalanced, self._rebalanced = self._rebalanced, None
+        self.heap.changepriority_many(rebalanced)
         # Add `newcell` to the heap.
         self.heap.insert(newcell)
 
         return newcell, transportplan
 
-    def rebalance(self, a, b):
-        mass_to_move = super().rebalance(a, b)
-        # Update the heap priority for `b`.
-        self.heap.changepriority(b)
+    def addpoint(self, p, mass=1, start=None):
+        cell = super().addpoint(p, mass, start)
+        # Update the heap priority for the cell of `p`.
+        self.heap.changepriority(cell)
 
-        return mass_to_move
\ No newline at end of file
+        return cell
+
+    def removepoint(self, p):
+        cells = super().removepoint(p)
+        # Update the heap priorities for the cells that changed.
+        self.heap.changepriority_many(cells)
+
+        return cells
+
+    def removecell(self, cell):
+        super().removecell(cell)
+        self.heap.remove(cell)
+
+    def rebalance(self, a, b, points_to_move=None):
+        mass_to_move = super().rebalance(a, b, points_to_move)
+        # Update the heap priority for `b`, unless it is deferred by
+        # `addcell`.
+        if self._rebalanced is None:
+            self.heap.changepriority(b)
+        else:
+            self._rebalanced.append(b)
+
+        return mass_to_move
+
+
+class JournaledNeighborGraph(GreedyNeighborGraph):
+    """
+    A `GreedyNeighborGraph` that records the changes made by each call to
+    `addcell`, so that the cells can be removed with `undo` in the reverse
+    order that they were made.
+
+    For each new cell, the journal holds the points moved into it from each
+    neighbor and the edges that were pruned.  The journal has one entry per
+    point moved, which is proportional to the work done by `addcell`.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._journal = []
+        self._entry = None
+
+    def addcell(self, newcenter, parent):
+        self._entry = entry = ([], [])
+        try:
+            newcell, transportplan = super().addcell(newcenter, parent)
+        finally:
+            self._entry = None
+        self._journal.append((newcell, entry))
+        return newcell, transportplan
+
+    def rebalance(self, a, b, points_to_move=None):
+        if self._entry is not None:
+            if points_to_move is None:
+                points_to_move = self.pointstomove(a, b)
+            self._entry[0].append((b, points_to_move))
+        return super().rebalance(a, b, points_to_move)
+
+    def removeedge(self, u, v):
+        super().removeedge(u, v)
+        if self._entry is not None:
+            self._entry[1].append((u, v))
+
+    def undo(self):
+        """
+        Remove the last cell made by `addcell` and return its center.
+
+        The cells of the points that were made later must be removed first.
+        Every point goes back to the cell it came from and the pruned edges
+        are added again.  Points that were added to the cell with `addpoint`
+        after it was made are added again with `addpoint`.
+        """
+        cell, (moves, pruned) = self._journal.pop()
+        center = cell.center
+        home = None
+        for source, points in moves:
+            if center in points:
+                home = source
+            points = {p for p in points if p in cell and p != center}
+            self.rebalance(source, cell, points)
+        added = [p for p in cell.points if p != center]
+        self.removecell(cell)
+        home.addpoint(center, self.mass[center])
+        for u, v in pruned:
+            if u is not cell and v is not cell:
+                self.addedge(u, v)
+        self.heap.changepriority_many({source for source, points in moves})
+        for p in added:
+            self.addpoint(p, self.mass.pop(p))
+        return center
@@ -1,25 +1,121 @@
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from scipy.spatial.distance import cdist
 
 
-def greedy(P, distance='sqeuclidean'):
-    S = cdist(P, P, distance)
-    D = S[0]
-    j = 0
-    for _ in P:
-        yield P[j]
-        j = D.argmax()
-        D = np.minimum(S[j], D)
+def greedy(P,
+           distance='sqeuclidean',
+           tree=False,
+           radii=False,
+           lowmemory=False,
+           chunksize=None,
+           workers=None):
+    """
+    Return an iterator that yields the rows of the array `P` ordered by a
+    greedy permutation.
 
+    The `distance` is any metric name accepted by `scipy.spatial.distance`.
 
-def sample(P, delta, distance='sqeuclidean'):
-    S = cdist(P, P, distance)
-    D = S[0]
-    j = 0
+    If `tree` is set, the index (in the output order) of the nearest
+    predecessor is yielded with each point.
+    If `radii` is set, the insertion radius is yielded with each point.
+    It is measured with `distance`, so the default gives squared distances.
+
+    By default, the full matrix of pairwise distances is computed up front.
+    If `lowmemory` is set, then only the vector of distances to the current
+    sample is stored and the distances from each new point are computed as
+    they are needed.  This uses linear memory.  The row of distances can be
+    computed in blocks of `chunksize` points and these blocks can be split
+    across a pool of `workers` threads.
+    """
+    for j, i, r in _greedy(P, distance, lowmemory, chunksize, workers):
+        output = [P[j]]
+        if tree:
+            output.append(i)
+        if radii:
+            output.append(r)
+        yield output[0] if len(output) == 1 else tuple(output)
+
+
+def sample(P,
+           delta,
+           distance='sqeuclidean',
+           lowmemory=False,
+           chunksize=None,
+           workers=None):
+    """
+    Return the list of points in the greedy permutation of `P` that have
+    insertion radius at least `delta`.
+
+    The optional parameters are the same as for `greedy`.
+    """
     output = []
-    for _ in P:
+    for j, i, r in _greedy(P, distance, lowmemory, chunksize, workers):
+        if r < delta:
+            break
         output.append(P[j])
-        j = D.argmax()
-        if D[j] < delta:
-            return output
-        D = np.minimum(S[j], D)
+    return output
+
+
+def _greedy(P, distance, lowmemory, chunksize, workers):
+    """
+    Iterate over `(index, predecessor, radius)` triples for a greedy
+    permutation of `P`, where `index` is a row of `P` and `predecessor` is the
+    position in the output of its nearest predecessor.
+    """
+    n = len(P)
+    if n == 0:
+        return
+    if lowmemory and workers is not None and workers > 1:
+        pool = ThreadPoolExecutor(workers)
+        if chunksize is None:
+            chunksize = -(-n // workers)
+    else:
+        pool = None
+
+    try:
+        row = _rowfunction(P, distance, lowmemory, chunksize, pool)
+        D = np.array(row(0), dtype=float)
+        pred = np.zeros(n, dtype=np.intp)
+        position = np.zeros(n, dtype=np.intp)
+        yield 0, None, np.inf
+        for i in range(1, n):
+            j = D.argmax()
+            yield j, int(position[pred[j]]), D[j]
+            position[j] = i
+            S = row(j)
+            closer = S < D
+            pred[closer] = j
+            D[closer] = S[closer]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _rowfunction(P, distance, lowmemory, chunksize, pool):
+    """
+    Return a function that maps an index `j` to the array of distances from
+    `P[j]` to all rows of `P`.
+    """
+    if not lowmemory:
+        S = cdist(P, P, distance)
+        return lambda j: S[j]
+
+    n = len(P)
+    if chunksize is None:
+        chunksize = n
+    blocks = [slice(i, i + chunksize) for i in range(0, n, chunksize)]
+
+    def row(j):
+        q = P[j:j+1]
+
+        def block(b):
+            return cdist(q, P[b], distance)[0]
+
+        if pool is None or len(blocks) == 1:
+            parts = [block(b) for b in blocks]
+        else:
+            parts = list(pool.map(block, blocks))
+        return np.concatenate(parts)
+
+    return row
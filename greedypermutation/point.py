@@ -1,3 +1,6 @@
+from math import dist
+
+
 class Point:
     """
     A simple class to describe points in Euclidean space with float
@@ -8,7 +11,7 @@ class Point:
     """
 
     def __init__(self, coords):
-        self._p = tuple(float(x) for x in coords)
+        self._p = tuple(map(float, coords))
 
     @staticmethod
     def fromstring(s):
@@ -21,6 +24,8 @@ class Point:
         If the dimensions don't match the distance is computed in projection
         down to the common subspace.
         """
+        if isinstance(other, Point) and len(other._p) == len(self._p):
+            return dist(self._p, other._p)
         return (sum((a - b)**2 for (a, b) in zip(self, other))) ** (0.5)
 
     def __getitem__(self, index):
@@ -43,3 +48,27 @@ class Point:
 
     def __repr__(self):
         return str(self)
+
+
+class PointArray:
+    """
+    A sequence of points stored as a flat buffer of float coordinates.
+
+    The `coords` can be any sequence of floats, such as an `array` or a
+    memory-mapped `memoryview`, holding `dim` coordinates per point.
+    A `Point` object is only created when a point is accessed.
+    """
+
+    def __init__(self, coords, dim):
+        self.coords = coords
+        self.dim = dim
+
+    def __getitem__(self, index):
+        d = self.dim
+        return Point(self.coords[index * d:(index + 1) * d])
+
+    def __len__(self):
+        return len(self.coords) // self.dim if self.dim else 0
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
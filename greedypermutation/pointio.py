@@ -0,0 +1,119 @@
+from array import array
+
+
+"""
+This module contains functions to read and write large point sets.
+
+Points are read into a single contiguous buffer of floats rather than one
+object per point.  The buffer can be viewed as `Point` objects with
+`point.PointArray` or as an `(n, d)` NumPy array.
+"""
+
+
+CHUNKSIZE = 1 << 22
+
+
+def read_text(f, chunksize=CHUNKSIZE):
+    """
+    Parse the text file `f` with one point per line into a flat buffer of
+    floats and return the pair `(coords, dim)`.
+
+    The coordinates are separated by white space and anything after a
+    semicolon is ignored, as in the text format of `Point.fromstring`.
+    The file is read in blocks of about `chunksize` characters and each block
+    is parsed with a single call to `split`.  A `ValueError` is raised if the
+    number of coordinates in a block is not the dimension of the first point
+    times its number of lines.
+    """
+    coords, dim, tail = array('d'), None, ''
+    while True:
+        chunk = f.read(chunksize)
+        block = tail + chunk
+        if chunk:
+            end = block.rfind('\n') + 1
+            block, tail = block[:end], block[end:]
+        if dim is None:
+            dim = _dimension(block)
+        if ';' in block:
+            block = '\n'.join(line.split(';', 1)[0]
+                              for line in block.split('\n'))
+        values = block.split()
+        if values and len(values) != dim * _countlines(block):
+            raise ValueError("The points do not all have dimension "
+                             + str(dim) + ".")
+        coords.extend(map(float, values))
+        if not chunk:
+            break
+    if not coords:
+        return coords, 0
+    return coords, dim
+
+
+def _countlines(block):
+    """
+    Return the number of lines of `block` that are not blank.
+    """
+    return sum(1 for line in block.split('\n') if line and not line.isspace())
+
+
+def _dimension(block):
+    """
+    Return the number of coordinates on the first nonempty line of `block`,
+    or `None` if there is no such line.
+    """
+    for line in block.split('\n'):
+        n = len(line.split(';', 1)[0].split())
+        if n:
+            return n
+    return None
+
+
+def read_raw(f, dim, chunksize=CHUNKSIZE):
+    """
+    Read the binary file `f` of native doubles with `dim` coordinates per
+    point and return the pair `(coords, dim)`.
+    """
+    coords = array('d')
+    chunksize -= chunksize % coords.itemsize
+    while True:
+        chunk = f.read(chunksize)
+        if not chunk:
+            break
+        coords.frombytes(chunk)
+    if len(coords) % dim:
+        raise ValueError("The file size is not a multiple of the size of a "
+                         "point.")
+    return coords, dim
+
+
+def read_npy(f):
+    """
+    Read a two dimensional array from the `.npy` file `f` and return it as a
+    float array.
+    """
+    import numpy as np
+    P = np.asarray(np.load(f), dtype=float)
+    if P.ndim == 1:
+        P = P.reshape(-1, 1)
+    if P.ndim != 2:
+        raise ValueError("Expected an array with one point per row.")
+    return P
+
+
+def write_lines(f, lines, blocksize=1 << 14):
+    """
+    Write the strings in `lines` to `f`, one per line.
+
+    The lines are joined in blocks of `blocksize` and each block is written
+    with a single call to `write`.
+    """
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) == blocksize:
+            block.append('')
+            f.write('\n'.join(block))
+            block = []
+    if block:
+        block.append('')
+        f.write('\n'.join(block))
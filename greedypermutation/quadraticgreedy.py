@@ -1,8 +1,13 @@
 from email.errors import NonPrintableDefect
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from greedypermutation.instrument import counted
+from greedypermutation.metrics import ArrayMetricSpace, rankdists
 
 
-def greedy(M, seed=None, tree=False, gettransportplan=False, mass=None):
+def greedy(M, seed=None, tree=False, gettransportplan=False, mass=None,
+           stats=None, vectorized=False, chunksize=None, workers=None,
+           transportrecords=None):
     """
     Return an iterator that yields the points of `M` ordered by a greedy
     permutation.
@@ -15,27 +20,53 @@ def greedy(M, seed=None, tree=False, gettransportplan=False, mass=None):
 
     When `gettransportplan` is set to True `_greedy` returns a dictionary of
     mass moved in each step of the greedy permutation.
+
+    If a `Stats` object is given as `stats`, then the distances and the
+    points moved are counted in it and each point output is a step.
+
+    If `vectorized` is set, the distances to the nearest predecessors are
+    kept in a NumPy array, so the farthest point and the points that move
+    are found in bulk instead of by scanning in Python.  The output is the
+    same as for the scan, including the order of the transport plans.
+    The distances from each new point can be computed in blocks of
+    `chunksize` points and these blocks can be split across a pool of
+    `workers` threads.  This gives the same output as long as the distances
+    in `M` do not depend on how they are batched.  An `ArrayMetricSpace`
+    computes batches of fewer than `batchsize` points one distance at a time,
+    which rounds differently, so each block then has at least `batchsize`
+    points.
+
+    If a `TransportRecords` object is given as `transportrecords`, then the
+    transport plan of each step is appended to its columns, with one record
+    for each predecessor that loses mass, in the order of their indices.
+    See `transport`.
     """
+    if vectorized:
+        indexed = isinstance(M, ArrayMetricSpace)
+        gp = _vectorizedgreedy(counted(M, stats), seed, gettransportplan,
+                               mass, stats, chunksize, workers, indexed,
+                               transportrecords,
+                               M.batchsize if indexed else 1)
+    else:
+        gp = _greedy(counted(M, stats), seed, gettransportplan, mass, stats,
+                     transportrecords)
     if tree and gettransportplan:
-        yield from _greedy(M, seed, gettransportplan, mass)
+        yield from gp
     elif tree:
-        for p, i, t in _greedy(M, seed, gettransportplan, mass):
+        for p, i, t in gp:
             yield p, i
     elif gettransportplan:
-        for p, i, t in _greedy(M, seed, gettransportplan, mass):
+        for p, i, t in gp:
             yield p, t
     else:
-        for p, i, t in _greedy(M, seed, gettransportplan, mass):
+        for p, i, t in gp:
             yield p
 
 
-def _greedy(M, seed=None, gettransportplan=False, mass=None):
+def _start(M, seed, mass):
     """
-    Return an iterator that yields `(point, index)` pairs, where `point`
-    is the next point in a greedy permutation and `index` is the index of they
-    nearest predecessor.
-
-    The optional `seed` parameter indicates the point that should appear first.
+    Return the list of the points of `M` with the `seed` first and the
+    dictionary of the mass of each point.
     """
     P = list(M)
 
@@ -52,10 +83,28 @@ def _greedy(M, seed=None, gettransportplan=False, mass=None):
         # Put the seed in the first position.
         seed_index = P.index(seed)
         P[0], P[seed_index] = P[seed_index], P[0]
+    return P, mass
+
+
+def _greedy(M, seed=None, gettransportplan=False, mass=None, stats=None,
+            transportrecords=None):
+    """
+    Return an iterator that yields `(point, index)` pairs, where `point`
+    is the next point in a greedy permutation and `index` is the index of they
+    nearest predecessor.
+
+    The optional `seed` parameter indicates the point that should appear first.
+    """
+    P, mass = _start(M, seed, mass)
     n = len(P)
+    if stats is not None:
+        stats.step()
+    if transportrecords is not None:
+        transportrecords.append(0, -1, 0, sum(mass.values()))
     yield P[0], None, {P[0]: sum(mass.values())}
     pred = {p: 0 for p in P}
-    preddist = {p: M.dist(p, P[pred[p]]) for p in P}
+    # Only comparisons are made, so the rank distances are used.
+    preddist = dict(zip(P, rankdists(M, P[0], P)))
     for i in range(1, n):
         # find the farthest point.
         farthest = i
@@ -66,12 +115,125 @@ def _greedy(M, seed=None, gettransportplan=False, mass=None):
         predecessor = pred[P[i]]
 
         transportplan = defaultdict(int)
-        for j in range(i, n):
-            newdistance = M.dist(P[i], P[j])
+        # The mass moved from each predecessor, indexed by position.
+        moved = defaultdict(int)
+        newdistances = rankdists(M, P[i], P[i:])
+        for j, newdistance in zip(range(i, n), newdistances):
             if newdistance < preddist[P[j]]:
                 transportplan[P[pred[P[j]]]] -= mass[P[j]]
                 transportplan[P[i]] += mass[P[j]]
+                if transportrecords is not None:
+                    moved[pred[P[j]]] += mass[P[j]]
                 if i != j:
                     pred[P[j]] = i
                     preddist[P[j]] = newdistance
+                    if stats is not None:
+                        stats.moves += 1
+        if transportrecords is not None:
+            for source in sorted(moved):
+                transportrecords.append(i, source, i, moved[source])
+        if stats is not None:
+            stats.step()
         yield P[i], predecessor, transportplan
+
+
+def _vectorizedgreedy(M, seed=None, gettransportplan=False, mass=None,
+                      stats=None, chunksize=None, workers=None, indexed=False,
+                      transportrecords=None, minchunk=1):
+    """
+    Return an iterator over the same triples as `_greedy`.
+
+    The arrays `preddist` and `pred` are indexed by the positions in `P`,
+    which are swapped exactly as in `_greedy`.  So the first farthest point
+    is the same, the distances are requested for the same lists of points,
+    and the points that move are visited in the same order.
+    The transport plan is only computed if `gettransportplan` is set.
+
+    If `indexed` is set, the points are the row indices of an
+    `ArrayMetricSpace`.  They are also kept in an array, so that the
+    remaining points are passed to `rankdists` as a slice of that array and
+    the distances come back as an array.
+
+    Every block of the distances has at least `minchunk` points, unless
+    there are fewer points left, so that the blocks are computed by the same
+    kernel as the whole.
+    """
+    import numpy as np
+    P, massof = _start(M, seed, mass)
+    n = len(P)
+    if workers is not None and workers > 1:
+        pool = ThreadPoolExecutor(workers)
+        if chunksize is None:
+            chunksize = -(-n // workers)
+    else:
+        pool = None
+
+    rows = np.array(P, dtype=np.intp) if indexed else None
+
+    def newdistances(i):
+        points = P[i:] if rows is None else rows[i:]
+        if chunksize is None or len(points) <= chunksize:
+            return np.asarray(rankdists(M, P[i], points))
+        size = max(chunksize, minchunk)
+        bounds = list(range(0, len(points), size)) + [len(points)]
+        if len(bounds) > 2 and bounds[-1] - bounds[-2] < minchunk:
+            # Merge the last short block into the one before it.
+            del bounds[-2]
+        blocks = [points[a:b] for a, b in zip(bounds, bounds[1:])]
+        if pool is None:
+            parts = [rankdists(M, P[i], b) for b in blocks]
+        else:
+            parts = pool.map(lambda b: rankdists(M, P[i], b), blocks)
+        return np.concatenate([np.asarray(part) for part in parts])
+
+    try:
+        if stats is not None:
+            stats.step()
+        if transportrecords is not None:
+            transportrecords.append(0, -1, 0, sum(massof.values()))
+        yield P[0], None, {P[0]: sum(massof.values())}
+        mass = [massof[p] for p in P]
+        if transportrecords is not None:
+            massarray = np.array(mass, dtype=float)
+        pred = np.zeros(n, dtype=np.intp)
+        # Only comparisons are made, so the rank distances are used.
+        preddist = newdistances(0)
+        for i in range(1, n):
+            # Find the first farthest point.
+            farthest = i + int(preddist[i:].argmax())
+            P[i], P[farthest] = P[farthest], P[i]
+            if rows is not None:
+                rows[[i, farthest]] = rows[[farthest, i]]
+            mass[i], mass[farthest] = mass[farthest], mass[i]
+            if transportrecords is not None:
+                massarray[[i, farthest]] = massarray[[farthest, i]]
+            pred[[i, farthest]] = pred[[farthest, i]]
+            preddist[[i, farthest]] = preddist[[farthest, i]]
+            predecessor = int(pred[i])
+
+            new = newdistances(i)
+            if new.dtype != preddist.dtype:
+                preddist = preddist.astype(np.result_type(preddist, new))
+            moved = np.flatnonzero(new < preddist[i:])
+            transportplan = defaultdict(int)
+            if gettransportplan:
+                for j in (moved + i).tolist():
+                    transportplan[P[pred[j]]] -= mass[j]
+                    transportplan[P[i]] += mass[j]
+            if transportrecords is not None and len(moved):
+                # Sum the mass moved from each predecessor in bulk.
+                sources = pred[moved + i]
+                masses = np.bincount(sources, weights=massarray[moved + i])
+                sources = np.flatnonzero(np.bincount(sources))
+                transportrecords.extend(i, sources, i, masses[sources])
+            if len(moved) and moved[0] == 0:
+                moved = moved[1:]
+            pred[moved + i] = i
+            preddist[moved + i] = new[moved]
+            if stats is not None:
+                stats.moves += len(moved)
+                stats.step()
+            yield P[i], predecessor, transportplan
+    finally:
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,167 @@
+"""
+This module contains a compact store for the transport plans of a greedy
+permutation.
+
+A transport plan records the mass that moves to the new point at each step.
+Rather than a dictionary per step, a `TransportRecords` object keeps one
+record `(step, source, destination, mass)` for each pair of points that
+exchange mass.  The `source` and `destination` are the indices in the greedy
+order of the points that give and receive the `mass`.  The first step has
+one record with `source == -1`, which puts all of the mass on the first point.
+
+The records are stored in four NumPy arrays, so the plans can be processed
+in bulk without touching Python dictionaries.
+"""
+
+
+class TransportRecords:
+    """
+    A columnar buffer of transport records.
+
+    The columns are the arrays `step`, `source`, `destination` and `mass`.
+    They are views of buffers of `capacity` records, which are allocated up
+    front.
+
+    If `onchunk` is not given, the buffers double in size when they are full,
+    so all of the records are kept.  Otherwise, whenever the buffers are full,
+    `onchunk(records)` is called and the buffers are emptied.  Call `flush()`
+    after the last step to pass on the remaining records.  The columns seen
+    by `onchunk` are overwritten afterwards, so copy them to keep them.
+    The number of records added since the last `clear()` is `total`.
+    """
+    def __init__(self, capacity=1024, onchunk=None):
+        import numpy as np
+        if capacity < 1:
+            raise ValueError("The capacity must be at least one record.")
+        self._np = np
+        self.onchunk = onchunk
+        self._steps = np.empty(capacity, dtype=np.int64)
+        self._sources = np.empty(capacity, dtype=np.int64)
+        self._destinations = np.empty(capacity, dtype=np.int64)
+        self._masses = np.empty(capacity, dtype=float)
+        self._len = 0
+        self.total = 0
+
+    @property
+    def capacity(self):
+        return len(self._steps)
+
+    @property
+    def step(self):
+        return self._steps[:self._len]
+
+    @property
+    def source(self):
+        return self._sources[:self._len]
+
+    @property
+    def destination(self):
+        return self._destinations[:self._len]
+
+    @property
+    def mass(self):
+        return self._masses[:self._len]
+
+    def columns(self):
+        """
+        Return the tuple of the `step`, `source`, `destination` and `mass`
+        columns.
+        """
+        return self.step, self.source, self.destination, self.mass
+
+    def append(self, step, source, destination, mass):
+        """
+        Add one record.
+        """
+        if self._len == self.capacity:
+            self._makeroom()
+        i = self._len
+        self._steps[i] = step
+        self._sources[i] = source
+        self._destinations[i] = destination
+        self._masses[i] = mass
+        self._len += 1
+        self.total += 1
+
+    def extend(self, step, sources, destinations, masses):
+        """
+        Add the records of one `step` given by sequences of `sources`,
+        `destinations` and `masses`.  A single destination may be given as
+        an integer.
+        """
+        np = self._np
+        sources = np.asarray(sources)
+        masses = np.asarray(masses)
+        if np.ndim(destinations):
+            destinations = np.asarray(destinations)
+        start, n = 0, len(sources)
+        while start < n:
+            if self._len == self.capacity:
+                self._makeroom()
+            i = self._len
+            k = min(n - start, self.capacity - i)
+            self._steps[i:i + k] = step
+            self._sources[i:i + k] = sources[start:start + k]
+            self._destinations[i:i + k] = destinations if \
+                np.ndim(destinations) == 0 else destinations[start:start + k]
+            self._masses[i:i + k] = masses[start:start + k]
+            self._len += k
+            self.total += k
+            start += k
+
+    def _makeroom(self):
+        if self.onchunk is not None:
+            self.flush()
+            return
+        np = self._np
+        capacity = 2 * self.capacity
+        for name in ('_steps', '_sources', '_destinations', '_masses'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def flush(self):
+        """
+        Pass the records in the buffers to `onchunk` and empty the buffers.
+        """
+        if self._len and self.onchunk is not None:
+            self.onchunk(self)
+        self._len = 0
+
+    def clear(self):
+        """
+        Remove all of the records without passing them on.
+        """
+        self._len = 0
+        self.total = 0
+
+    def __len__(self):
+        return self._len
+
+    def plans(self, points):
+        """
+        Return the list of transport plans in the buffers as dictionaries
+        indexed by the points, as they are yielded with `gettransportplan`.
+        The `points` are the points in the greedy order.
+
+        The plans start at the first step in the buffers.
+        """
+        plans = []
+        if self._len == 0:
+            return plans
+        first = int(self.step[0])
+        for step, source, destination, mass in zip(*(c.tolist()
+                                                     for c in self.columns())):
+            while len(plans) <= step - first:
+                plans.append({})
+            plan = plans[-1]
+            if source >= 0:
+                source = points[source]
+                plan[source] = plan.get(source, 0) - mass
+            destination = points[destination]
+            plan[destination] = plan.get(destination, 0) + mass
+        return plans
+
+    def __repr__(self):
+        return 'TransportRecords(' + str(self._len) + ' records)'
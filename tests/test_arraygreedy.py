@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from random import random
+from greedypermutation import Point, clarksongreedy
+from greedypermutation.arraygreedy import greedy
+from metricspaces import MetricSpace
+
+
+class TestArrayGreedy(unittest.TestCase):
+    def testgreedy_array(self):
+        P = np.array([[0.], [1.], [2.]])
+        gp = list(greedy(P))
+        self.assertEqual([p[0] for p in gp], [0, 2, 1])
+
+    def testgreedy_points(self):
+        P = [Point([i]) for i in range(3)]
+        gp = list(greedy(MetricSpace(P), P[0]))
+        self.assertEqual(gp, [P[0], P[2], P[1]])
+
+    def testgreedytree_randomexample(self):
+        root = Point([0])
+        P = MetricSpace([root] + [Point([x])
+                        for x in [8, 12, 100, 40, 70, 1, 72]])
+        gp = greedy(P, root, tree=True)
+        self.assertEqual(next(gp), (Point([0]), None))
+        self.assertEqual(next(gp), (Point([100]), 0))
+        self.assertEqual(next(gp), (Point([40]), 0))
+        self.assertEqual(next(gp), (Point([70]), 1))
+        self.assertEqual(next(gp), (Point([12]), 0))
+        self.assertEqual(next(gp), (Point([8]), 4))
+        self.assertEqual(next(gp), (Point([72]), 3))
+
+    def testgreedy_transportplan_mass(self):
+        M = MetricSpace([Point([c]) for c in [0, 9, 3, 5, 17]])
+        gp = greedy(M, gettransportplan=True, mass=[1, 2, 3, 4, 5])
+        p = {c: Point([c]) for c in [0, 9, 3, 5, 17]}
+        self.assertEqual(next(gp), (p[0], {p[0]: 15}))
+        self.assertEqual(next(gp), (p[17], {p[17]: 7, p[0]: -7}))
+        self.assertEqual(next(gp), (p[9], {p[9]: 6, p[0]: -4, p[17]: -2}))
+
+    def testsame_as_clarkson(self):
+        P = MetricSpace([Point([random(), random(), random()])
+                         for i in range(500)])
+        expected = list(clarksongreedy.greedy(P, tree=True))
+        self.assertEqual(list(greedy(P, tree=True)), expected)
+        self.assertEqual(list(clarksongreedy.greedy(P, tree=True,
+                                                    vectorized=True)),
+                         expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from random import randrange
 from metricspaces import MetricSpace, R1
 from greedypermutation.balltree import Ball, greedy_tree
 
@@ -160,6 +161,93 @@ class TestBallTree(unittest.TestCase):
         self.assertEqual(3, balltree.knn_dist(6, R1(7)))
         self.assertEqual(4.5, balltree.knn_dist(10, R1(22.5)))
 
+    def test_insert(self):
+        M = MetricSpace({randrange(1000) for i in range(100)}, pointclass=R1)
+        balltree = greedy_tree(M)
+        new = [R1(x) for x in [-50, 500.5, 2000]]
+        for p in new:
+            leaf = balltree.insert(p)
+            self.assertEqual(leaf.center, p)
+            self.assertTrue(leaf.isleaf())
+        self.assertEqual(len(balltree), len(M) + 3)
+        self.assertEqual(set(balltree), set(M) | set(new))
+        stack = [balltree]
+        while stack:
+            ball = stack.pop()
+            self.assertTrue(all(ball.dist(p) <= ball.radius for p in ball))
+            if not ball.isleaf():
+                self.assertEqual(len(ball), len(ball.left) + len(ball.right))
+                stack.extend([ball.left, ball.right])
+        self.assertEqual(balltree.nn(R1(1990)), R1(2000))
+
+    def test_remove(self):
+        M = MetricSpace({randrange(1000) for i in range(100)}, pointclass=R1)
+        balltree = greedy_tree(M)
+        points = list(M)
+        removed = set(points[::3])
+        for p in points[::3]:
+            balltree.remove(p)
+        self.assertEqual(len(balltree), len(M) - len(removed))
+        self.assertEqual(set(balltree), set(M) - removed)
+        stack = [balltree]
+        while stack:
+            ball = stack.pop()
+            self.assertTrue(all(ball.dist(p) <= ball.radius for p in ball))
+            if not ball.isleaf():
+                self.assertEqual(ball.left.center, ball.center)
+                self.assertEqual(len(ball), len(ball.left) + len(ball.right))
+                stack.extend([ball.left, ball.right])
+        for p in points[1::3]:
+            self.assertEqual(balltree.nn(p), p)
+        with self.assertRaises(ValueError):
+            balltree.remove(points[0])
+        single = greedy_tree(MetricSpace([R1(1)]))
+        with self.assertRaises(ValueError):
+            single.remove(R1(1))
+
+    def test_batch_queries(self):
+        M = MetricSpace({randrange(10000) for i in range(500)},
+                        pointclass=R1)
+        balltree = greedy_tree(M)
+        Q = [R1(randrange(-100, 10100)) for i in range(50)]
+        for workers in [None, 3]:
+            nn = balltree.nn_batch(Q, workers=workers)
+            self.assertEqual([q.dist(p) for q, p in zip(Q, nn)],
+                             [q.dist(balltree.nn(q)) for q in Q])
+            knn = balltree.knn_batch(4, Q, workers=workers)
+            for q, points in zip(Q, knn):
+                dists = [q.dist(p) for p in points]
+                self.assertEqual(dists, sorted(dists))
+                self.assertEqual(dists[-1], balltree.knn_dist(4, q))
+            self.assertEqual(balltree.range_count_batch(Q, 300,
+                                                        workers=workers),
+                             [balltree.range_count(q, 300) for q in Q])
+
+    def test_batch_small(self):
+        M = MetricSpace(range(100), pointclass=R1)
+        balltree = greedy_tree(M)
+        self.assertEqual(balltree.nn_batch([R1(7.2), R1(-3)]), [7, 0])
+        self.assertEqual(balltree.knn_batch(3, [R1(7.2)]), [[7, 8, 6]])
+        self.assertEqual(balltree.range_count_batch([R1(9), R1(50)], 2),
+                         [5, 5])
+        self.assertEqual(balltree.nn_batch([]), [])
+
+    def test_deep(self):
+        # Each point is nearest to 0, so the balls centered at 0 form a path
+        # that is much longer than the recursion limit.
+        n = 3000
+        T = [(0, None)] + [(3 ** k, 0) for k in range(n, 0, -1)]
+        BallTree = Ball(MetricSpace(dist=lambda a, b: abs(a - b)))
+        balltree = BallTree.tree(T)
+        self.assertEqual(balltree.height(), n + 1)
+        self.assertEqual(len(balltree), n + 1)
+        self.assertEqual(balltree.radius, 3 ** n)
+        self.assertEqual(list(balltree),
+                         [0] + [3 ** k for k in range(1, n + 1)])
+        balltree.remove(3)
+        self.assertEqual(len(balltree), n)
+        self.assertEqual(next(iter(balltree)), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
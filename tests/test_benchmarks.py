@@ -0,0 +1,62 @@
+import unittest
+from benchmarks.datasets import DATASETS
+from benchmarks.run import ALGORITHMS, QUERIES, run
+from benchmarks import heaps
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_datasets(self):
+        for name, generate in DATASETS.items():
+            P = generate(20, 3, seed=1)
+            self.assertEqual(len(P), 20)
+            self.assertTrue(all(len(p) == 3 for p in P))
+            self.assertEqual(P, generate(20, 3, seed=1))
+
+    def test_run(self):
+        results = list(run(['clarkson', 'quadratic', 'nn', 'allrange'],
+                           ['uniform'], [30], [2], queries=5, memory=False))
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertGreater(result['distances'], 0)
+            self.assertIn('seconds', result)
+        self.assertEqual(results[1]['distances'], 30 * 31 // 2)
+
+    def test_duplicates(self):
+        names = list(ALGORITHMS) + list(QUERIES)
+        results = list(run(names, ['duplicates'], [40], [2], queries=5,
+                           memory=False))
+        self.assertEqual(len(results), len(names))
+        for result in results:
+            self.assertLess(result['distinct'], 40)
+            if result['benchmark'] == 'dedup':
+                self.assertGreater(result['distances'], 0)
+            else:
+                self.assertIn('skipped', result)
+
+    def test_uncounted(self):
+        results = list(run(['vectorized', 'dedup'], ['uniform'], [30], [2],
+                           memory=False))
+        self.assertIsNone(results[0]['distances'])
+        self.assertEqual(results[1]['distinct'], 30)
+        self.assertGreater(results[1]['distances'], 0)
+
+    def test_failure(self):
+        def fail(points, counter):
+            raise RuntimeError("broken")
+        ALGORITHMS['broken'] = fail
+        try:
+            with self.assertRaises(RuntimeError):
+                list(run(['broken'], ['uniform'], [10], [2], memory=False))
+        finally:
+            del ALGORITHMS['broken']
+
+    def test_heaps(self):
+        trace = heaps.record(DATASETS['uniform'](50, 2, seed=1))
+        self.assertEqual(sum(op[0] == 'insert' for op in trace), 50)
+        results = list(heaps.run([50], repeat=1))
+        self.assertEqual([r['heap'] for r in results], list(heaps.HEAPS))
+        self.assertEqual(results[0]['operations'], results[1]['operations'])
+
+
+if __name__ == '__main__':
+    unittest.main()
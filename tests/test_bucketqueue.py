@@ -0,0 +1,77 @@
+import unittest
+from random import random, randrange
+from greedypermutation.fvm.bucketqueue import BucketQueue
+
+
+class TestBucketQueue(unittest.TestCase):
+    def testinit(self):
+        Q = BucketQueue([1, 2, 3])
+        self.assertEqual(len(Q), 3)
+        self.assertTrue(2 in Q)
+        with self.assertRaises(RuntimeError):
+            BucketQueue(bucket_size=1)
+
+    def testfindmax(self):
+        Q = BucketQueue([1, 3, 17, 5, 9])
+        self.assertEqual(Q.findmax(), 17)
+        self.assertEqual(Q.maxpriority(), 17)
+        self.assertEqual(list(Q), [17, 9, 5, 3, 1])
+        self.assertEqual(len(Q), 0)
+        with self.assertRaises(RuntimeError):
+            Q.findmax()
+
+    def testchangepriority(self):
+        Q = BucketQueue(bucket_size=2)
+        for i in range(10):
+            Q.insert(i, 2 ** i)
+        Q.changepriority(3, 2 ** 20)
+        self.assertEqual(Q.removemax(), 3)
+        Q.changepriority(9, 0.5)
+        self.assertEqual(Q.findmax(), 8)
+        Q.remove(8)
+        self.assertEqual(Q.findmax(), 7)
+        self.assertFalse(8 in Q)
+        self.assertEqual(len(Q), 8)
+        with self.assertRaises(RuntimeError):
+            Q.remove(8)
+
+    def testbackburner(self):
+        Q = BucketQueue(bucket_size=2, num_buckets=2)
+        Q.insert('a', 1024)
+        Q.insert('b', 1)
+        Q.insert('c', 2)
+        self.assertEqual(set(Q.backburner), {0, 1})
+        self.assertEqual(Q.removemax(), 'a')
+        # The whole backburner is moved back once the queue is empty.
+        self.assertEqual(Q.removemax(), 'c')
+        self.assertEqual(Q.removemax(), 'b')
+
+    def testreuse_level(self):
+        Q = BucketQueue(bucket_size=2)
+        Q.insert('a', 1024)
+        for i in range(1000):
+            Q.insert('b', 4)
+            Q.remove('b')
+        self.assertEqual(len(Q._order), 2)
+        self.assertEqual(Q.removemax(), 'a')
+        Q.insert('b', 4)
+        self.assertEqual(Q.removemax(), 'b')
+
+    def testapproximation(self):
+        for num_buckets in [None, 0, 3]:
+            Q = BucketQueue(bucket_size=2, num_buckets=num_buckets)
+            priorities = {}
+            for i in range(500):
+                if randrange(3) or not priorities:
+                    priorities[i] = random() * 10 ** randrange(4)
+                    Q.insert(i, priorities[i])
+                else:
+                    item = Q.removemax()
+                    self.assertGreaterEqual(2 * priorities.pop(item) + 1e-7,
+                                            max(priorities.values(),
+                                                default=0))
+                self.assertEqual(len(Q), len(priorities))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 import os
+import numpy as np
+from array import array
 from click.testing import CliRunner
 from greedypermutation.cli import cli
 
@@ -41,6 +43,18 @@ class TestCLI(unittest.TestCase):
             gp = result.output.split('\n')
             self.assertTrue(';' not in gp[0])
 
+    def testgreedy_vectorized(self):
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open('pointfile', 'w') as f:
+                f.write(POINTS)
+            result = runner.invoke(
+                cli, ['pointfile', '--algorithm', 'vectorized'])
+            self.assertEqual(result.exit_code, 0)
+            gp = result.output.split('\n')
+            self.assertEqual(gp[0], '1.0 2.0;None')
+            self.assertEqual(gp[1], '100.0 2.0;0')
+
     def testgreedy_quadratic(self):
         runner = CliRunner()
         with runner.isolated_filesystem():
@@ -52,6 +66,60 @@ class TestCLI(unittest.TestCase):
             gp = result.output.split('\n')
             self.assertTrue(';' not in gp[0])
 
+    def testgreedy_binary(self):
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open('pointfile', 'w') as f:
+                f.write(POINTS)
+            expected = runner.invoke(cli, ['pointfile']).output
+            P = np.array([[1, 2], [100, 2], [45, 3], [25, 0]], dtype=float)
+            np.save('points.npy', P)
+            with open('points.raw', 'wb') as f:
+                f.write(array('d', P.ravel()).tobytes())
+            result = runner.invoke(cli, ['points.npy', '--format', 'npy'])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(result.output, expected)
+            result = runner.invoke(cli, ['points.raw', '--format', 'raw',
+                                         '--dim', '2'])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(result.output, expected)
+            result = runner.invoke(cli, ['points.raw', '--format', 'raw'])
+            self.assertNotEqual(result.exit_code, 0)
+
+    def testgreedy_annotated(self):
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open('pointfile', 'w') as f:
+                f.write(POINTS)
+            expected = runner.invoke(cli, ['pointfile']).output
+            with open('pointfile', 'w') as f:
+                f.write(expected)
+            result = runner.invoke(cli, ['pointfile'])
+            self.assertEqual(result.output, expected)
+
+    def testgreedy_duplicates(self):
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open('pointfile', 'w') as f:
+                f.write(POINTS + POINTS)
+            for algorithm in ['clarkson', 'quadratic', 'vectorized']:
+                result = runner.invoke(
+                    cli, ['pointfile', '--algorithm', algorithm])
+                self.assertEqual(result.exit_code, 0)
+                gp = result.output.split('\n')[:-1]
+                self.assertEqual(len(gp), 8)
+                # The copies come last, after their first copies.
+                self.assertEqual(gp[:2], ['1.0 2.0;None', '100.0 2.0;0'])
+                for line in gp[4:]:
+                    p, i = line.split(';')
+                    self.assertEqual(gp[int(i)].split(';')[0], p)
+            with open('pointfile', 'w') as f:
+                f.write(POINTS)
+            result = runner.invoke(cli, ['pointfile', '--nodedup'])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(result.output,
+                             runner.invoke(cli, ['pointfile']).output)
+
 
 POINTS = """\
 1 2
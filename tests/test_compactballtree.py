@@ -0,0 +1,128 @@
+import mmap
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+from random import random, randrange
+from metricspaces import MetricSpace, R1
+from greedypermutation import Point
+from greedypermutation.balltree import greedy_tree
+from greedypermutation.compactballtree import (CompactBallTree,
+                                               compact_greedy_tree)
+
+
+class TestCompactBallTree(unittest.TestCase):
+    def setUp(self):
+        self.M = MetricSpace({randrange(10000) for i in range(300)},
+                             pointclass=R1)
+        self.ball = greedy_tree(self.M)
+        self.tree = compact_greedy_tree(self.M)
+
+    def test_greedytree(self):
+        M = MetricSpace([10, 4, 15, 17], pointclass=R1)
+        T = compact_greedy_tree(M)
+        self.assertEqual(len(T), 4)
+        self.assertEqual(T.radius[0], 7)
+        self.assertEqual(T.points, [M[0], M[3], M[1], M[2]])
+        self.assertEqual(set(T), set(M))
+        self.assertEqual(T.height(), 3)
+
+    def test_same_as_ball(self):
+        self.assertEqual(str(self.tree.toball()), str(self.ball))
+        self.assertEqual(sorted(self.tree.radius),
+                         sorted(CompactBallTree.fromball(self.ball).radius))
+        self.assertEqual(self.tree.height(), self.ball.height())
+
+    def test_fromball_toball(self):
+        T = CompactBallTree.fromball(self.ball)
+        B = T.toball()
+        self.assertEqual(str(B), str(self.ball))
+        self.assertEqual(len(B), len(self.ball))
+
+    def test_queries(self):
+        T, B = self.tree, self.ball
+        for q in [R1(randrange(-100, 10100)) for i in range(20)]:
+            self.assertEqual(q.dist(T.nn(q)), q.dist(B.nn(q)))
+            self.assertEqual(T.farthest_point(q), B.farthest_point(q))
+            self.assertEqual(set(T.range_search(q, 500)),
+                             set(B.range_search(q, 500)))
+            self.assertEqual(T.range_count(q, 500), B.range_count(q, 500))
+            self.assertEqual(set(T.knn(5, q)), set(B.knn(5, q)))
+            self.assertEqual(T.knn_dist(5, q), B.knn_dist(5, q))
+
+    def test_save_load(self):
+        M = MetricSpace([Point([random(), random()]) for i in range(200)])
+        T = compact_greedy_tree(M)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tree.gpt')
+            T.save(path)
+            L = CompactBallTree.load(path)
+            self.assertEqual(list(L.center), list(T.center))
+            self.assertEqual(list(L.radius), list(T.radius))
+            self.assertEqual(list(L.pred), list(T.predecessors()))
+            self.assertEqual(list(L.points), T.points)
+            self.assertEqual([M[i] for i in L.order], list(T.points))
+            q = Point([0.5, 0.5])
+            self.assertEqual(L.nn(q), T.nn(q))
+            self.assertEqual(L.range_count(q, 0.2), T.range_count(q, 0.2))
+
+            T.save(path, coordinates=False)
+            self.assertRaises(ValueError, CompactBallTree.load, path)
+            L = CompactBallTree.load(path, points=list(M))
+            self.assertEqual(list(L.points), T.points)
+            self.assertEqual(set(L.knn(3, q)), set(T.knn(3, q)))
+
+    def test_load_bad_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tree.gpt')
+            with open(path, 'wb') as f:
+                f.write(bytes(64))
+            self.assertRaises(ValueError, CompactBallTree.load, path)
+            with open(path, 'wb') as f:
+                f.write(b'GPBTREE')
+            self.assertRaises(ValueError, CompactBallTree.load, path)
+            with open(path, 'wb'):
+                pass
+            self.assertRaises(ValueError, CompactBallTree.load, path)
+            T = compact_greedy_tree(MetricSpace([Point([i, 0])
+                                                 for i in range(10)]))
+            T.save(path)
+            with open(path, 'rb+') as f:
+                f.truncate(100)
+            self.assertRaises(ValueError, CompactBallTree.load, path)
+
+    def test_load_bad_itemsize(self):
+        T = compact_greedy_tree(MetricSpace([Point([i, 0])
+                                             for i in range(10)]))
+        buffers, open_mmap = [], mmap.mmap
+
+        def record(*args, **kwargs):
+            buffers.append(open_mmap(*args, **kwargs))
+            return buffers[-1]
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tree.gpt')
+            T.save(path)
+            with open(path, 'rb+') as f:
+                f.seek(16)
+                f.write(struct.pack('<I', 2))
+            with mock.patch('mmap.mmap', record):
+                self.assertRaises(ValueError, CompactBallTree.load, path)
+            self.assertTrue(buffers[0].closed)
+
+    def test_save_non_vectors(self):
+        M = MetricSpace(['a', 'bc', 'def'],
+                        dist=lambda a, b: abs(len(a) - len(b)))
+        T = compact_greedy_tree(M)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tree.gpt')
+            self.assertRaises(ValueError, T.save, path, coordinates=True)
+            T.save(path)
+            self.assertRaises(ValueError, CompactBallTree.load, path)
+            L = CompactBallTree.load(path, points=list(M))
+            self.assertEqual(list(L.points), T.points)
+
+
+if __name__ == '__main__':
+    unittest.main()
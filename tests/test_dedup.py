@@ -0,0 +1,80 @@
+import unittest
+from functools import partial
+from random import Random
+from metricspaces import MetricSpace
+from greedypermutation import Point, clarksongreedy, quadraticgreedy
+from greedypermutation.dedup import Deduplicated, greedy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestDedup(unittest.TestCase):
+    def setUp(self):
+        rng = Random(0)
+        base = [Point([rng.random(), rng.random()]) for i in range(30)]
+        # Equal copies that are different objects.
+        self.P = [Point(list(rng.choice(base))) for i in range(200)]
+
+    def test_deduplicated(self):
+        P = [Point([0]), Point([1]), Point([0]), Point([2]), Point([1])]
+        D = Deduplicated(P)
+        self.assertEqual(D.points, [Point([0]), Point([1]), Point([2])])
+        self.assertEqual(D.mass, [2, 2, 1])
+        self.assertEqual(D.inverse, [0, 1, 0, 2, 1])
+        self.assertEqual(D.first, [0, 1, 3])
+        self.assertEqual(D.copies(1), [1, 4])
+        self.assertEqual(len(D), 3)
+        D = Deduplicated(P, mass=[1, 2, 3, 4, 5])
+        self.assertEqual(D.mass, [4, 7, 4])
+        self.assertEqual(D.expand([2, 0, 1]), [3, 0, 1, 2, 4])
+        self.assertEqual(D.expand([(2, None), (0, 0), (1, 1)], tree=True),
+                         [(3, None), (0, 0), (1, 1), (2, 1), (4, 2)])
+        with self.assertRaises(ValueError):
+            Deduplicated(P, mass=[1])
+
+    def test_greedy(self):
+        D = Deduplicated(self.P)
+        output = greedy(self.P, tree=True)
+        self.assertEqual(sorted(i for i, j in output), list(range(200)))
+        # The distinct points come first, in the order of the permutation
+        # of the distinct points.
+        M = MetricSpace(D.points)
+        expected = list(clarksongreedy.greedy(M, tree=True, mass=D.mass))
+        self.assertEqual([(self.P[i], j) for i, j in output[:len(D)]],
+                         expected)
+        for position, (i, j) in enumerate(output[len(D):], start=len(D)):
+            self.assertEqual(self.P[output[j][0]], self.P[i])
+            self.assertLess(j, len(D))
+
+    def test_seed_and_algorithm(self):
+        output = greedy(self.P, seed=5,
+                        algorithm=partial(quadraticgreedy.greedy,
+                                          vectorized=True))
+        self.assertEqual(output[0], Deduplicated(self.P).first[
+            Deduplicated(self.P).inverse[5]])
+        self.assertEqual(len(output), 200)
+
+    def test_unsupported_outputs(self):
+        for name in ['pointtree', 'gettransportplan']:
+            with self.assertRaises(ValueError):
+                greedy(self.P, **{name: True})
+
+    @unittest.skipIf(np is None, "NumPy is not installed.")
+    def test_array(self):
+        A = np.array([list(p) for p in self.P])
+        D = Deduplicated(A)
+        E = Deduplicated([tuple(p) for p in self.P])
+        self.assertEqual(D.first, E.first)
+        self.assertEqual(D.inverse, E.inverse)
+        self.assertEqual(D.mass, E.mass)
+        self.assertEqual(D.points.tolist(), [list(p) for p in E.points])
+        self.assertEqual(Deduplicated(A, mass=[2] * 200).mass,
+                         [2 * m for m in D.mass])
+        self.assertEqual(greedy(A), greedy(self.P))
+
+
+if __name__ == '__main__':
+    unittest.main()
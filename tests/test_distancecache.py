@@ -0,0 +1,83 @@
+import unittest
+from random import random
+from metricspaces import MetricSpace
+from greedypermutation import Point
+from greedypermutation.balltree import greedy_tree
+from greedypermutation.distancecache import CachedMetric
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, a, b):
+        self.count += 1
+        return a.dist(b)
+
+
+class TestCachedMetric(unittest.TestCase):
+    def setUp(self):
+        self.P = [Point([random(), random()]) for i in range(200)]
+        self.counter = Counter()
+        self.M = MetricSpace(self.P, dist=self.counter, turnoffcache=True)
+
+    def test_hits(self):
+        for policy in ['lru', 'clock']:
+            C = CachedMetric(self.M, policy=policy)
+            a, b = self.P[:2]
+            self.assertEqual(C.dist(a, b), a.dist(b))
+            self.assertEqual(C.dist(b, a), a.dist(b))
+            self.assertEqual(C.dists(a, self.P[:5]),
+                             [a.dist(p) for p in self.P[:5]])
+            self.assertEqual(C.info()['hits'], 2)
+            self.assertEqual(C.info()['misses'], 5)
+            self.assertEqual(C.info()['size'], 5)
+            C.clear()
+            self.assertEqual(C.info()['size'], 0)
+
+    def test_eviction(self):
+        a, b, c, d = self.P[:4]
+        C = CachedMetric(self.M, maxsize=2, policy='lru')
+        C.dist(a, b)
+        C.dist(a, c)
+        C.dist(a, b)
+        C.dist(a, d)
+        self.assertEqual(C.evictions, 1)
+        C.dist(a, b)
+        self.assertEqual(C.hits, 2)
+        C.dist(a, c)
+        self.assertEqual(C.misses, 4)
+        C = CachedMetric(self.M, maxsize=10, policy='clock')
+        for p in self.P:
+            C.dist(a, p)
+            C.dist(a, self.P[0])
+        self.assertEqual(C.info()['size'], 10)
+        self.assertEqual(C.evictions, len(self.P) - 10)
+        # The distance that is used every time is never evicted.
+        self.assertEqual(C.hits, len(self.P))
+
+    def test_greedy_tree(self):
+        expected = greedy_tree(MetricSpace(self.P))
+        self.counter.count = 0
+        C = CachedMetric(self.M, maxsize=5000, policy='clock')
+        tree = greedy_tree(C)
+        self.assertEqual(list(tree), list(expected))
+        self.assertEqual(tree.radius, expected.radius)
+        self.assertEqual(self.counter.count, C.misses)
+        self.assertGreater(C.hits, 0)
+        self.assertLessEqual(C.info()['size'], 5000)
+
+    def test_transient_queries(self):
+        # Each query is freed after its search, so a new query may get the
+        # same `id`.  It must not hit the distances of the old one.
+        M = MetricSpace(self.P, turnoffcache=True)
+        for policy in ['lru', 'clock']:
+            tree = greedy_tree(CachedMetric(M, maxsize=5000, policy=policy))
+            for i in range(100):
+                x, y = random(), random()
+                nearest = min(self.P, key=Point([x, y]).dist)
+                self.assertEqual(tree.nn(Point([x, y])), nearest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from random import random
+from greedypermutation import Point
+from greedypermutation.fvm.merge import (build_tree, build_parallel, encode,
+                                         decode)
+from greedypermutation.fvm.simpleball import SimpleBall
+from metricspaces import MetricSpace
+
+
+class TestBuildParallel(unittest.TestCase):
+    def setUp(self):
+        self.P = [Point([random(), random()]) for i in range(300)]
+
+    def check_radii(self, tree):
+        stack = [tree]
+        while stack:
+            ball = stack.pop()
+            for p in ball:
+                self.assertTrue(ball.dist(p) <= ball.radius + 1e-9)
+            if not ball.isleaf():
+                stack.extend([ball.left, ball.right])
+
+    def testencode_decode(self):
+        tree = build_tree(self.P[:50])
+        index = {p: i for i, p in enumerate(self.P)}.__getitem__
+        copy = decode(encode(tree, index), self.P)
+        self.assertEqual(encode(copy, index), encode(tree, index))
+        self.assertEqual(len(copy), 50)
+
+    def testbuild_parallel(self):
+        tree = build_parallel(self.P, leafsize=40, workers=2)
+        self.assertEqual(len(tree), len(self.P))
+        self.assertEqual(set(tree), set(self.P))
+        self.check_radii(tree)
+
+
+class TestSimpleBall(unittest.TestCase):
+    def testdeep(self):
+        # Every split is of the leaf centered at 0, so the tree is a path that
+        # is much longer than the recursion limit.
+        n = 3000
+        BallTree = SimpleBall(MetricSpace(dist=lambda a, b: abs(a - b)))
+        root = leaf = BallTree(0)
+        for k in range(n, 0, -1):
+            leaf.left, leaf.right = BallTree(0), BallTree(3 ** k)
+            leaf = leaf.left
+        root.count()
+        root.exact_radii()
+        self.assertEqual(len(root), n + 1)
+        self.assertEqual(root.radius, 3 ** n)
+        self.assertEqual(list(root), [0] + [3 ** k for k in range(1, n + 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
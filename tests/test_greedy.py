@@ -1,10 +1,14 @@
 import unittest
-from random import randrange, seed
+from random import random, randrange, seed
 from collections import defaultdict
+from functools import partial
+from types import SimpleNamespace
 from greedypermutation import (Point,
                                quadraticgreedy,
                                clarksongreedy,
                                )
+from greedypermutation.instrument import ApproximationReport, Stats
+from greedypermutation.metrics import ArrayMetricSpace
 from metricspaces import MetricSpace
 
 
@@ -12,6 +16,15 @@ def ell_1(a, b):
     return abs(a - b)
 
 
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, a, b):
+        self.count += 1
+        return a.dist(b)
+
+
 class GreedyTests:
     def testgreedy(self):
         greedy = self.implementation.greedy
@@ -148,6 +161,161 @@ def _test(impl):
 
 TestQuadraticGreedy = _test(quadraticgreedy)
 TestClarksonGreedy = _test(clarksongreedy)
+TestClarksonGreedyParallel = _test(SimpleNamespace(
+    greedy=partial(clarksongreedy.greedy, workers=4)))
+TestQuadraticGreedyVectorized = _test(SimpleNamespace(
+    greedy=partial(quadraticgreedy.greedy, vectorized=True)))
+
+
+class TestVectorizedQuadraticGreedy(unittest.TestCase):
+    def testsame_output(self):
+        seed(1)
+        # The grid has many ties among the distances.
+        P = [Point([randrange(8), randrange(8)]) for i in range(40)]
+        P = list(dict.fromkeys(P)) + [Point([random(), random()])
+                                      for i in range(200)]
+        mass = [randrange(1, 5) for p in P]
+        M = MetricSpace(P)
+        expected = list(quadraticgreedy.greedy(M, P[3], tree=True,
+                                               gettransportplan=True,
+                                               mass=mass))
+        for chunksize, workers in [(None, None), (7, None), (None, 3)]:
+            gp = list(quadraticgreedy.greedy(M, P[3], tree=True,
+                                             gettransportplan=True,
+                                             mass=mass, vectorized=True,
+                                             chunksize=chunksize,
+                                             workers=workers))
+            self.assertEqual(gp, expected)
+            for (p, i, t), (q, j, u) in zip(gp, expected):
+                self.assertEqual(list(t.items()), list(u.items()))
+
+    def testsame_output_array(self):
+        # Blocks of an ArrayMetricSpace smaller than its `batchsize` are
+        # computed one distance at a time, which rounds differently.
+        seed(3)
+        P = list(dict.fromkeys((randrange(20), randrange(15))
+                               for i in range(300)))
+        mass = [randrange(1, 5) for p in P]
+        M = ArrayMetricSpace(P)
+        expected = list(quadraticgreedy.greedy(M, 3, tree=True,
+                                               gettransportplan=True,
+                                               mass=mass))
+        for chunksize, workers in [(None, None), (50, None), (5, None),
+                                   (16, 2), (None, 3)]:
+            gp = list(quadraticgreedy.greedy(M, 3, tree=True,
+                                             gettransportplan=True,
+                                             mass=mass, vectorized=True,
+                                             chunksize=chunksize,
+                                             workers=workers))
+            self.assertEqual(gp, expected)
+
+class TestBucketGreedy(unittest.TestCase):
+    def testbucket_size(self):
+        P = [Point([random(), random()]) for i in range(300)]
+        M = MetricSpace(P)
+        report = ApproximationReport()
+        gp = list(clarksongreedy.greedy(M, P[0], bucket_size=2,
+                                        report=report))
+        self.assertEqual(len(gp), len(P))
+        self.assertEqual(set(gp), set(P))
+        self.assertEqual(report.bound, 2)
+        self.assertEqual(len(report.ratios), len(P) - 1)
+        self.assertTrue(report.within_bound())
+        # Check the insertion radii against the exact greedy choices.
+        nearest = {p: M.dist(p, gp[0]) for p in P}
+        for p in gp[1:]:
+            self.assertGreaterEqual(2 * nearest[p], max(nearest.values()))
+            for q in P:
+                nearest[q] = min(nearest[q], M.dist(p, q))
+
+    def testexact_report(self):
+        P = [Point([random(), random()]) for i in range(100)]
+        report = ApproximationReport()
+        list(clarksongreedy.greedy(MetricSpace(P), report=report))
+        self.assertEqual(report.worst, 1)
+
+
+class TestIncrementalGreedy(unittest.TestCase):
+    def testadd(self):
+        P = [Point([random(), random()]) for i in range(200)]
+        IG = clarksongreedy.IncrementalGreedy(MetricSpace(P[:150]), P[0])
+        self.assertEqual(len(IG.prefix()), 150)
+        IG.extend(P[150:])
+        prefix = IG.prefix()
+        expected = list(clarksongreedy.greedy(MetricSpace(P), P[0], tree=True))
+        self.assertEqual([(p, i) for p, i, r in prefix],
+                         expected[:len(prefix)])
+        self.assertEqual(IG.greedy(tree=True), expected)
+        self.assertEqual(len(IG.prefix()), len(P))
+
+    def testadd_distances(self):
+        seed(2)
+        n = 1000
+        P = [Point([random(), random()]) for i in range(n)]
+        counter = Counter()
+        M = MetricSpace(P, dist=counter, turnoffcache=True)
+        IG = clarksongreedy.IncrementalGreedy(M, P[0])
+        full = counter.count
+        # New points near the end of the permutation only change the end.
+        counter.count = 0
+        Q = [Point([p[0] + 1e-9, p[1]]) for p in IG.greedy()[-10:]]
+        IG.extend(Q)
+        self.assertGreaterEqual(len(IG.prefix()), n - 10)
+        gp = IG.greedy(tree=True)
+        self.assertLess(counter.count, full / 5)
+        expected = list(clarksongreedy.greedy(MetricSpace(P + Q), P[0],
+                                              tree=True))
+        self.assertEqual(gp, expected)
+
+    def testadd_far_point(self):
+        P = [Point([x]) for x in [0, 4, 10, 7]]
+        IG = clarksongreedy.IncrementalGreedy(MetricSpace(P))
+        self.assertEqual(IG.greedy(radii=True)[1], (Point([10]), 10))
+        IG.add(Point([30]))
+        self.assertEqual(len(IG.prefix()), 1)
+        self.assertEqual(IG.greedy()[:2], [Point([0]), Point([30])])
+        IG.add(Point([5]))
+        self.assertEqual(len(IG.prefix()), 3)
+        self.assertEqual(IG.greedy(radii=True)[3], (Point([5]), 5))
+
+
+class TestGreedyPrefix(unittest.TestCase):
+    def setUp(self):
+        seed(3)
+        self.P = [Point([random(), random()]) for i in range(300)]
+        M = MetricSpace(self.P)
+        self.expected = clarksongreedy.IncrementalGreedy(M, self.P[0]).prefix()
+
+    def testprefix(self):
+        M = MetricSpace(self.P)
+        for k in [0, 1, 2, 40, 300, 400]:
+            prefix = clarksongreedy.greedy_prefix(M, k, self.P[0])
+            self.assertEqual(prefix, self.expected[:k])
+
+    def testnet(self):
+        M = MetricSpace(self.P)
+        for eps in [2, 0.3, 0.05, 0.01]:
+            net = clarksongreedy.greedy_net(M, eps, self.P[0])
+            self.assertEqual(net, [t for t in self.expected if t[2] >= eps])
+            for p in self.P:
+                self.assertTrue(any(p.dist(q) < eps for q, i, r in net))
+        with self.assertRaises(ValueError):
+            clarksongreedy.greedy_net(M, 0)
+
+    def testnet_skips_frozen_cells(self):
+        M = MetricSpace(self.P)
+        counts = []
+        for eps in [0.1, 0]:
+            stats = Stats()
+            if eps:
+                clarksongreedy.greedy_net(M, eps, self.P[0], stats=stats)
+            else:
+                k = sum(1 for t in self.expected if t[2] >= 0.1)
+                list(zip(range(k), clarksongreedy.greedy(M, self.P[0],
+                                                          stats=stats)))
+            counts.append(stats.distances)
+        self.assertLess(counts[0], counts[1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from greedypermutation import greedy_tree
+from greedypermutation.greedytree import Node
 from metricspaces import MetricSpace
 
 def ell_1(a, b):
@@ -86,6 +87,24 @@ class TestGreedyTree(unittest.TestCase):
         T = greedy_tree(M, next(iter(M)))
         self.assertEqual(set(T), set(M))
 
+    def testdeep(self):
+        # A path of nodes whose steps shrink by a factor of ten and alternate
+        # in direction, so it is much longer than the recursion limit.
+        n = 3000
+        P = [0]
+        for i in range(n):
+            P.append(P[-1] + (-1) ** i * 10 ** (n - i))
+        NodeClass = Node(MetricSpace(dist=ell_1))
+        nodes = [NodeClass(p) for p in P]
+        for a, b in zip(nodes, nodes[1:]):
+            a.children.append(b)
+        root = nodes[0]
+        root.update()
+        self.assertEqual(len(root), n + 1)
+        self.assertEqual(root.radius, 10 ** n)
+        self.assertEqual(nodes[-2].radius, 10)
+        self.assertEqual(list(root), P)
+
 
 if __name__ == '__main__':
     unittest.main()
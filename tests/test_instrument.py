@@ -0,0 +1,65 @@
+import unittest
+from random import random
+from metricspaces import MetricSpace
+from greedypermutation import Point, clarksongreedy, quadraticgreedy
+from greedypermutation.balltree import greedy_tree
+from greedypermutation.fvm.merge import build_tree
+from greedypermutation.instrument import Stats, CountingMetric, counted
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        self.M = MetricSpace([Point([random(), random()]) for i in range(100)])
+
+    def test_clarkson(self):
+        steps = []
+        stats = Stats(history=True,
+                      callback=lambda i, counts: steps.append(i))
+        gp = list(clarksongreedy.greedy(self.M, tree=True, stats=stats))
+        self.assertEqual(gp, list(clarksongreedy.greedy(self.M, tree=True)))
+        self.assertEqual(stats.steps, len(self.M))
+        self.assertEqual(steps, list(range(len(self.M))))
+        self.assertEqual(len(stats.history), len(self.M))
+        self.assertGreater(stats.distances, 0)
+        self.assertEqual(stats.heap_inserts, len(self.M) - 1)
+        self.assertGreaterEqual(stats.moves, len(self.M) - 1)
+        self.assertEqual(sum(h['distances'] for h in stats.history),
+                         stats.distances)
+
+    def test_quadratic(self):
+        stats = Stats()
+        list(quadraticgreedy.greedy(self.M, stats=stats))
+        n = len(self.M)
+        self.assertEqual(stats.distances, n + n * (n - 1) // 2)
+        self.assertEqual(stats.steps, n)
+
+    def test_greedy_tree(self):
+        stats = Stats()
+        tree = greedy_tree(self.M, stats=stats)
+        built = stats.distances
+        self.assertGreater(built, 0)
+        tree.nn(Point([0.5, 0.5]))
+        self.assertGreater(stats.distances, built)
+
+    def test_fvm(self):
+        stats = Stats()
+        tree = build_tree(list(self.M), stats=stats)
+        self.assertEqual(len(tree), len(self.M))
+        self.assertGreater(stats.distances, 0)
+        self.assertGreater(stats.heap_inserts, 0)
+
+    def test_reset(self):
+        stats = Stats(history=True)
+        M = CountingMetric(self.M, stats)
+        M.dist(self.M[0], self.M[1])
+        stats.step()
+        self.assertEqual(repr(stats).count('distances=1'), 1)
+        stats.reset()
+        self.assertEqual(stats.distances, 0)
+        self.assertEqual(stats.history, [])
+        self.assertIs(counted(M, stats), M)
+        self.assertIs(counted(self.M, None), self.M)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from greedypermutation.maxheap import MaxHeap
+from random import random, randrange
+from greedypermutation.maxheap import MaxHeap, LazyMaxHeap
 
 
 class TestMaxHeap(unittest.TestCase):
@@ -26,6 +27,41 @@ class TestMaxHeap(unittest.TestCase):
         self.assertEqual(len(H), 3)
         self.assertEqual(H.removemax(), 2)
 
+    def testchangepriority(self):
+        for H in [MaxHeap(), MaxHeap(arity=4), LazyMaxHeap()]:
+            for i in range(10):
+                H.insert(i, i)
+            H.changepriority(3, 20)
+            H.changepriority(9, -1)
+            self.assertEqual(H.priority(3), 20)
+            self.assertEqual(H.removemax(), 3)
+            H.remove(5)
+            self.assertTrue(4 in H)
+            self.assertFalse(5 in H)
+            self.assertEqual(list(H), [8, 7, 6, 4, 2, 1, 0, 9])
+            self.assertEqual(len(H), 0)
+
+    def testchangepriority_many(self):
+        for heap in [MaxHeap, LazyMaxHeap]:
+            priority = {i: random() for i in range(200)}
+            H = heap(range(200), key=priority.get)
+            for j in range(5):
+                changed = {randrange(200) for i in range(30)}
+                for i in changed:
+                    priority[i] = random()
+                H.changepriority_many(changed)
+            self.assertEqual(list(H),
+                             sorted(priority, key=priority.get, reverse=True))
+
+    def testinsert_while_iterating(self):
+        H = MaxHeap([5])
+        output = []
+        for x in H:
+            output.append(x)
+            if x > 1:
+                H.insert(x - 2)
+        self.assertEqual(output, [5, 3, 1])
+
 
 if __name__ == '__main__':
     unittest.main()
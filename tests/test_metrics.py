@@ -0,0 +1,127 @@
+import math
+import unittest
+from random import random, seed
+from metricspaces import MetricSpace
+from greedypermutation import Point, clarksongreedy, quadraticgreedy
+from greedypermutation.balltree import greedy_tree
+from greedypermutation.metrics import (METRICS, Metric, ArrayMetricSpace,
+                                       dists, getmetric, register,
+                                       rankdists, rankpower)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed.")
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        seed(0)
+        self.P = [[random() for j in range(3)] for i in range(40)]
+        self.P.append([0.0, 0.0, 0.0])
+
+    def test_kernels(self):
+        A = np.array(self.P)
+        for name, metric in METRICS.items():
+            D = metric.many_to_many(A, A)
+            for i, a in enumerate(self.P):
+                one = metric.one_to_many(A[i], A)
+                for j, b in enumerate(self.P):
+                    pair = metric.pair(a, b)
+                    self.assertAlmostEqual(pair, one[j], msg=name)
+                    self.assertAlmostEqual(pair, D[i, j], msg=name)
+
+    def test_getmetric(self):
+        self.assertIs(getmetric('L2'), getmetric('euclidean'))
+        self.assertIs(getmetric('chebyshev'), METRICS['linf'])
+        with self.assertRaises(ValueError):
+            getmetric('hamming')
+        hamming = Metric('hamming',
+                         lambda a, b: sum(x != y for x, y in zip(a, b)),
+                         lambda a, B: (B != a).sum(axis=1))
+        register(hamming)
+        try:
+            M = ArrayMetricSpace([[0, 1], [1, 1], [1, 0]], 'hamming')
+            self.assertEqual(M.dist(0, 2), 2)
+            self.assertEqual(M.pairwise([0], [1, 2]).tolist(), [[1, 2]])
+        finally:
+            del METRICS['hamming']
+
+    def test_arraymetricspace(self):
+        M = ArrayMetricSpace(self.P, 'l1', batchsize=4)
+        self.assertEqual(list(M), list(range(len(self.P))))
+        self.assertEqual(M.dist(0, [0, 0, 0]), sum(self.P[0]))
+        self.assertEqual(len(dists(M, 1, range(10))), 10)
+        for p, d in zip(M, dists(M, 1, list(M))):
+            self.assertAlmostEqual(d, M.dist(1, p))
+        self.assertEqual(M.pairwise([], []).shape, (0, 0))
+        self.assertEqual(M.pairwise([], [[1, 2, 3]]).shape, (0, 1))
+        M.add([5, 5, 5])
+        self.assertEqual(len(M), len(self.P) + 1)
+        self.assertEqual(M.dist(len(self.P), len(self.P) - 1), 15)
+
+    def test_nolists(self):
+        A = np.array(self.P)
+        M = ArrayMetricSpace(A, lists=False)
+        self.assertIs(M.coords, A)
+        self.assertEqual(list(clarksongreedy.greedy(M)),
+                         list(clarksongreedy.greedy(ArrayMetricSpace(A))))
+        M.add([5, 5, 5])
+        self.assertEqual(len(M), len(self.P) + 1)
+        self.assertEqual(M.dist(len(self.P), 0), math.dist(A[0], [5, 5, 5]))
+
+    def test_rankdists(self):
+        for name, power in [('euclidean', 2), ('l1', 1)]:
+            M = ArrayMetricSpace(self.P, name, batchsize=8)
+            self.assertEqual(rankpower(M), power)
+            for points in [range(5), range(len(self.P))]:
+                for d, r in zip(dists(M, 3, points),
+                                rankdists(M, 3, points)):
+                    self.assertAlmostEqual(d ** power, r)
+                # An array of indices gives an array of the same values.
+                index = np.arange(len(points))
+                self.assertEqual(rankdists(M, 3, index).tolist(),
+                                 rankdists(M, 3, points))
+        Q = MetricSpace([Point(p) for p in self.P])
+        self.assertEqual(rankpower(Q), 1)
+        self.assertEqual(rankdists(Q, Q[0], Q[:3]), dists(Q, Q[0], Q[:3]))
+
+    def test_greedy(self):
+        M = ArrayMetricSpace(self.P)
+        Q = MetricSpace([Point(p) for p in self.P])
+        expected = [Q.points.index(p) for p in clarksongreedy.greedy(Q)]
+        self.assertEqual(list(clarksongreedy.greedy(M)), expected)
+        self.assertEqual(list(quadraticgreedy.greedy(M)), expected)
+        self.assertEqual(list(quadraticgreedy.greedy(M, vectorized=True)),
+                         expected)
+        tree = greedy_tree(M)
+        self.assertEqual(len(tree), len(self.P))
+        self.assertEqual(tree.nn([1, 1, 1]),
+                         min(M, key=lambda p: M.dist(p, [1, 1, 1])))
+        self.assertEqual(tree.nn_batch([[1, 1, 1], [0, 0, 0]]),
+                         [tree.nn([1, 1, 1]), tree.nn([0, 0, 0])])
+
+    def test_cosine(self):
+        A = np.array(self.P)
+        cosine = METRICS['cosine']
+        for i, a in enumerate(self.P):
+            self.assertEqual(cosine.pair(a, a), 0)
+            self.assertEqual(cosine.one_to_many(A[i], A)[i], 0)
+        self.assertGreaterEqual(cosine.many_to_many(A, A).min(), 0)
+        seed(1)
+        B = np.array([[random() for j in range(7)] for i in range(300)])
+        self.assertEqual(abs(np.diag(cosine.many_to_many(B, B))).max(), 0)
+        D = cosine.many_to_many(A, A)
+        self.assertEqual(D[-1, -1], 0)
+        self.assertEqual(D[-1, :-1].tolist(), [1.0] * (len(self.P) - 1))
+        self.assertEqual(D[:-1, -1].tolist(), [1.0] * (len(self.P) - 1))
+        # The cosine distance is not a metric, so only check that every
+        # point is output.
+        M = ArrayMetricSpace(self.P, 'cosine')
+        gp = list(clarksongreedy.greedy(M))
+        self.assertEqual(sorted(gp), list(range(len(self.P))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import threading
 import unittest
-from greedypermutation import Point, Cell, NeighborGraph
-from greedypermutation.neighborgraph import GreedyNeighborGraph
+from greedypermutation import Point, Cell, NeighborGraph, clarksongreedy
+from greedypermutation.neighborgraph import (GreedyNeighborGraph,
+                                             JournaledNeighborGraph)
+from greedypermutation.instrument import Stats, CountingMetric
 from metricspaces import MetricSpace
 
 
@@ -45,6 +48,72 @@ class TestCell(unittest.TestCase):
         self.assertEqual(len(C), 2)
         self.assertEqual(C.points, {a, b})
 
+    def testremovepoint(self):
+        a, b, c = Point([0, 0]), Point([3, 4]), Point([1, 0])
+        MetricCell = Cell(MetricSpace())
+        C = MetricCell(a)
+        C.addpoint(b)
+        C.addpoint(c)
+        C.removepoint(c)
+        self.assertEqual(C.points, {a, b})
+        self.assertEqual(C.radius, 5)
+        C.removepoint(b)
+        self.assertEqual(C.points, {a})
+        self.assertEqual(C.radius, 0)
+        with self.assertRaises(ValueError):
+            C.removepoint(a)
+
+    def testremovepoints(self):
+        stats = Stats()
+        MetricCell = Cell(CountingMetric(MetricSpace(), stats))
+        P = [Point([x, 0]) for x in range(10)]
+        C = MetricCell(P[0])
+        for p in P[1:]:
+            C.addpoint(p)
+        self.assertEqual(C.farthest, P[9])
+        count = stats.distances
+        C.removepoints({P[9], P[8], P[3]})
+        self.assertEqual(C.farthest, P[7])
+        self.assertEqual(C.radius, 7)
+        C.removepoints(set(P[1:8]) - {P[3]})
+        self.assertEqual(C.points, {P[0]})
+        self.assertEqual(C.radius, 0)
+        self.assertIsNone(C.farthest)
+        # The distances to the center are not computed again.
+        self.assertEqual(stats.distances, count)
+
+    def testmass(self):
+        P = [Point([x, 0]) for x in range(5)]
+        MetricCell = Cell(MetricSpace())
+        C = MetricCell(P[0], 2)
+        for i, p in enumerate(P[1:], start=1):
+            C.addpoint(p, i)
+        self.assertEqual(C.mass, 12)
+        C.removepoint(P[4], 4)
+        C.removepoints({P[1], P[2]}, 3)
+        self.assertEqual(C.mass, 5)
+        C.removepoints({P[3]})
+        self.assertEqual(C.mass, 4)
+
+    def testweighted(self):
+        P = [Point([x, 0]) for x in range(5)]
+        weights = {p: 1 for p in P}
+        weights[P[2]] = 3
+        MetricCell = Cell(MetricSpace())
+        MetricCell.weights = weights
+        C = MetricCell(P[0])
+        for p in P[1:]:
+            C.addpoint(p)
+        self.assertEqual(C.radius, 4)
+        self.assertEqual(C.farthest, P[2])
+        self.assertEqual(C.weightedradius, 6)
+        C.removepoint(P[2])
+        self.assertEqual(C.farthest, P[4])
+        self.assertEqual(C.weightedradius, 4)
+        weights[P[1]] = 0
+        C.updateradius()
+        self.assertEqual(C.farthest, P[4])
+
     def testupdateradius_empty_cell(self):
         MetricCell = Cell(MetricSpace())
         C = MetricCell(Point([1, 2, 3]))
@@ -95,6 +164,28 @@ class TestNeighborGraph(unittest.TestCase):
         self.assertEqual(G.cellmass(new_cell), 45)
         print(update_plan)
 
+    def testclose(self):
+        P = [Point([i, i % 7]) for i in range(50)]
+        M = MetricSpace(P)
+        with NeighborGraph(M, workers=3) as G:
+            root = next(iter(G._nbrs))
+            G.addcell(P[-1], root)
+            pool = G.pool
+        self.assertIsNone(G.pool)
+        self.assertTrue(pool._shutdown)
+        G.close()
+
+    def testclose_greedy(self):
+        P = [Point([i, i % 7]) for i in range(50)]
+        before = threading.active_count()
+        self.assertEqual(len(list(clarksongreedy.greedy(MetricSpace(P),
+                                                        workers=3))), 50)
+        gp = clarksongreedy.greedy(MetricSpace(P), workers=3)
+        next(gp), next(gp), next(gp)
+        gp.close()
+        clarksongreedy.greedy_prefix(MetricSpace(P), 10, workers=3)
+        self.assertEqual(threading.active_count(), before)
+
 
 class TestGreedyNeighborGraph(unittest.TestCase):
     def testneighborsofneighborscondition(self):
@@ -139,6 +230,135 @@ class TestGreedyNeighborGraph(unittest.TestCase):
         # That means that we should have an edge from c to aa.
         self.assertTrue(V[aa] in G.nbrs(V[c]))
 
+    def testaddpoint(self):
+        P = [Point([x]) for x in [0, 10, 20, 30]]
+        G = GreedyNeighborGraph(MetricSpace(P))
+        cell = G.heap.findmax()
+        G.addcell(cell.farthest, cell)
+        cells = {v.center: v for v in G.vertices()}
+        self.assertEqual(set(cells), {P[0], P[3]})
+        q = Point([18])
+        self.assertIs(G.locate(q), cells[P[3]])
+        self.assertIs(G.addpoint(q, mass=2), cells[P[3]])
+        self.assertTrue(q in cells[P[3]])
+        self.assertEqual(G.cellmass(cells[P[3]]), 4)
+        far = Point([100])
+        cell = G.addpoint(far)
+        self.assertIs(cell, cells[P[3]])
+        self.assertEqual(cell.radius, 70)
+        self.assertEqual(cell.farthest, far)
+        self.assertIs(G.heap.findmax(), cell)
+
+    def testremovepoint(self):
+        P = [Point([x]) for x in [0, 100, 50, 25, 75, 10, 90, 60, 40]]
+        G = GreedyNeighborGraph(MetricSpace(P))
+        for i in range(4):
+            cell = G.heap.findmax()
+            G.addcell(cell.farthest, cell)
+        cells = {v.center: v for v in G.vertices()}
+        # A point that is not a center.
+        cell = G.findcell(P[5])
+        self.assertEqual(G.removepoint(P[5]), {cell})
+        self.assertFalse(P[5] in cell)
+        # A center.
+        center = P[2]
+        old = cells[center]
+        points = set(old.points) - {center}
+        changed = G.removepoint(center)
+        self.assertFalse(old in G)
+        self.assertFalse(old in G.heap)
+        self.assertEqual(len(G), 4)
+        for q in points:
+            self.assertTrue(any(q in c for c in changed))
+        remaining = set(P) - {P[5], center}
+        self.assertEqual({q for v in G.vertices() for q in v}, remaining)
+        self.assertEqual(set(G.mass), remaining)
+        for v in G.vertices():
+            self.assertEqual(v.radius, max(v.dist(q) for q in v))
+            self.assertEqual(G.heap.priority(v), v.radius)
+            for w in G.vertices():
+                if G.iscloseenoughto(v, w):
+                    self.assertTrue(w in set(G.nbrs(v)))
+        # Remove every point but one.
+        for q in sorted(remaining, key=str)[1:]:
+            G.removepoint(q)
+        self.assertEqual(len(G), 1)
+        self.assertEqual(len(G.heap), 1)
+
+    def testundo(self):
+        P = [Point([x, (7 * x) % 11]) for x in range(40)]
+        G = JournaledNeighborGraph(MetricSpace(P))
+        states = []
+        for i in range(20):
+            states.append({v.center: (set(v.points), v.radius)
+                           for v in G.vertices()})
+            cell = G.heap.findmax()
+            G.addcell(cell.farthest, cell)
+        for i in reversed(range(10, 20)):
+            center = G.undo()
+            self.assertEqual({v.center: (set(v.points), v.radius)
+                              for v in G.vertices()}, states[i])
+            self.assertFalse(any(v.center == center for v in G.vertices()))
+            for v in G.vertices():
+                self.assertEqual(G.heap.priority(v), v.radius)
+                for w in G.vertices():
+                    if G.iscloseenoughto(v, w):
+                        self.assertTrue(w in set(G.nbrs(v)))
+        # A point added after a cell was made is added again when the cell
+        # is removed.
+        q = Point([10.5, 1])
+        G.addpoint(q)
+        for i in range(5):
+            G.undo()
+        self.assertTrue(any(q in v for v in G.vertices()))
+
+    def testcellmass_incremental(self):
+        P = [Point([x, (7 * x) % 11]) for x in range(40)]
+        mass = [1 + x % 3 for x in range(40)]
+        G = GreedyNeighborGraph(MetricSpace(P), mass=mass)
+        for i in range(15):
+            cell = G.heap.findmax()
+            G.addcell(cell.farthest, cell)
+        G.addpoint(Point([5, 5]), mass=4)
+        G.addpoint(P[3], mass=2)
+        G.removepoint(P[7])
+        G.removepoint(next(iter(G.vertices())).center)
+        for v in G.vertices():
+            self.assertEqual(G.cellmass(v), sum(G.mass[p] for p in v))
+        self.assertEqual(sum(v.mass for v in G.vertices()),
+                         sum(G.mass.values()))
+
+    def testweightedgreedy(self):
+        P = [Point([x, (7 * x) % 11]) for x in range(40)]
+        mass = [1 + x % 4 for x in range(40)]
+        weight = dict(zip(P, mass))
+        G = GreedyNeighborGraph(MetricSpace(P), mass=mass, weighted=True)
+        root = G.heap.findmax()
+        S = [root.center]
+        for i in range(1, len(P)):
+            cell = G.heap.findmax()
+            best = max(weight[p] * min(p.dist(q) for q in S) for p in P)
+            point = cell.farthest
+            self.assertEqual(weight[point] * min(point.dist(q) for q in S),
+                             best)
+            self.assertEqual(cell.weightedradius, best)
+            G.addcell(point, cell)
+            S.append(point)
+        self.assertEqual(set(S), set(P))
+
+    def testweightedgreedy_zero_mass(self):
+        P = [Point([x, (7 * x) % 11]) for x in range(40)]
+        mass = [0 if x % 3 == 0 else 1 for x in range(40)]
+        gp = list(clarksongreedy.greedy(MetricSpace(P), mass=mass,
+                                        weighted=True))
+        self.assertEqual(set(gp), set(P))
+        # The points of mass zero come last.
+        k = sum(1 for m in mass if m)
+        self.assertTrue(all(mass[P.index(p)] for p in gp[1:k + 1]))
+        with self.assertRaises(ValueError):
+            GreedyNeighborGraph(MetricSpace(P), mass=mass, weighted=True,
+                                bucket_size=2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+from greedypermutation.numpygreedy import greedy, sample
+
+
+class TestNumpyGreedy(unittest.TestCase):
+    def testgreedy(self):
+        P = np.array([[0], [1], [2]])
+        gp = [p[0] for p in greedy(P)]
+        self.assertEqual(gp, [0, 2, 1])
+
+    def testgreedytree_randomexample(self):
+        P = np.array([[c] for c in [0, 8, 12, 100, 40, 70, 1, 72]])
+        gp = list(greedy(P, 'euclidean', tree=True, radii=True))
+        self.assertEqual([p[0] for p, i, r in gp],
+                         [0, 100, 40, 70, 12, 8, 72, 1])
+        self.assertEqual([i for p, i, r in gp], [None, 0, 0, 1, 0, 4, 3, 0])
+        self.assertEqual([r for p, i, r in gp][1:], [100, 40, 30, 12, 4, 2, 1])
+
+    def testlowmemory(self):
+        P = np.random.rand(300, 4)
+        expected = list(greedy(P, tree=True, radii=True))
+        for kwargs in [{}, {'chunksize': 7}, {'chunksize': 50, 'workers': 3}]:
+            gp = list(greedy(P, tree=True, radii=True, lowmemory=True,
+                             **kwargs))
+            self.assertEqual([i for p, i, r in gp],
+                             [i for p, i, r in expected])
+            for (p, i, r), (q, j, s) in zip(gp, expected):
+                self.assertTrue((p == q).all())
+
+    def testsample(self):
+        P = np.array([[c] for c in [0, 8, 12, 100, 40, 70, 1, 72]])
+        S = sample(P, 12, 'euclidean', lowmemory=True)
+        self.assertEqual([p[0] for p in S], [0, 100, 40, 70, 12])
+        self.assertEqual(len(sample(P, 0)), len(P))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import io
+import unittest
+from greedypermutation.pointio import read_raw, read_text, write_lines
+
+
+class TestPointIO(unittest.TestCase):
+    def test_read_text(self):
+        text = "1 2\n\n3 4 ; 0\n5   6\n7 8"
+        for chunksize in [1, 3, 100]:
+            coords, dim = read_text(io.StringIO(text), chunksize)
+            self.assertEqual(dim, 2)
+            self.assertEqual(list(coords), [1, 2, 3, 4, 5, 6, 7, 8])
+
+    def test_read_text_bad_dimension(self):
+        with self.assertRaises(ValueError):
+            read_text(io.StringIO("1 2\n3 4 5\n"))
+        ragged = ["1 2\n3 4 5 6\n7 8\n",
+                  "1 2 3\n4 5 6\n7 8 9\n1\n2\n3\n"]
+        for text in ragged:
+            for chunksize in [1, 5, 100]:
+                with self.assertRaises(ValueError):
+                    read_text(io.StringIO(text), chunksize)
+
+    def test_read_raw(self):
+        f = io.BytesIO(bytes(8 * 6))
+        coords, dim = read_raw(f, 3, chunksize=16)
+        self.assertEqual(list(coords), [0] * 6)
+        with self.assertRaises(ValueError):
+            read_raw(io.BytesIO(bytes(8 * 6)), 4)
+
+    def test_write_lines(self):
+        f = io.StringIO()
+        write_lines(f, (str(i) for i in range(5)), blocksize=2)
+        self.assertEqual(f.getvalue(), "0\n1\n2\n3\n4\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
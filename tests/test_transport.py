@@ -0,0 +1,82 @@
+import unittest
+from random import random, randrange, seed
+from metricspaces import MetricSpace
+from greedypermutation import Point, clarksongreedy, quadraticgreedy
+from greedypermutation.transport import TransportRecords
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy is not installed.")
+class TestTransportRecords(unittest.TestCase):
+    def setUp(self):
+        seed(0)
+        self.P = [Point([random(), random()]) for i in range(150)]
+        self.mass = [randrange(1, 4) for p in self.P]
+
+    def check_plans(self, records, gp):
+        points = [p for p, t in gp]
+        plans = records.plans(points)
+        for plan, (p, t) in zip(plans, gp):
+            self.assertEqual(plan, dict(t))
+        for p, t in gp[len(plans):]:
+            self.assertEqual(dict(t), {})
+
+    def test_buffers(self):
+        R = TransportRecords(capacity=2)
+        R.append(0, -1, 0, 5)
+        R.extend(1, [0, 2, 3], 1, [1, 2, 3])
+        self.assertEqual(len(R), 4)
+        self.assertEqual(R.capacity, 4)
+        self.assertEqual(R.step.tolist(), [0, 1, 1, 1])
+        self.assertEqual(R.source.tolist(), [-1, 0, 2, 3])
+        self.assertEqual(R.destination.tolist(), [0, 1, 1, 1])
+        self.assertEqual(R.mass.tolist(), [5, 1, 2, 3])
+        self.assertEqual(R.plans('abcd'), [{'a': 5}, {'a': -1, 'b': 6,
+                                                      'c': -2, 'd': -3}])
+        R.clear()
+        self.assertEqual(len(R), 0)
+        with self.assertRaises(ValueError):
+            TransportRecords(capacity=0)
+
+    def test_chunks(self):
+        chunks = []
+        R = TransportRecords(capacity=3, onchunk=lambda records: chunks.append(
+            [c.copy() for c in records.columns()]))
+        for i in range(4):
+            R.extend(i, [i, i], [i + 1, i + 2], [1, 2])
+        R.flush()
+        self.assertEqual(R.capacity, 3)
+        self.assertEqual(R.total, 8)
+        self.assertEqual([len(c[0]) for c in chunks], [3, 3, 2])
+        self.assertEqual(np.concatenate([c[2] for c in chunks]).tolist(),
+                         [1, 2, 2, 3, 3, 4, 4, 5])
+
+    def test_clarkson(self):
+        M = MetricSpace(self.P)
+        R = TransportRecords(capacity=16)
+        gp = list(clarksongreedy.greedy(M, gettransportplan=True,
+                                        mass=self.mass, transportrecords=R))
+        self.assertEqual(R.mass[0], sum(self.mass))
+        self.assertTrue((R.destination == R.step).all())
+        self.assertTrue((R.source < R.step).all())
+        self.check_plans(R, gp)
+
+    def test_quadratic(self):
+        M = MetricSpace(self.P)
+        R = TransportRecords()
+        gp = list(quadraticgreedy.greedy(M, gettransportplan=True,
+                                         mass=self.mass, transportrecords=R))
+        self.check_plans(R, gp)
+        V = TransportRecords()
+        list(quadraticgreedy.greedy(M, mass=self.mass, vectorized=True,
+                                    transportrecords=V))
+        for a, b in zip(R.columns(), V.columns()):
+            self.assertEqual(a.tolist(), b.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()